@@ -15,8 +15,11 @@
 
 import json
 import os
+import queue
 import struct
+import logging
 import binascii
+from threading import Thread
 
 import dbus
 from gi.repository import GLib
@@ -31,12 +34,181 @@ from jarabe.model import shell
 from jarabe.model import session
 from jarabe.journal.objectchooser import ObjectChooser
 
+# Requests answered on their own even in a batch, authenticate is not
+# answered at all and the object chooser waits for the user
+_UNBATCHED_METHODS = ["authenticate", "activity.show_object_chooser"]
+
 
 class StreamMonitor(object):
 
     def __init__(self):
         self.on_data = None
         self.on_close = None
+        self.on_abort = None
+
+
+class _FileWorker(object):
+    """Reads or writes a file in a thread, so that large files streamed
+    through the socket do not block the main loop.
+
+    The operations run in the order they are queued and their callbacks,
+    if given, are called in the main loop with the result and the error
+    raised, if any.
+    """
+
+    def __init__(self, file_object):
+        self._file_object = file_object
+        self._operations = queue.Queue()
+
+        thread = Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def readinto(self, buffer, callback):
+        self._operations.put((self._file_object.readinto, buffer, callback))
+
+    def write(self, data, callback):
+        self._operations.put((self._file_object.write, data, callback))
+
+    def close(self, callback=None):
+        self._operations.put((None, None, callback))
+
+    def _run(self):
+        while True:
+            function, argument, callback = self._operations.get()
+            result = None
+            error = None
+            try:
+                if function is None:
+                    self._file_object.close()
+                else:
+                    result = function(argument)
+            except Exception as e:
+                error = e
+            if callback is not None:
+                GLib.idle_add(self.__operation_done_cb, callback, result,
+                              error)
+
+            if function is None:
+                break
+
+    def __operation_done_cb(self, callback, result, error):
+        callback(result, error)
+        return False
+
+
+class _LoadStream(object):
+    """Sends a file to the client, in the chunks it asks for.
+
+    Chunks are read in a buffer reused for the whole stream, prefixed by
+    the stream id, and sent without copying it. The next chunk is only
+    read once the previous one has been written to the socket, so a slow
+    client does not make the shell queue the whole file in memory.
+    """
+
+    def __init__(self, client, stream_id):
+        self._client = client
+        self._stream_id = stream_id
+        self._worker = None
+        self._requested_sizes = []
+        self._buffer = bytearray(1)
+        self._buffer[0] = stream_id
+        self._busy = False
+        self._closed = False
+
+    def open(self, file_object):
+        self._worker = _FileWorker(file_object)
+        if self._closed:
+            self._worker.close()
+        else:
+            self._send_next_chunk()
+
+    def request(self, size):
+        self._requested_sizes.append(size)
+        self._send_next_chunk()
+
+    def close(self):
+        self._closed = True
+        if self._worker is not None and not self._busy:
+            self._worker.close()
+
+    def _send_next_chunk(self):
+        if self._worker is None or self._busy or self._closed or \
+                not self._requested_sizes:
+            return
+
+        size = self._requested_sizes.pop(0)
+        if len(self._buffer) < size + 1:
+            # Views of the previous buffer may still be alive, replace it
+            # rather than resizing it
+            self._buffer = bytearray(size + 1)
+            self._buffer[0] = self._stream_id
+
+        self._busy = True
+        self._worker.readinto(memoryview(self._buffer)[1:size + 1],
+                              self.__read_cb)
+
+    def __read_cb(self, n_bytes, error):
+        if error is not None:
+            logging.error('Could not read the file streamed: %s', error)
+            n_bytes = 0
+
+        # gwebsockets copies the message into the frame it sends
+        self._client.send_binary(memoryview(self._buffer)[:n_bytes + 1],
+                                 self.__sent_cb)
+
+    def __sent_cb(self, written):
+        self._busy = False
+        if self._closed:
+            self._worker.close()
+        else:
+            self._send_next_chunk()
+
+
+class _SaveStream(object):
+    """Writes the chunks sent by the client to a file, in a thread.
+
+    Chunks are written without copying them and close_cb is called with
+    the first error, if any, once all of them are written and the file
+    is closed.
+    """
+
+    def __init__(self, file_object):
+        self._worker = _FileWorker(file_object)
+        self._error = None
+        self._close_cb = None
+
+    def write(self, data):
+        # Skip the stream id
+        self._worker.write(memoryview(data)[1:], self.__written_cb)
+
+    def close(self, close_cb):
+        self._close_cb = close_cb
+        self._worker.close(self.__closed_cb)
+
+    def __written_cb(self, result, error):
+        if self._error is None:
+            self._error = error
+
+    def __closed_cb(self, result, error):
+        self._close_cb(self._error or error)
+
+
+_data_store = None
+
+
+def _get_data_store():
+    """Return the data store proxy, shared by all the clients"""
+    global _data_store
+    if _data_store is None:
+        bus = dbus.SessionBus()
+        # Keep working if the data store is restarted
+        bus_object = bus.get_object("org.laptop.sugar.DataStore",
+                                    "/org/laptop/sugar/DataStore",
+                                    follow_name_owner_changes=True)
+        _data_store = dbus.Interface(bus_object,
+                                     "org.laptop.sugar.DataStore")
+    return _data_store
 
 
 class API(object):
@@ -109,11 +281,7 @@ class DatastoreAPI(API):
     def __init__(self, client):
         API.__init__(self, client)
 
-        bus = dbus.SessionBus()
-        bus_object = bus.get_object("org.laptop.sugar.DataStore",
-                                    "/org/laptop/sugar/DataStore")
-        self._data_store = dbus.Interface(bus_object,
-                                          "org.laptop.sugar.DataStore")
+        self._data_store = _get_data_store()
         self._sequence = 0
 
     def _create_file(self):
@@ -153,14 +321,12 @@ class DatastoreAPI(API):
 
     def load(self, request):
         def get_filename_reply_handler(file_name):
-            file_object = open(file_name, 'rb')
-            info["file_object"] = file_object
-
-            if "requested_size" in info:
-                send_binary(file_object.read(info["requested_size"]))
-
-            if "stream_closed" in info:
-                info["file_object"].close()
+            try:
+                file_object = open(file_name, 'rb')
+            except EnvironmentError as e:
+                self._client.send_error(request, str(e))
+                return
+            stream.open(file_object)
 
         def get_properties_reply_handler(properties):
             self._client.send_result(request, [properties])
@@ -168,28 +334,17 @@ class DatastoreAPI(API):
         def error_handler(error):
             self._client.send_error(request, error)
 
-        def send_binary(data):
-            self._client.send_binary(bytes([stream_id]) + data)
-
         def on_data(data):
-            size = struct.unpack("ii", data)[1]
-            if "file_object" in info:
-                send_binary(info["file_object"].read(size))
-            else:
-                info["requested_size"] = size
+            stream.request(struct.unpack("ii", data)[1])
 
         def on_close(close_request):
-            if "file_object" in info:
-                info["file_object"].close()
-            else:
-                info["stream_closed"] = True
-
+            stream.close()
             self._client.send_result(close_request, [])
 
-        info = {}
-
         uid, stream_id = request["params"]
 
+        stream = _LoadStream(self._client, stream_id)
+
         self._data_store.get_filename(
             uid,
             reply_handler=get_filename_reply_handler,
@@ -203,6 +358,7 @@ class DatastoreAPI(API):
         stream_monitor = self._client.stream_monitors[stream_id]
         stream_monitor.on_data = on_data
         stream_monitor.on_close = on_close
+        stream_monitor.on_abort = stream.close
 
     def save(self, request):
         def reply_handler():
@@ -212,25 +368,39 @@ class DatastoreAPI(API):
             self._client.send_error(info["close_request"], error)
 
         def on_data(data):
-            file_object.write(data[1:])
+            stream.write(data)
 
         def on_close(close_request):
-            file_object.close()
-
             info["close_request"] = close_request
+            stream.close(stream_closed_cb)
+
+        def stream_closed_cb(error):
+            if error is not None:
+                os.unlink(file_path)
+                self._client.send_error(info["close_request"], str(error))
+                return
+
             self._data_store.update(uid, metadata, file_path, True,
                                     reply_handler=reply_handler,
                                     error_handler=error_handler)
 
+        def on_abort():
+            stream.close(stream_aborted_cb)
+
+        def stream_aborted_cb(error):
+            os.unlink(file_path)
+
         info = {}
 
         uid, metadata, stream_id = request["params"]
 
         file_path, file_object = self._create_file()
+        stream = _SaveStream(file_object)
 
         stream_monitor = self._client.stream_monitors[stream_id]
         stream_monitor.on_data = on_data
         stream_monitor.on_close = on_close
+        stream_monitor.on_abort = on_abort
 
         self._client.send_result(request, [])
 
@@ -253,13 +423,60 @@ class APIClient(object):
 
         self.activity_id = None
         self.stream_monitors = {}
+        self.apis = {}
+        self._batches = {}
+        self._activity_removed_sid = None
+
+    def authenticate(self, activity_id):
+        if self.activity_id is None:
+            self._activity_removed_sid = shell.get_model().connect(
+                'activity-removed', self._activity_removed_cb)
+        self.activity_id = activity_id
+
+    def _activity_removed_cb(self, model, activity):
+        if activity.get_activity_id() != self.activity_id:
+            return
+        model.disconnect(self._activity_removed_sid)
+        self.close()
+
+    def close(self):
+        """Close the streams the client left open, so that their files
+        and threads are not kept until the shell exits.
+        """
+        for stream_monitor in self.stream_monitors.values():
+            if stream_monitor.on_abort:
+                stream_monitor.on_abort()
+        self.stream_monitors.clear()
+
+    def start_batch(self, requests):
+        """Collect the responses to requests, to send them in a single
+        message once all of them are answered.
+        """
+        batch = {"pending": set(), "responses": []}
+        for request in requests:
+            if isinstance(request, dict) and \
+                    request.get("id") is not None and \
+                    request.get("method") not in _UNBATCHED_METHODS:
+                batch["pending"].add(request["id"])
+                self._batches[request["id"]] = batch
+
+    def _send_response(self, response):
+        batch = self._batches.pop(response["id"], None)
+        if batch is None:
+            self._session.send_message(json.dumps(response))
+            return
+
+        batch["responses"].append(response)
+        batch["pending"].discard(response["id"])
+        if not batch["pending"]:
+            self._session.send_message(json.dumps(batch["responses"]))
 
     def send_result(self, request, result):
         response = {"result": result,
                     "error": None,
                     "id": request["id"]}
 
-        self._session.send_message(json.dumps(response))
+        self._send_response(response)
 
     def send_error(self, request, error):
         if isinstance(error, dbus.exceptions.DBusException):
@@ -269,7 +486,7 @@ class APIClient(object):
                     "error": error,
                     "id": request["id"]}
 
-        self._session.send_message(json.dumps(response))
+        self._send_response(response)
 
     def send_notification(self, method, params=None):
         if params is None:
@@ -280,8 +497,8 @@ class APIClient(object):
 
         self._session.send_message(json.dumps(response))
 
-    def send_binary(self, data):
-        self._session.send_message(data, binary=True)
+    def send_binary(self, data, callback=None):
+        self._session.send_message(data, callback=callback, binary=True)
 
 
 class APIServer(object):
@@ -315,6 +532,8 @@ class APIServer(object):
         stream_monitor = client.stream_monitors[stream_id]
         if stream_monitor.on_close:
             stream_monitor.on_close(request)
+        else:
+            client.send_result(request, None)
 
         del client.stream_monitors[stream_id]
 
@@ -331,10 +550,39 @@ class APIServer(object):
 
         request = json.loads(message.data)
 
+        # Several requests can be sent in a JSON array, to save round
+        # trips, their responses are sent back in an array as well
+        if isinstance(request, list):
+            if client.activity_id is not None:
+                client.start_batch(request)
+            for batch_request in request:
+                if not isinstance(batch_request, dict):
+                    logging.error('Invalid request %r', batch_request)
+                    continue
+                try:
+                    self._handle_request(client, batch_request)
+                except Exception as e:
+                    logging.exception('Could not handle %r', batch_request)
+                    if client.activity_id is not None and \
+                            batch_request.get("id") is not None:
+                        client.send_error(batch_request, str(e))
+        else:
+            self._handle_request(client, request)
+
+    def _get_api(self, client, api_name):
+        # The APIs connect to the activity signals, only create them once
+        # per client
+        api = client.apis.get(api_name)
+        if api is None:
+            api = self._apis[api_name](client)
+            client.apis[api_name] = api
+        return api
+
+    def _handle_request(self, client, request):
         if request["method"] == "authenticate":
             params = request["params"]
             if self._key == params[1]:
-                client.activity_id = params[0]
+                client.authenticate(params[0])
                 return
 
         activity_id = client.activity_id
@@ -347,7 +595,7 @@ class APIServer(object):
             self._close_stream(client, request)
         else:
             api_name, method_name = request["method"].split(".")
-            getattr(self._apis[api_name](client), method_name)(request)
+            getattr(self._get_api(client, api_name), method_name)(request)
 
 
 def start():
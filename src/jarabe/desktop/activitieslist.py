@@ -67,7 +67,7 @@ class ActivitiesTreeView(Gtk.TreeView):
 
         self._model = ListModel()
         self._model.set_visible_func(self.__model_visible_cb)
-        self.set_model(self._model)
+        self._model.connect('ready', self.__model_ready_cb)
 
         self._favorite_columns = []
         for i in range(desktop.get_number_of_views()):
@@ -157,6 +157,11 @@ class ActivitiesTreeView(Gtk.TreeView):
                 'button-release-event', self.__button_release_cb)
             self._row_activated_armed_path = None
 
+    def __model_ready_cb(self, model):
+        # Set it up once the model has all the activities, so they are
+        # not added one by one to the view
+        self.set_model(self._model)
+
     def __favorite_set_data_cb(self, column, cell, model, tree_iter, data):
         favorite = \
             model[tree_iter][self._model.column_favorites[cell.favorite_view]]
@@ -246,8 +251,8 @@ class ActivitiesTreeView(Gtk.TreeView):
         if isinstance(query, bytes):
             query = query.decode()
         self._query = normalize_string(query)
-        self.get_model().refilter()
-        matches = self.get_model().iter_n_children(None)
+        self._model.refilter()
+        matches = self._model.iter_n_children(None)
         return matches
 
     def __model_visible_cb(self, model, tree_iter, data):
@@ -273,10 +278,10 @@ class ActivitiesTreeView(Gtk.TreeView):
 
     def get_activities_selected(self):
         activities = []
-        for row in self.get_model():
+        for row in self._model:
             activities.append(
-                {'name': row[self.get_model().column_activity_name],
-                 'bundle_id': row[self.get_model().column_bundle_id]})
+                {'name': row[self._model.column_activity_name],
+                 'bundle_id': row[self._model.column_bundle_id]})
         return activities
 
     def run_activity(self, bundle_id, resume_mode):
@@ -322,6 +327,10 @@ class ActivitiesTreeView(Gtk.TreeView):
 class ListModel(Gtk.TreeModelSort):
     __gtype_name__ = 'SugarListModel'
 
+    __gsignals__ = {
+        'ready': (GObject.SignalFlags.RUN_FIRST, None, ([])),
+    }
+
     def __init__(self):
         self.column_bundle_id = 0
         self.column_favorites = []
@@ -343,43 +352,62 @@ class ListModel(Gtk.TreeModelSort):
         self._model.set_column_types(column_types)
         self._model_filter = self._model.filter_new()
         Gtk.TreeModelSort.__init__(self, model=self._model_filter)
-        self.set_sort_column_id(self.column_title, Gtk.SortType.ASCENDING)
+
+        # Row references of the store, by bundle id and version
+        self._rows = {}
 
         GLib.idle_add(self.__connect_to_bundle_registry_cb)
 
     def __connect_to_bundle_registry_cb(self):
+        # Nothing shows the model yet, and the rows are only sorted once
+        # they are all added
         registry = bundleregistry.get_registry()
         for info in registry:
             self._add_activity(info)
+        self.set_sort_column_id(self.column_title, Gtk.SortType.ASCENDING)
+
         registry.connect('bundle-added', self.__activity_added_cb)
         registry.connect('bundle-changed', self.__activity_changed_cb)
         registry.connect('bundle-removed', self.__activity_removed_cb)
+        registry.connect('bundles-changed', self.__activities_changed_cb)
+
+        self.emit('ready')
 
     def __activity_added_cb(self, activity_registry, activity_info):
         self._add_activity(activity_info)
 
+    def __activities_changed_cb(self, activity_registry, added, removed):
+        for activity_info in removed:
+            self.__activity_removed_cb(activity_registry, activity_info)
+        for activity_info in added:
+            self._add_activity(activity_info)
+
+    def _get_row(self, activity_info):
+        row_reference = self._rows.get((activity_info.get_bundle_id(),
+                                        activity_info.get_activity_version()))
+        if row_reference is None or not row_reference.valid():
+            return None
+        return self._model[row_reference.get_path()]
+
     def __activity_changed_cb(self, activity_registry, activity_info):
-        bundle_id = activity_info.get_bundle_id()
-        version = activity_info.get_activity_version()
-        favorites = []
+        row = self._get_row(activity_info)
+        if row is None:
+            return
+
+        favorites = activity_registry.get_bundle_favorites(
+            activity_info.get_bundle_id(),
+            activity_info.get_activity_version())
         for i in range(desktop.get_number_of_views()):
-            favorites.append(
-                activity_registry.is_bundle_favorite(bundle_id, version, i))
-        for row in self._model:
-            if row[self.column_bundle_id] == bundle_id and \
-                    row[self.column_version] == version:
-                for i in range(desktop.get_number_of_views()):
-                    row[self.column_favorites[i]] = favorites[i]
-                return
+            row[self.column_favorites[i]] = favorites[i]
 
     def __activity_removed_cb(self, activity_registry, activity_info):
-        bundle_id = activity_info.get_bundle_id()
-        version = activity_info.get_activity_version()
-        for row in self._model:
-            if row[self.column_bundle_id] == bundle_id and \
-                    row[self.column_version] == version:
-                self._model.remove(row.iter)
-                return
+        row = self._get_row(activity_info)
+        if row is None:
+            return
+
+        del self._rows[(activity_info.get_bundle_id(),
+                        activity_info.get_activity_version())]
+        self._model.remove(row.iter)
 
     def _add_activity(self, activity_info):
         if activity_info.get_bundle_id() == 'org.laptop.JournalActivity':
@@ -392,12 +420,8 @@ class ListModel(Gtk.TreeModelSort):
         version = activity_info.get_activity_version()
 
         registry = bundleregistry.get_registry()
-        favorites = []
-        for i in range(desktop.get_number_of_views()):
-            favorites.append(
-                registry.is_bundle_favorite(activity_info.get_bundle_id(),
-                                            version,
-                                            i))
+        favorites = registry.get_bundle_favorites(
+            activity_info.get_bundle_id(), version)
 
         tag_list = activity_info.get_tags()
         if tag_list is None or not tag_list:
@@ -418,7 +442,14 @@ class ListModel(Gtk.TreeModelSort):
         model_list.append(int(timestamp))
         model_list.append(util.timestamp_to_elapsed_string(timestamp))
         model_list.append(activity_info.get_name())
-        self._model.append(model_list)
+
+        row = self._get_row(activity_info)
+        if row is not None:
+            self._model.remove(row.iter)
+        tree_iter = self._model.append(model_list)
+        self._rows[(activity_info.get_bundle_id(), version)] = \
+            Gtk.TreeRowReference.new(self._model,
+                                     self._model.get_path(tree_iter))
 
     def set_visible_func(self, func):
         self._model_filter.set_visible_func(func)
@@ -36,7 +36,6 @@ from sugar3.graphics.alert import Alert, ErrorAlert
 from sugar3.graphics.xocolor import XoColor
 from sugar3.activity import activityfactory
 from sugar3 import dispatch
-from sugar3.datastore import datastore
 
 from jarabe.view.palettes import JournalPalette
 from jarabe.view.palettes import CurrentActivityPalette
@@ -47,6 +46,7 @@ from jarabe.model.buddy import get_owner_instance
 from jarabe.model import shell
 from jarabe.model import bundleregistry
 from jarabe.model import desktop
+from jarabe.model import resumeentries
 from jarabe.journal import misc
 
 from jarabe.desktop import schoolserver
@@ -300,6 +300,7 @@ class FavoritesView(ViewContainer):
         registry.connect('bundle-added', self.__activity_added_cb)
         registry.connect('bundle-removed', self.__activity_removed_cb)
         registry.connect('bundle-changed', self.__activity_changed_cb)
+        registry.connect('bundles-changed', self.__activities_changed_cb)
 
     def _add_activity(self, activity_info):
         if activity_info.get_bundle_id() == 'org.laptop.JournalActivity':
@@ -326,6 +327,13 @@ class FavoritesView(ViewContainer):
                                         activity_info.get_activity_version())
         if icon is not None:
             self.remove(icon)
+            icon.destroy()
+
+    def __activities_changed_cb(self, activity_registry, added, removed):
+        for activity_info in removed:
+            self.__activity_removed_cb(activity_registry, activity_info)
+        for activity_info in added:
+            self.__activity_added_cb(activity_registry, activity_info)
 
     def _find_activity_icon(self, bundle_id, version):
         for icon in self.get_children():
@@ -341,6 +349,7 @@ class FavoritesView(ViewContainer):
                                         activity_info.get_activity_version())
         if icon is not None:
             self.remove(icon)
+            icon.destroy()
 
         registry = bundleregistry.get_registry()
         if registry.is_bundle_favorite(activity_info.get_bundle_id(),
@@ -412,7 +421,6 @@ class ActivityIcon(CanvasIcon):
     __gtype_name__ = 'SugarFavoriteActivityIcon'
 
     _BORDER_WIDTH = style.zoom(9)
-    _MAX_RESUME_ENTRIES = 5
 
     def __init__(self, activity_info):
         CanvasIcon.__init__(self, cache=True,
@@ -424,52 +432,23 @@ class ActivityIcon(CanvasIcon):
             'org.sugarlabs.user').get_boolean('resume-activity')
 
         self.connect_after('activate', self.__button_activate_cb)
+        self.connect('destroy', self.__destroy_cb)
 
-        datastore.created.connect(self.__datastore_listener_updated_cb)
-        datastore.updated.connect(self.__datastore_listener_updated_cb)
-        datastore.deleted.connect(self.__datastore_listener_deleted_cb)
+        # The entries of all the icons are fetched together
+        entries = resumeentries.get_model().watch(
+            self.bundle_id, self.__resume_entries_changed_cb)
+        if entries is not None:
+            self._journal_entries = entries
 
-        self._refresh()
         self._update()
 
-    def _refresh(self):
-        bundle_id = self._activity_info.get_bundle_id()
-        properties = ['uid', 'title', 'icon-color', 'activity', 'activity_id',
-                      'mime_type', 'mountpoint']
-        self._get_last_activity_async(bundle_id, properties)
-
-    def __datastore_listener_updated_cb(self, **kwargs):
-        bundle_id = self._activity_info.get_bundle_id()
-        if kwargs['metadata'].get('activity', '') == bundle_id:
-            self._refresh()
-
-    def __datastore_listener_deleted_cb(self, **kwargs):
-        for entry in self._journal_entries:
-            if entry['uid'] == kwargs['object_id']:
-                self._refresh()
-                break
-
-    def _get_last_activity_async(self, bundle_id, properties):
-        query = {'activity': bundle_id}
-        datastore.find(query, sorting=['+timestamp'],
-                       limit=self._MAX_RESUME_ENTRIES,
-                       properties=properties,
-                       reply_handler=self.__get_last_activity_reply_handler_cb,
-                       error_handler=self.__get_last_activity_error_handler_cb)
-
-    def __get_last_activity_reply_handler_cb(self, entries, total_count):
-        # If there's a problem with the DS index, we may get entries not
-        # related to this activity.
-        checked_entries = []
-        for entry in entries:
-            if entry['activity'] == self.bundle_id:
-                checked_entries.append(entry)
-
-        self._journal_entries = checked_entries
+    def __resume_entries_changed_cb(self, bundle_id, entries):
+        self._journal_entries = entries
         self._update()
 
-    def __get_last_activity_error_handler_cb(self, error):
-        logging.error('Error retrieving most recent activities: %r', error)
+    def __destroy_cb(self, icon):
+        resumeentries.get_model().unwatch(self.bundle_id,
+                                          self.__resume_entries_changed_cb)
 
     def _update(self):
         self.palette = None
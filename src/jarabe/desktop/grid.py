@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import random
+from collections import OrderedDict
 
 from gi.repository import GObject
 from gi.repository import Gdk
@@ -27,6 +28,44 @@ _PLACE_TRIALS = 20
 _MAX_WEIGHT = 255
 _REFRESH_RATE = 200
 _MAX_COLLISIONS_PER_REFRESH = 20
+_BUCKET_SIZE = 16
+
+
+class _SpatialIndex(object):
+    """Children of the grid by the square buckets their rect overlaps,
+    to find the children near a rect without looking at all of them.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    def _get_keys(self, rect):
+        x = int(rect.x) // _BUCKET_SIZE
+        y = int(rect.y) // _BUCKET_SIZE
+        last_x = int(rect.x + max(rect.width, 1) - 1) // _BUCKET_SIZE
+        last_y = int(rect.y + max(rect.height, 1) - 1) // _BUCKET_SIZE
+        for bucket_x in range(x, last_x + 1):
+            for bucket_y in range(y, last_y + 1):
+                yield bucket_x, bucket_y
+
+    def add(self, child, rect):
+        for key in self._get_keys(rect):
+            self._buckets.setdefault(key, set()).add(child)
+
+    def remove(self, child, rect):
+        for key in self._get_keys(rect):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            bucket.discard(child)
+            if not bucket:
+                del self._buckets[key]
+
+    def find(self, rect):
+        children = set()
+        for key in self._get_keys(rect):
+            children.update(self._buckets.get(key, ()))
+        return children
 
 
 class Grid(SugarExt.Grid):
@@ -38,10 +77,11 @@ class Grid(SugarExt.Grid):
     def __init__(self, width, height):
         GObject.GObject.__init__(self)
 
-        self._children = []
         self._child_rects = {}
+        self._index = _SpatialIndex()
         self._locked_children = set()
-        self._collisions = []
+        # Used as an ordered set, children are solved in turns
+        self._collisions = OrderedDict()
         self._collisions_sid = 0
 
         self.setup(width, height)
@@ -70,7 +110,7 @@ class Grid(SugarExt.Grid):
                 trials -= 1
 
         self._child_rects[child] = rect
-        self._children.append(child)
+        self._index.add(child, rect)
         self.add_weight(self._child_rects[child])
         if locked:
             self._locked_children.add(child)
@@ -79,23 +119,24 @@ class Grid(SugarExt.Grid):
             self._detect_collisions(child)
 
     def is_in_grid(self, child):
-        return child in self._children
+        return child in self._child_rects
 
     def remove(self, child):
-        self._children.remove(child)
+        self._index.remove(child, self._child_rects[child])
         self.remove_weight(self._child_rects[child])
         self._locked_children.discard(child)
         del self._child_rects[child]
 
-        if child in self._collisions:
-            self._collisions.remove(child)
+        self._collisions.pop(child, None)
 
     def move(self, child, x, y, locked=False):
         self.remove_weight(self._child_rects[child])
 
         rect = self._child_rects[child]
+        self._index.remove(child, rect)
         rect.x = x
         rect.y = y
+        self._index.add(child, rect)
 
         weight = self.compute_weight(rect)
         self.add_weight(self._child_rects[child])
@@ -109,8 +150,18 @@ class Grid(SugarExt.Grid):
             self._detect_collisions(child)
 
     def _shift_child(self, child, weight):
-        rect = self._child_rects[child]
+        """Move the child one cell at a time to the neighbouring position
+        with the lowest weight, as long as the weight goes down, and
+        return the weight of the final position.
+        """
+        while True:
+            best_rect, weight = self._get_best_neighbour(
+                self._child_rects[child], weight)
+            if best_rect is None:
+                return weight
+            self._child_rects[child] = best_rect
 
+    def _get_best_neighbour(self, rect, weight):
         new_rects = []
 
         def _create_rectangle(x, y, width, height):
@@ -163,15 +214,13 @@ class Grid(SugarExt.Grid):
                 best_rect = new_rect
                 weight = new_weight
 
-        if best_rect:
-            self._child_rects[child] = best_rect
-            weight = self._shift_child(child, weight)
-
-        return weight
+        return best_rect, weight
 
     def __solve_collisions_cb(self):
         for i_ in range(_MAX_COLLISIONS_PER_REFRESH):
-            collision = self._collisions.pop(0)
+            if not self._collisions:
+                break
+            collision, value_ = self._collisions.popitem(last=False)
 
             old_rect = self._child_rects[collision]
             self.remove_weight(old_rect)
@@ -182,32 +231,32 @@ class Grid(SugarExt.Grid):
             # TODO: we shouldn't give up the first time we failed to find a
             # better position.
             if old_rect != self._child_rects[collision]:
+                self._index.remove(collision, old_rect)
+                self._index.add(collision, self._child_rects[collision])
                 self._detect_collisions(collision)
                 self.emit('child-changed', collision)
                 if weight > 0:
-                    self._collisions.append(collision)
+                    self._collisions[collision] = None
 
-            if not self._collisions:
-                self._collisions_sid = 0
-                return False
+        if not self._collisions:
+            self._collisions_sid = 0
+            return False
 
         return True
 
     def _detect_collisions(self, child):
         collision_found = False
         child_rect = self._child_rects[child]
-        for c in self._children:
+        for c in self._index.find(child_rect):
             intersects_, intersection = Gdk.rectangle_intersect(
                 child_rect, self._child_rects[c])
             if c != child and intersection.width > 0:
                 collision_found = True
-                if (c not in self._locked_children and
-                        c not in self._collisions):
-                    self._collisions.append(c)
+                if c not in self._locked_children:
+                    self._collisions.setdefault(c)
 
         if collision_found:
-            if child not in self._collisions:
-                self._collisions.append(child)
+            self._collisions.setdefault(child)
 
         if self._collisions and not self._collisions_sid:
             self._collisions_sid = \
@@ -59,6 +59,8 @@ class IconModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
 
         self._result_set.ready.connect(self.__result_set_ready_cb)
         self._result_set.progress.connect(self.__result_set_progress_cb)
+        self._result_set.entries_added.connect(
+            self.__result_set_entries_added_cb)
 
     def __result_set_ready_cb(self, **kwargs):
         self.emit('ready')
@@ -66,6 +68,12 @@ class IconModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
     def __result_set_progress_cb(self, **kwargs):
         self.emit('progress')
 
+    def __result_set_entries_added_cb(self, positions, **kwargs):
+        self._last_requested_index = None
+        for position in positions:
+            path = Gtk.TreePath((position,))
+            self.row_inserted(path, self.get_iter(path))
+
     def setup(self):
         self._result_set.setup()
 
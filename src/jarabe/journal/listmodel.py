@@ -17,6 +17,7 @@ import logging
 import time
 
 import json
+from collections import OrderedDict
 from gi.repository import GObject
 from gi.repository import Gtk
 from gettext import gettext as _
@@ -74,12 +75,24 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
 
     _PAGE_SIZE = 10
 
+    # Number of rows kept once computed, a few screens worth
+    _ROW_CACHE_SIZE = 100
+
+    # Not kept with the rows, the elapsed time changes as time goes by
+    _DATE_COLUMNS = {
+        COLUMN_TIMESTAMP: ('timestamp', 0),
+        COLUMN_CREATION_TIME: ('creation_time', None),
+    }
+
+    # Shown while the entry of a row is being fetched
+    _PLACEHOLDER_ROW = [None, False, None, None, '', '', '', '', 100,
+                        None, None, None]
+
     def __init__(self, query):
         GObject.GObject.__init__(self)
 
-        self._last_requested_index = None
         self._temp_drag_file_uid = None
-        self._cached_row = None
+        self._row_cache = OrderedDict()
         self._query = query
         self._all_ids = []
         t = time.time()
@@ -98,8 +111,17 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
 
         self._result_set.ready.connect(self.__result_set_ready_cb)
         self._result_set.progress.connect(self.__result_set_progress_cb)
+        self._result_set.entries_added.connect(
+            self.__result_set_entries_added_cb)
+        self._result_set.page_loaded.connect(
+            self.__result_set_page_loaded_cb)
+
+        model.updated.connect(self.__model_changed_cb)
+        model.deleted.connect(self.__model_changed_cb)
 
     def get_all_ids(self):
+        if self._all_ids is None:
+            self._all_ids = self._result_set.find_ids(self._query)
         return self._all_ids
 
     def __result_set_ready_cb(self, **kwargs):
@@ -111,6 +133,20 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
     def __result_set_progress_cb(self, **kwargs):
         self.emit('progress')
 
+    def __result_set_entries_added_cb(self, positions, **kwargs):
+        self._all_ids = None
+        for position in positions:
+            path = Gtk.TreePath((position,))
+            self.row_inserted(path, self.get_iter(path))
+
+    def __result_set_page_loaded_cb(self, positions, **kwargs):
+        for position in positions:
+            path = Gtk.TreePath((position,))
+            self.row_changed(path, self.get_iter(path))
+
+    def __model_changed_cb(self, sender, signal, object_id):
+        self._row_cache.pop(object_id, None)
+
     def setup(self, updated_callback=None):
         self._result_set.setup()
         self._updated_callback = updated_callback
@@ -141,6 +177,7 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
         if column == ListModel.COLUMN_TITLE:
             metadata['title'] = value
         self._updated_entries[metadata['uid']] = metadata
+        self._row_cache.pop(metadata['uid'], None)
         if self._updated_callback is not None:
             model.updated.disconnect(self._updated_callback)
         model.write(metadata, update_mtime=False,
@@ -155,60 +192,76 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
             return None
 
         index = iterator.user_data
-        if index == self._last_requested_index:
-            return self._cached_row[column]
-
         if index >= self._result_set.length:
             return None
 
+        # Do not wait for the datastore while the view is being drawn,
+        # the row is updated once its page has been fetched
         self._result_set.seek(index)
-        metadata = self._result_set.read()
+        metadata = self._result_set.read_cached()
+        if metadata is None:
+            return ListModel._PLACEHOLDER_ROW[column]
         metadata.update(self._updated_entries.get(metadata['uid'], {}))
 
-        self._last_requested_index = index
-        self._cached_row = []
-        self._cached_row.append(metadata['uid'])
-        self._cached_row.append(metadata.get('keep', '0') == '1')
-        self._cached_row.append(misc.get_icon_name(metadata))
+        if column in ListModel._DATE_COLUMNS:
+            key, default = ListModel._DATE_COLUMNS[column]
+            return self._get_elapsed_string(metadata.get(key, default))
+
+        # Rows are drawn many times while scrolling, keep the most
+        # recently used ones as long as their entry is not modified
+        uid = metadata['uid']
+        version = metadata.get('timestamp')
+        cached = self._row_cache.get(uid)
+        if cached is not None and cached[0] == version:
+            self._row_cache.move_to_end(uid)
+            return cached[1][column]
+
+        row = self._create_row(metadata)
+        self._row_cache[uid] = (version, row)
+        self._row_cache.move_to_end(uid)
+        if len(self._row_cache) > ListModel._ROW_CACHE_SIZE:
+            self._row_cache.popitem(last=False)
+        return row[column]
+
+    def _get_elapsed_string(self, timestamp):
+        try:
+            timestamp = float(timestamp)
+        except (TypeError, ValueError):
+            return _('Unknown')
+        return util.timestamp_to_elapsed_string(timestamp)
+
+    def _create_row(self, metadata):
+        row = []
+        row.append(metadata['uid'])
+        row.append(metadata.get('keep', '0') == '1')
+        row.append(misc.get_icon_name(metadata))
 
         if misc.is_activity_bundle(metadata):
             xo_color = XoColor('%s,%s' % (style.COLOR_BUTTON_GREY.get_svg(),
                                           style.COLOR_TRANSPARENT.get_svg()))
         else:
             xo_color = misc.get_icon_color(metadata)
-        self._cached_row.append(xo_color)
+        row.append(xo_color)
 
         title = GObject.markup_escape_text(metadata.get('title',
                                                         _('Untitled')))
-        self._cached_row.append('<b>%s</b>' % (title, ))
-
-        try:
-            timestamp = float(metadata.get('timestamp', 0))
-        except (TypeError, ValueError):
-            timestamp_content = _('Unknown')
-        else:
-            timestamp_content = util.timestamp_to_elapsed_string(timestamp)
-        self._cached_row.append(timestamp_content)
+        row.append('<b>%s</b>' % (title, ))
 
-        try:
-            creation_time = float(metadata.get('creation_time'))
-        except (TypeError, ValueError):
-            self._cached_row.append(_('Unknown'))
-        else:
-            self._cached_row.append(
-                util.timestamp_to_elapsed_string(float(creation_time)))
+        # The dates are computed in do_get_value()
+        row.append(None)
+        row.append(None)
 
         try:
             size = int(metadata.get('filesize'))
         except (TypeError, ValueError):
             size = None
-        self._cached_row.append(util.format_size(size))
+        row.append(util.format_size(size))
 
         try:
             progress = int(float(metadata.get('progress', 100)))
         except (TypeError, ValueError):
             progress = 100
-        self._cached_row.append(progress)
+        row.append(progress)
 
         buddies = []
         if metadata.get('buddies'):
@@ -231,12 +284,12 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
                     logging.warning('Malformed buddies for %r: %s',
                                     metadata['uid'], exception)
                 else:
-                    self._cached_row.append([nick, XoColor(color)])
+                    row.append([nick, XoColor(color)])
                     continue
 
-            self._cached_row.append(None)
+            row.append(None)
 
-        return self._cached_row[column]
+        return row
 
     def do_iter_nth_child(self, parent_iter, n):
         return (False, None)
@@ -309,7 +362,7 @@ class ListModel(GObject.GObject, Gtk.TreeModel, Gtk.TreeDragSource):
         self._selected = selected
 
     def select_all(self):
-        self._selected = self._all_ids[:]
+        self._selected = self.get_all_ids()[:]
 
     def select_none(self):
         self._selected = []
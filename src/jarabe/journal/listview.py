@@ -400,6 +400,9 @@ class BaseListView(Gtk.Bin):
 
     def _favorite_clicked_cb(self, cell, path):
         row = self._model[path]
+        if row[ListModel.COLUMN_UID] is None:
+            # The entry of the row is still being fetched
+            return
         iterator = self._model.get_iter(path)
         metadata = model.get(row[ListModel.COLUMN_UID])
         if not model.is_editable(metadata):
@@ -430,6 +433,8 @@ class BaseListView(Gtk.Bin):
     def __cell_select_toggled_cb(self, cell, path):
         tree_iter = self._model.get_iter(path)
         uid = self._model[tree_iter][ListModel.COLUMN_UID]
+        if uid is None:
+            return
         self._model.set_selected(uid, not cell.get_active())
         self.emit('selection-changed', len(self._model.get_selected_items()))
 
@@ -767,6 +772,8 @@ class ListView(BaseListView):
 
             if event.state & Gdk.ModifierType.CONTROL_MASK and keyname == 'F2':
                 row = self.tree_view.get_model()[path]
+                if row[ListModel.COLUMN_UID] is None:
+                    return
                 metadata = model.get(row[ListModel.COLUMN_UID])
                 self.cell_title.props.editable = model.is_editable(metadata)
 
@@ -780,7 +787,8 @@ class ListView(BaseListView):
             if keyname == 'Right':
                 tree_iter = self._model.get_iter(path)
                 uid = self._model[tree_iter][ListModel.COLUMN_UID]
-                self.emit('detail-clicked', uid)
+                if uid is not None:
+                    self.emit('detail-clicked', uid)
 
 
     def is_dragging(self):
@@ -801,6 +809,8 @@ class ListView(BaseListView):
         #        use our drag source code instead
         path, _column = self.tree_view.get_cursor()
         model = self.tree_view.get_model()
+        if model[path][ListModel.COLUMN_UID] is None:
+            return
         model.do_drag_data_get(path, selection)
 
     def __button_release_event_cb(self, tree_view, event):
@@ -819,6 +829,9 @@ class ListView(BaseListView):
             return
 
         row = self.tree_view.get_model()[path]
+        if row[ListModel.COLUMN_UID] is None:
+            # The entry of the row is still being fetched
+            return
         metadata = model.get(row[ListModel.COLUMN_UID])
         self.cell_title.props.editable = model.is_editable(metadata)
         if self.cell_title.props.editable:
@@ -829,10 +842,14 @@ class ListView(BaseListView):
 
     def __detail_cell_clicked_cb(self, cell, path):
         row = self.tree_view.get_model()[path]
+        if row[ListModel.COLUMN_UID] is None:
+            return
         self.emit('detail-clicked', row[ListModel.COLUMN_UID])
 
     def __icon_clicked_cb(self, cell, path):
         row = self.tree_view.get_model()[path]
+        if row[ListModel.COLUMN_UID] is None:
+            return
         metadata = model.get(row[ListModel.COLUMN_UID])
         if metadata['activity'] == PROJECT_BUNDLE_ID:
             self.emit('project-view-activate', metadata)
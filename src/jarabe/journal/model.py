@@ -20,9 +20,11 @@ import subprocess
 from datetime import datetime
 import time
 import tempfile
-from stat import S_IFLNK, S_IFMT, S_IFDIR, S_IFREG
-import re
-from operator import itemgetter
+from stat import S_IFMT, S_IFDIR, S_IFREG
+from threading import Thread
+from bisect import bisect_right
+from operator import attrgetter
+from collections import namedtuple, deque, OrderedDict
 import json
 from gettext import gettext as _
 
@@ -36,6 +38,9 @@ from sugar3 import dispatch
 from sugar3 import mime
 from sugar3 import util
 
+from jarabe.journal import mountindex
+from jarabe.journal import search
+
 
 DS_DBUS_SERVICE = 'org.laptop.sugar.DataStore'
 DS_DBUS_INTERFACE = 'org.laptop.sugar.DataStore'
@@ -47,40 +52,66 @@ PROPERTIES = ['activity', 'activity_id', 'buddies', 'bundle_id',
               'mountpoint', 'mtime', 'progress', 'timestamp', 'title', 'uid',
               'preview']
 
-MIN_PAGES_TO_CACHE = 3
 MAX_PAGES_TO_CACHE = 5
 
 JOURNAL_METADATA_DIR = '.Sugar-Metadata'
 
+# Directories modified less than this many seconds before being scanned
+# are not recorded in the mount index, as further changes within the
+# timestamp granularity of the file system (2 seconds on FAT) would go
+# unnoticed.
+_INDEX_RACY_INTERVAL = 2
+
+# Interval in seconds at which the thread scanning a mount point hands
+# the files it found to the main loop
+_SCAN_CHUNK_INTERVAL = 0.1
+
+# Merging a chunk into the sorted file list takes time proportional to
+# the size of the list, so chunks are handed over less often as it grows
+# to keep the share of main loop time spent merging below this ratio
+_SCAN_MERGE_LOAD = 0.1
+
+# The subset of a stat result _get_file_metadata needs
+_FileStat = namedtuple('_FileStat', ['st_mtime', 'st_size'])
+
 _datastore = None
 created = dispatch.Signal()
 updated = dispatch.Signal()
 deleted = dispatch.Signal()
 
 
-class _Cache(object):
+class _PageCache(object):
+    """The most recently used pages of a result set, by page number
 
-    __gtype_name__ = 'model_Cache'
+    At most max_pages pages are kept, adding a page to a full cache
+    evicts the least recently used one.
+    """
 
-    def __init__(self, entries=None):
-        self._array = []
-        if entries is not None:
-            self.append_all(entries)
+    def __init__(self, max_pages):
+        self._pages = OrderedDict()
+        self._max_pages = max_pages
 
-    def prepend_all(self, entries):
-        self._array[0:0] = entries
+    def __contains__(self, page):
+        return page in self._pages
 
-    def append_all(self, entries):
-        self._array += entries
+    def get(self, page):
+        entries = self._pages.get(page)
+        if entries is not None:
+            self._pages.move_to_end(page)
+        return entries
 
-    def __len__(self):
-        return len(self._array)
+    def put(self, page, entries):
+        self._pages[page] = entries
+        self._pages.move_to_end(page)
+        while len(self._pages) > self._max_pages:
+            self._pages.popitem(last=False)
 
-    def __getitem__(self, key):
-        return self._array[key]
+    def get_pages(self):
+        """Return the cached page numbers, least recently used first"""
+        return list(self._pages.keys())
 
-    def __delitem__(self, key):
-        del self._array[key]
+    def clear(self):
+        self._pages.clear()
 
 
 class BaseResultSet(object):
@@ -93,11 +124,21 @@ class BaseResultSet(object):
         self._query = query
         self._page_size = page_size
 
-        self._offset = 0
-        self._cache = _Cache()
+        self._cache = _PageCache(MAX_PAGES_TO_CACHE)
+        self._last_read_page = 0
+        self._prefetching_pages = set()
+        # Incremented when the cached pages become invalid, so pages
+        # being prefetched at that moment are discarded
+        self._cache_generation = 0
 
         self.ready = dispatch.Signal()
         self.progress = dispatch.Signal()
+        # Sent with the positions of the entries that were added after
+        # the ready signal, by result sets that find them progressively
+        self.entries_added = dispatch.Signal()
+        # Sent with the positions of the entries of a page that was
+        # fetched asynchronously
+        self.page_loaded = dispatch.Signal()
 
     def setup(self):
         self.ready.send(self)
@@ -107,11 +148,7 @@ class BaseResultSet(object):
 
     def get_length(self):
         if self._total_count == -1:
-            query = self._query.copy()
-            query['limit'] = self._page_size * MIN_PAGES_TO_CACHE
-            entries, self._total_count = self.find(query)
-            self._cache.append_all(entries)
-            self._offset = 0
+            self._fetch_page(0)
         return self._total_count
 
     length = property(get_length)
@@ -119,6 +156,24 @@ class BaseResultSet(object):
     def find(self, query):
         raise NotImplementedError()
 
+    def find_async(self, query, reply_handler, error_handler):
+        """Run find() and pass its results to reply_handler, or the
+        exception raised to error_handler, from the main loop.
+
+        Result sets that can query asynchronously override this, the
+        default implementation runs find() from an idle callback.
+        """
+        def idle_cb():
+            try:
+                entries, total_count = self.find(query)
+            except Exception as e:
+                error_handler(e)
+            else:
+                reply_handler(entries, total_count)
+            return False
+
+        GLib.idle_add(idle_cb)
+
     def seek(self, position):
         self._position = position
 
@@ -126,80 +181,93 @@ class BaseResultSet(object):
         if self._position == -1:
             self.seek(0)
 
-        if self._position < self._offset:
-            remaining_forward_entries = 0
-        else:
-            remaining_forward_entries = self._offset + len(self._cache) - \
-                self._position
-
-        if self._position > self._offset + len(self._cache):
-            remaining_backwards_entries = 0
-        else:
-            remaining_backwards_entries = self._position - self._offset
-
-        last_cached_entry = self._offset + len(self._cache)
-
-        if remaining_forward_entries <= 0 and remaining_backwards_entries <= 0:
-
-            # Total cache miss: remake it
-            limit = self._page_size * MIN_PAGES_TO_CACHE
-            offset = max(0, self._position - limit // 2)
-            logging.debug('remaking cache, offset: %r limit: %r', offset,
-                          limit)
-            query = self._query.copy()
-            query['limit'] = limit
-            query['offset'] = offset
-            entries, self._total_count = self.find(query)
+        page = self._position // self._page_size
+        entries = self._cache.get(page)
+        if entries is None:
+            logging.debug('page %r is not cached, fetching it', page)
+            entries = self._fetch_page(page)
 
-            del self._cache[:]
-            self._cache.append_all(entries)
-            self._offset = offset
+        self._prefetch_next_page(page)
+        return entries[self._position - page * self._page_size]
 
-        elif (remaining_forward_entries <= 0 and
-              remaining_backwards_entries > 0):
+    def read_cached(self):
+        """Like read, but never wait for the entry.
 
-            # Add one page to the end of cache
-            logging.debug('appending one more page, offset: %r',
-                          last_cached_entry)
-            query = self._query.copy()
-            query['limit'] = self._page_size
-            query['offset'] = last_cached_entry
-            entries, self._total_count = self.find(query)
-
-            # update cache
-            self._cache.append_all(entries)
+        Return None if the page of the entry is not cached, the page is
+        then fetched asynchronously and page_loaded is sent when it
+        arrives.
+        """
+        if self._position == -1:
+            self.seek(0)
 
-            # apply the cache limit
-            cache_limit = self._page_size * MAX_PAGES_TO_CACHE
-            objects_excess = len(self._cache) - cache_limit
-            if objects_excess > 0:
-                self._offset += objects_excess
-                del self._cache[:objects_excess]
+        page = self._position // self._page_size
+        entries = self._cache.get(page)
+        if entries is None:
+            self._prefetch_page(page)
+            return None
 
-        elif remaining_forward_entries > 0 and \
-                remaining_backwards_entries <= 0 and self._offset > 0:
+        self._prefetch_next_page(page)
+        return entries[self._position - page * self._page_size]
 
-            # Add one page to the beginning of cache
-            limit = min(self._offset, self._page_size)
-            self._offset = max(0, self._offset - limit)
+    def _prefetch_next_page(self, page):
+        # Prefetch the page the view is scrolling to
+        if page < self._last_read_page:
+            self._prefetch_page(page - 1)
+        else:
+            self._prefetch_page(page + 1)
+        self._last_read_page = page
+
+    def _get_page_query(self, page):
+        query = self._query.copy()
+        query['limit'] = self._page_size
+        query['offset'] = page * self._page_size
+        return query
+
+    def _fetch_page(self, page):
+        entries, self._total_count = self.find(self._get_page_query(page))
+        self._cache.put(page, entries)
+        return entries
+
+    def _prefetch_page(self, page):
+        if page < 0 or page * self._page_size >= self._total_count or \
+                page in self._cache or page in self._prefetching_pages:
+            return
 
-            logging.debug('prepending one more page, offset: %r limit: %r',
-                          self._offset, limit)
-            query = self._query.copy()
-            query['limit'] = limit
-            query['offset'] = self._offset
-            entries, self._total_count = self.find(query)
+        self._prefetching_pages.add(page)
+        cache_generation = self._cache_generation
 
-            # update cache
-            self._cache.prepend_all(entries)
+        def reply_handler(entries, total_count):
+            if cache_generation != self._cache_generation:
+                return
+            if total_count != self._total_count:
+                # Entries were added or removed since the result set was
+                # counted, the cached pages may be shifted. The page is
+                # thrown away, the view is refreshed on the data store
+                # signals and counts the entries again.
+                logging.debug('result set changed while prefetching page '
+                              '%r', page)
+                self._invalidate_cache()
+                return
+            self._prefetching_pages.discard(page)
+            self._cache.put(page, entries)
+            start = page * self._page_size
+            self.page_loaded.send(
+                self, positions=range(start, start + len(entries)))
+
+        def error_handler(error):
+            if cache_generation != self._cache_generation:
+                return
+            self._prefetching_pages.discard(page)
+            logging.error('Could not prefetch page %r: %s', page, error)
 
-            # apply the cache limit
-            cache_limit = self._page_size * MAX_PAGES_TO_CACHE
-            objects_excess = len(self._cache) - cache_limit
-            if objects_excess > 0:
-                del self._cache[-objects_excess:]
+        logging.debug('prefetching page %r', page)
+        self.find_async(self._get_page_query(page), reply_handler,
+                        error_handler)
 
-        return self._cache[self._position - self._offset]
+    def _invalidate_cache(self):
+        self._cache.clear()
+        self._prefetching_pages.clear()
+        self._cache_generation += 1
 
 
 class DatastoreResultSet(BaseResultSet):
@@ -230,12 +298,38 @@ class DatastoreResultSet(BaseResultSet):
 
         return entries, total_count
 
+    def find_async(self, query, reply_handler, error_handler):
+        def find_reply_handler(entries, total_count):
+            for entry in entries:
+                entry['mountpoint'] = '/'
+            reply_handler(entries, total_count)
+
+        _call_datastore('find', query, PROPERTIES, byte_arrays=True,
+                        reply_handler=find_reply_handler,
+                        error_handler=error_handler)
+
     def find_ids(self, query):
         copy = query.copy()
         copy.pop('mountpoints', '/')
         return _call_datastore('find_ids', copy)
 
 
+class _FileInfo(object):
+    """A file found on a mount point
+
+    Scans can find hundreds of thousands of files, so keep the record
+    small.
+    """
+
+    __slots__ = ('path', 'mtime', 'size', 'metadata')
+
+    def __init__(self, path, mtime, size, metadata):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.metadata = metadata
+
+
 class InplaceResultSet(BaseResultSet):
     """Encapsulates the result of a query on a mount point
     """
@@ -244,21 +338,22 @@ class InplaceResultSet(BaseResultSet):
         BaseResultSet.__init__(self, query, page_size)
         self._mount_point = mount_point
         self._file_list = None
-        self._pending_directories = []
-        self._visited_directories = []
-        self._pending_files = []
+        self._sort_keys = None
+        self._is_ready = False
+        self._index = None
+        self._pending_directories = deque()
+        self._visited_directories = set()
+        self._indexed_directories = []
+        self._pending_files = deque()
+        self._merge_duration = 0
         self._stopped = False
 
         query_text = query.get('query', '')
-        if query_text.startswith('"') and query_text.endswith('"'):
-            self._regex = re.compile('*%s*' % query_text.strip(['"']))
-        elif query_text:
-            expression = ''
-            for word in query_text.split(' '):
-                expression += '(?=.*%s.*)' % word
-            self._regex = re.compile(expression, re.IGNORECASE)
+        if query_text.strip():
+            self._text_query = search.TextQuery(query_text)
         else:
-            self._regex = None
+            self._text_query = None
+        self._text_matches = None
 
         if query.get('timestamp', ''):
             self._date_start = int(query['timestamp']['start'])
@@ -274,25 +369,35 @@ class InplaceResultSet(BaseResultSet):
         self._mime_types = query.get('mime_type', [])
 
         self._sort = query.get('order_by', ['+timestamp'])[0]
+        if self._sort[1:] == 'filesize':
+            self._keygetter = attrgetter('size')
+        else:
+            # timestamp
+            self._keygetter = attrgetter('mtime')
+        self._reverse = not self._sort[0] == '-'
 
     def setup(self):
         self._file_list = []
-        self._pending_directories = [self._mount_point]
-        self._visited_directories = []
-        self._pending_files = []
-        GLib.idle_add(self._scan)
+        self._sort_keys = []
+        self._is_ready = False
+        self._index = mountindex.get_index(self._mount_point)
+        self._pending_directories = deque([self._mount_point])
+        self._visited_directories = set()
+        self._indexed_directories = []
+        self._pending_files = deque()
+
+        # The scan runs in a thread so reading a slow device does not
+        # block the UI, the files found are added to _file_list from the
+        # main loop, see _add_scanned_files
+        thread = Thread(target=self._scan_thread_func)
+        thread.daemon = True
+        thread.start()
 
     def stop(self):
         self._stopped = True
 
     def setup_ready(self):
-        if self._sort[1:] == 'filesize':
-            keygetter = itemgetter(3)
-        else:
-            # timestamp
-            keygetter = itemgetter(2)
-        self._file_list.sort(key=keygetter,
-                             reverse=not self._sort[0] == '-')
+        self._is_ready = True
         self.ready.send(self)
 
     def find(self, query):
@@ -311,11 +416,8 @@ class InplaceResultSet(BaseResultSet):
         files = self._file_list[offset:offset + limit]
 
         entries = []
-        for file_path, stat, mtime_, size_, metadata in files:
-            if metadata is None:
-                metadata = _get_file_metadata(file_path, stat)
-            metadata['mountpoint'] = self._mount_point
-            entries.append(metadata)
+        for file_info in files:
+            entries.append(self._get_entry(file_info))
 
         logging.debug('InplaceResultSet.find took %f s.', time.time() - t)
 
@@ -328,91 +430,144 @@ class InplaceResultSet(BaseResultSet):
         if self._stopped:
             raise ValueError('InplaceResultSet already stopped')
 
-        ids = []
-        for file_path, stat, mtime_, size_, metadata in self._file_list:
-            ids.append(file_path)
-        return ids
+        return [file_info.path for file_info in self._file_list]
+
+    def _get_entry(self, file_info):
+        metadata = file_info.metadata
+        if metadata is None:
+            metadata = _get_file_metadata(
+                file_info.path, _FileStat(file_info.mtime, file_info.size))
+        else:
+            # metadata is shared with the mount index
+            metadata = metadata.copy()
+        metadata['mountpoint'] = self._mount_point
+        return metadata
+
+    def _scan_thread_func(self):
+        # A previous scan of the same mount point may still be running
+        # until it notices it was stopped
+        with self._index.lock:
+            self._scan()
 
     def _scan(self):
+        if self._text_query is not None:
+            # Entries indexed by previous scans are matched at once, the
+            # others as they are found
+            self._text_matches = self._text_query.search(self._index.terms)
+
+        file_infos = []
+        next_chunk_time = time.monotonic() + _SCAN_CHUNK_INTERVAL
+        while self._pending_files or self._pending_directories:
+            if self._stopped:
+                self._index.save()
+                return
+
+            if self._pending_files:
+                file_info = self._scan_a_file()
+                if file_info is not None:
+                    file_infos.append(file_info)
+            else:
+                self._scan_a_directory()
+
+            if time.monotonic() > next_chunk_time:
+                GLib.idle_add(self._add_scanned_files, file_infos)
+                file_infos = []
+                interval = max(_SCAN_CHUNK_INTERVAL,
+                               self._merge_duration / _SCAN_MERGE_LOAD)
+                next_chunk_time = time.monotonic() + interval
+
+        self._index.retain(self._indexed_directories)
+        self._index.save()
+        self._visited_directories = set()
+        self._indexed_directories = []
+        GLib.idle_add(self._add_scanned_files, file_infos, True)
+
+    def _add_scanned_files(self, file_infos, finished=False):
         if self._stopped:
             return False
 
-        self.progress.send(self)
-
-        if self._pending_files:
-            self._scan_a_file()
-            return True
-
-        if self._pending_directories:
-            self._scan_a_directory()
-            return True
+        start = time.monotonic()
+        positions = self._merge_file_infos(file_infos)
+
+        # Results are shown as soon as the first page is known, the rest
+        # of the files are inserted as they are found
+        if self._is_ready:
+            if positions:
+                self._update_cache()
+                self.entries_added.send(self, positions=positions)
+        elif finished or len(self._file_list) >= self._page_size:
+            self.setup_ready()
+        else:
+            self.progress.send(self)
 
-        self.setup_ready()
-        self._visited_directories = []
+        self._merge_duration = time.monotonic() - start
         return False
 
+    def _merge_file_infos(self, file_infos):
+        """Add file_infos to _file_list, keeping it sorted, and return the
+        positions they were inserted at in ascending order.
+        """
+        file_infos.sort(key=self._keygetter, reverse=self._reverse)
+
+        # _sort_keys holds the ascending keys of _file_list, new entries
+        # go after the existing ones with the same key
+        keys = []
+        positions = []
+        for rank, file_info in enumerate(file_infos):
+            key = self._keygetter(file_info)
+            if self._reverse:
+                key = -key
+            keys.append(key)
+            positions.append(bisect_right(self._sort_keys, key) + rank)
+
+        # Both lists are made of two sorted runs, which sort() merges in
+        # linear time
+        self._sort_keys.extend(keys)
+        self._sort_keys.sort()
+        self._file_list.extend(file_infos)
+        self._file_list.sort(key=self._keygetter, reverse=self._reverse)
+
+        return positions
+
+    def _update_cache(self):
+        if self._total_count != -1:
+            self._total_count = len(self._file_list)
+
+        # Entries shifted into the cached pages are read, the ones that
+        # were cached already are reused
+        pages = self._cache.get_pages()
+        cached_entries = {}
+        for page in pages:
+            for metadata in self._cache.get(page):
+                cached_entries[metadata['uid']] = metadata
+
+        self._invalidate_cache()
+        for page in pages:
+            start = page * self._page_size
+            entries = []
+            for file_info in self._file_list[start:start + self._page_size]:
+                metadata = cached_entries.get(file_info.path)
+                if metadata is None:
+                    metadata = self._get_entry(file_info)
+                entries.append(metadata)
+            if entries:
+                self._cache.put(page, entries)
+
     def _scan_a_file(self):
-        full_path = self._pending_files.pop(0)
+        """Return the file_info of the next pending file, or None if the
+        file does not match the query.
+        """
+        full_path, entry = self._pending_files.popleft()
+        mtime, size = entry[1:3]
         metadata = None
 
-        try:
-            stat = os.lstat(full_path)
-        except OSError as e:
-            if e.errno != errno.ENOENT:
-                logging.exception(
-                    'Error reading metadata of file %r', full_path)
+        if self._text_query is not None and \
+                not self._match_text_query(full_path, entry):
             return
 
-        if S_IFMT(stat.st_mode) == S_IFLNK:
-            try:
-                link = os.readlink(full_path)
-            except OSError as e:
-                logging.exception(
-                    'Error reading target of link %r', full_path)
-                return
-
-            if not os.path.abspath(link).startswith(self._mount_point):
-                return
-
-            try:
-                stat = os.stat(full_path)
-
-            except OSError as e:
-                if e.errno != errno.ENOENT:
-                    logging.exception(
-                        'Error reading metadata of linked file %r', full_path)
-                return
-
-        if S_IFMT(stat.st_mode) == S_IFDIR:
-            id_tuple = stat.st_ino, stat.st_dev
-            if id_tuple not in self._visited_directories:
-                self._visited_directories.append(id_tuple)
-                self._pending_directories.append(full_path)
-            return
-
-        if S_IFMT(stat.st_mode) != S_IFREG:
-            return
-
-        if self._regex is not None and \
-                not self._regex.match(full_path):
-            metadata = _get_file_metadata(full_path, stat,
-                                          fetch_preview=False)
-            if not metadata:
-                return
-            add_to_list = False
-            for f in ['fulltext', 'title',
-                      'description', 'tags']:
-                if f in metadata and \
-                        self._regex.match(metadata[f]):
-                    add_to_list = True
-                    break
-            if not add_to_list:
-                return
-
         if self._only_favorites:
             if not metadata:
-                metadata = _get_file_metadata(full_path, stat,
-                                              fetch_preview=False)
+                metadata = self._get_indexed_metadata(full_path, entry)
             if 'keep' not in metadata:
                 return
             try:
@@ -423,16 +578,15 @@ class InplaceResultSet(BaseResultSet):
 
         if self._filter_by_activity:
             if not metadata:
-                metadata = _get_file_metadata(full_path, stat,
-                                              fetch_preview=False)
+                metadata = self._get_indexed_metadata(full_path, entry)
             if 'activity' not in metadata or \
                     metadata['activity'] != self._filter_by_activity:
                 return
 
-        if self._date_start is not None and stat.st_mtime < self._date_start:
+        if self._date_start is not None and mtime < self._date_start:
             return
 
-        if self._date_end is not None and stat.st_mtime > self._date_end:
+        if self._date_end is not None and mtime > self._date_end:
             return
 
         if self._mime_types:
@@ -441,27 +595,155 @@ class InplaceResultSet(BaseResultSet):
             if mime_type not in self._mime_types:
                 return
 
-        file_info = (full_path, stat, int(stat.st_mtime), stat.st_size,
-                     metadata)
-        self._file_list.append(file_info)
+        return _FileInfo(full_path, mtime, size, metadata)
 
-        return
+    def _match_text_query(self, full_path, entry):
+        term_index = self._index.terms
+        relative_path = full_path[len(self._mount_point) + 1:]
+
+        if full_path in term_index:
+            if full_path not in self._text_matches:
+                return False
+        else:
+            metadata = self._get_indexed_metadata(full_path, entry)
+            terms = search.get_entry_terms(relative_path, metadata)
+            term_index.add(full_path, terms)
+            if not self._text_query.match_terms(terms):
+                return False
+
+        if self._text_query.is_phrase():
+            metadata = self._get_indexed_metadata(full_path, entry)
+            texts = search.get_entry_texts(relative_path, metadata)
+            return self._text_query.match_texts(texts)
+        return True
+
+    def _get_indexed_metadata(self, full_path, entry):
+        """Return the metadata of a file without the preview, reading it
+        only if it is not in the mount index yet.
+        """
+        if entry[3] is None:
+            entry[3] = _get_file_metadata(full_path, _FileStat(*entry[1:3]),
+                                          fetch_preview=False)
+            self._index.mark_changed()
+        return entry[3]
 
     def _scan_a_directory(self):
-        dir_path = self._pending_directories.pop(0)
+        dir_path = self._pending_directories.popleft()
 
         try:
-            entries = os.listdir(dir_path)
+            dir_stat = os.stat(dir_path)
         except OSError as e:
-            if e.errno != errno.EACCES:
+            if e.errno != errno.ENOENT:
                 logging.exception('Error reading directory %r', dir_path)
             return
 
-        for entry in entries:
-            if entry.startswith('.'):
-                continue
-            self._pending_files.append(dir_path + '/' + entry)
-        return
+        id_tuple = dir_stat.st_ino, dir_stat.st_dev
+        if id_tuple in self._visited_directories:
+            return
+        self._visited_directories.add(id_tuple)
+
+        key = self._get_directory_key(dir_path, dir_stat)
+        entries = self._index.lookup(dir_path, key)
+        if entries is None:
+            entries = self._read_directory(dir_path)
+            if entries is None:
+                return
+            # Terms found in a scan where the directory could not be
+            # recorded are not forgotten by lookup()
+            self._index.forget_entry_terms(dir_path, entries)
+            last_change = max(key[0], key[2] or 0)
+            if time.time() - last_change > _INDEX_RACY_INTERVAL:
+                self._index.set_directory(dir_path, key, entries)
+        self._indexed_directories.append(dir_path)
+
+        for name, entry in entries.items():
+            full_path = dir_path + '/' + name
+            if entry[0] == 'l':
+                entry = self._resolve_link(full_path)
+                if entry is None:
+                    continue
+            if entry[0] == 'd':
+                self._pending_directories.append(full_path)
+            else:
+                self._pending_files.append((full_path, entry))
+
+    def _get_directory_key(self, dir_path, dir_stat):
+        if dir_path == self._mount_point:
+            metadata_path = os.path.join(dir_path, JOURNAL_METADATA_DIR)
+        else:
+            subdir = os.path.relpath(dir_path, self._mount_point)
+            metadata_path = os.path.join(self._mount_point,
+                                         JOURNAL_METADATA_DIR, subdir)
+        try:
+            metadata_mtime = os.stat(metadata_path).st_mtime
+        except OSError:
+            metadata_mtime = None
+
+        return dir_stat.st_mtime, dir_stat.st_ino, metadata_mtime
+
+    def _read_directory(self, dir_path):
+        """Return the entries of a directory in the format used by the
+        mount index: ['d'] for directories, ['l'] for symbolic links, which
+        are resolved on every scan, and ['f', mtime, size, metadata] for
+        regular files.
+        """
+        entries = {}
+        try:
+            # The type of an entry usually comes with the directory
+            # listing, so only regular files need to be stat'ed
+            with os.scandir(dir_path) as iterator:
+                for dir_entry in iterator:
+                    if dir_entry.name.startswith('.'):
+                        continue
+                    entry = self._read_directory_entry(dir_entry)
+                    if entry is not None:
+                        entries[dir_entry.name] = entry
+        except OSError as e:
+            if e.errno != errno.EACCES:
+                logging.exception('Error reading directory %r', dir_path)
+            return None
+
+        return entries
+
+    def _read_directory_entry(self, dir_entry):
+        try:
+            if dir_entry.is_symlink():
+                return ['l']
+            if dir_entry.is_dir(follow_symlinks=False):
+                return ['d']
+            if dir_entry.is_file(follow_symlinks=False):
+                stat = dir_entry.stat(follow_symlinks=False)
+                return ['f', stat.st_mtime, stat.st_size, None]
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logging.exception(
+                    'Error reading metadata of file %r', dir_entry.path)
+        return None
+
+    def _resolve_link(self, full_path):
+        try:
+            link = os.readlink(full_path)
+        except OSError:
+            logging.exception(
+                'Error reading target of link %r', full_path)
+            return None
+
+        if not os.path.abspath(link).startswith(self._mount_point):
+            return None
+
+        try:
+            stat = os.stat(full_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logging.exception(
+                    'Error reading metadata of linked file %r', full_path)
+            return None
+
+        if S_IFMT(stat.st_mode) == S_IFDIR:
+            return ['d']
+        if S_IFMT(stat.st_mode) == S_IFREG:
+            return ['f', stat.st_mtime, stat.st_size, None]
+        return None
 
 
 def _get_file_metadata(path, stat, fetch_preview=True):
@@ -542,6 +824,15 @@ def _get_file_metadata_from_json(path, fetch_preview):
     return metadata
 
 
+def activate_datastore():
+    """Start the data store service if it is not running yet.
+
+    It blocks until the service is up, but does not use the main loop,
+    so it can be called from a thread.
+    """
+    dbus.SessionBus().activate_name_owner(DS_DBUS_SERVICE)
+
+
 def _get_datastore():
     global _datastore
     if _datastore is None:
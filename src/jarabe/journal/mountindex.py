@@ -0,0 +1,223 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent index of the files found on a removable device or in the
+documents folder.
+
+The index remembers, for every directory scanned on a mount point, the
+entries it contained and the metadata read for them. A directory record
+is keyed by the modification time and inode of the directory and of its
+.Sugar-Metadata counterpart, so a record is only reused while nothing was
+added to, removed from or renamed in either of them.
+
+Indexes are stored in the profile, one file per mount, and are named
+after the UUID of the volume and the path it is mounted on. The terms of
+the entries that were searched are only kept in memory.
+"""
+
+import os
+import json
+import logging
+import hashlib
+import tempfile
+from threading import Lock
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+from sugar3 import env
+
+from jarabe.journal.search import TermIndex
+
+
+_INDEX_VERSION = 1
+
+# Maximum number of index files kept in the profile, the ones that were
+# not updated for the longest time are removed first.
+_MAX_INDEXES = 16
+
+_indexes = {}
+
+
+class MountIndex(object):
+    """Directory records of a single mount point
+
+    Records are plain dictionaries mapping an entry name to a list, so
+    they can be stored as JSON and updated in place while scanning.
+
+    The index is not thread safe, scans must hold lock while using it.
+    """
+
+    def __init__(self, mount_point, uuid, path):
+        self._mount_point = mount_point
+        self._uuid = uuid
+        self._path = path
+        self._directories = {}
+        self._changed = False
+        self.lock = Lock()
+        self.terms = TermIndex()
+
+    def load(self):
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path) as index_file:
+                data = json.load(index_file)
+        except (ValueError, EnvironmentError):
+            logging.exception('Could not read the index of %r',
+                              self._mount_point)
+            return
+
+        if data.get('version') != _INDEX_VERSION or \
+                data.get('uuid') != self._uuid or \
+                data.get('mount_point') != self._mount_point:
+            logging.debug('Discarding outdated index of %r',
+                          self._mount_point)
+            return
+
+        self._directories = data['directories']
+
+    def save(self):
+        if not self._changed:
+            return
+
+        data = {'version': _INDEX_VERSION,
+                'uuid': self._uuid,
+                'mount_point': self._mount_point,
+                'directories': self._directories}
+
+        dir_path = os.path.dirname(self._path)
+        os.makedirs(dir_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=dir_path)
+        try:
+            with os.fdopen(fd, 'w') as index_file:
+                json.dump(data, index_file)
+            os.rename(temp_path, self._path)
+        except (TypeError, ValueError, EnvironmentError):
+            logging.exception('Could not write the index of %r',
+                              self._mount_point)
+            os.unlink(temp_path)
+            return
+
+        self._changed = False
+        _remove_old_indexes(dir_path)
+
+    def lookup(self, dir_path, key):
+        """Return the entries recorded for dir_path, or None if the
+        directory was not indexed or key does not match anymore, in
+        which case the outdated record and its terms are forgotten.
+        """
+        relative_path = self._get_relative_path(dir_path)
+        record = self._directories.get(relative_path)
+        if record is None:
+            return None
+        if record['key'] != list(key):
+            # The directory may not be indexed again right away, do not
+            # keep matching its old entries meanwhile
+            self._forget_terms(relative_path)
+            del self._directories[relative_path]
+            self._changed = True
+            return None
+        return record['entries']
+
+    def set_directory(self, dir_path, key, entries):
+        relative_path = self._get_relative_path(dir_path)
+        if relative_path in self._directories:
+            self._forget_terms(relative_path)
+        self._directories[relative_path] = {
+            'key': list(key),
+            'entries': entries}
+        self._changed = True
+
+    def retain(self, dir_paths):
+        """Forget the directories that are not in dir_paths."""
+        relative_paths = set(self._get_relative_path(dir_path)
+                             for dir_path in dir_paths)
+        for relative_path in list(self._directories.keys()):
+            if relative_path not in relative_paths:
+                self._forget_terms(relative_path)
+                del self._directories[relative_path]
+                self._changed = True
+
+    def forget_entry_terms(self, dir_path, names):
+        """Forget the terms of the entries of dir_path, which are listed
+        again and may have changed since.
+        """
+        for name in names:
+            self.terms.remove(dir_path + '/' + name)
+
+    def mark_changed(self):
+        """Entries returned by lookup() were modified in place."""
+        self._changed = True
+
+    def _get_relative_path(self, dir_path):
+        return os.path.relpath(dir_path, self._mount_point)
+
+    def _forget_terms(self, relative_path):
+        dir_path = os.path.normpath(
+            os.path.join(self._mount_point, relative_path))
+        for name in self._directories[relative_path]['entries']:
+            self.terms.remove(dir_path + '/' + name)
+
+
+def _get_volume_uuid(mount_point):
+    try:
+        mount = Gio.File.new_for_path(mount_point).find_enclosing_mount(None)
+    except GLib.Error:
+        # ~/Documents usually is not on a mount known to GIO
+        return ''
+
+    uuid = mount.get_uuid()
+    if not uuid and mount.get_volume() is not None:
+        uuid = mount.get_volume().get_uuid()
+    return uuid or ''
+
+
+def _get_index_dir():
+    return env.get_profile_path('journal-index')
+
+
+def _remove_old_indexes(dir_path):
+    try:
+        names = os.listdir(dir_path)
+    except OSError:
+        return
+
+    paths = [os.path.join(dir_path, name) for name in names
+             if name.endswith('.json')]
+    if len(paths) <= _MAX_INDEXES:
+        return
+
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:-_MAX_INDEXES]:
+        try:
+            os.unlink(path)
+        except OSError:
+            logging.exception('Could not remove old index %r', path)
+
+
+def get_index(mount_point):
+    """Return the MountIndex of mount_point, loading it if needed."""
+    uuid = _get_volume_uuid(mount_point)
+    key = '%s:%s' % (uuid, mount_point)
+    if key not in _indexes:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        path = os.path.join(_get_index_dir(), digest + '.json')
+        index = MountIndex(mount_point, uuid, path)
+        index.load()
+        _indexes[key] = index
+    return _indexes[key]
@@ -233,6 +233,7 @@ class ChooserListView(BaseListView):
 
         path, column_, x_, y_ = pos
         uid = tree_view.get_model()[path][ListModel.COLUMN_UID]
-        self.emit('entry-activated', uid)
+        if uid is not None:
+            self.emit('entry-activated', uid)
 
         return False
@@ -0,0 +1,142 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Full text search of the entries found on a mount point.
+
+Entries and queries are split in case folded terms. An entry matches a
+query when every word of the query is contained in one of the terms of
+the entry, so "cat" finds "Cats.jpg". A quoted query must also appear as
+a whole in the path, title, description, tags or full text of the entry.
+"""
+
+import re
+
+
+# Properties searched besides the path of an entry
+TEXT_PROPERTIES = ['title', 'description', 'tags', 'fulltext']
+
+_SEPARATORS = re.compile(r'[\s/]+')
+
+
+def get_terms(text):
+    """Return the set of case folded terms of text"""
+    return set(term for term in _SEPARATORS.split(text.casefold()) if term)
+
+
+def get_entry_texts(path, metadata):
+    texts = [path]
+    for name in TEXT_PROPERTIES:
+        value = metadata.get(name)
+        if value:
+            texts.append(str(value))
+    return texts
+
+
+def get_entry_terms(path, metadata):
+    terms = set()
+    for text in get_entry_texts(path, metadata):
+        terms.update(get_terms(text))
+    return terms
+
+
+class TextQuery(object):
+    """A parsed full text query"""
+
+    def __init__(self, query_text):
+        query_text = query_text.strip()
+        if len(query_text) > 1 and query_text.startswith('"') and \
+                query_text.endswith('"'):
+            self._phrase = query_text[1:-1].casefold()
+            words = get_terms(self._phrase)
+        else:
+            self._phrase = None
+            words = get_terms(query_text)
+
+        # Longer words match fewer terms, try them first
+        self._words = sorted(words, key=len, reverse=True)
+
+    def is_phrase(self):
+        return self._phrase is not None
+
+    def match_terms(self, terms):
+        for word in self._words:
+            for term in terms:
+                if word in term:
+                    break
+            else:
+                return False
+        return True
+
+    def match_texts(self, texts):
+        """Check a quoted query against the texts of an entry, the terms
+        of the entry must have matched already.
+        """
+        if self._phrase is None:
+            return True
+        for text in texts:
+            if self._phrase in text.casefold():
+                return True
+        return False
+
+    def search(self, term_index):
+        """Return the keys of the entries of term_index whose terms match
+        this query.
+        """
+        return term_index.search(self._words)
+
+
+class TermIndex(object):
+    """Inverted index from terms to the keys of the entries containing
+    them
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._entry_terms = {}
+
+    def __contains__(self, key):
+        return key in self._entry_terms
+
+    def add(self, key, terms):
+        self.remove(key)
+        self._entry_terms[key] = terms
+        for term in terms:
+            self._postings.setdefault(term, set()).add(key)
+
+    def remove(self, key):
+        terms = self._entry_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            keys = self._postings[term]
+            keys.discard(key)
+            if not keys:
+                del self._postings[term]
+
+    def search(self, words):
+        """Return the keys of the entries with, for every word, a term
+        containing it.
+        """
+        result = set(self._entry_terms.keys())
+        for word in words:
+            keys = set()
+            for term, term_keys in self._postings.items():
+                if word in term:
+                    keys.update(term_keys)
+            result.intersection_update(keys)
+            if not result:
+                break
+        return result
@@ -23,6 +23,10 @@ import logging
 
 logging.debug('STARTUP: Starting the shell')
 
+from jarabe import startuptrace
+startuptrace.start()
+startuptrace.begin('imports')
+
 import os
 import sys
 import subprocess
@@ -57,20 +61,14 @@ gi.require_version('GdkX11', '3.0')
 from gi.repository import Gio
 from gi.repository import GLib
 from gi.repository import Gtk
-from gi.repository import Gst
 from gi.repository import Wnck
 
 from sugar3 import env
 
 from jarabe.model.session import get_session_manager
-from jarabe.model.update import updater
+from jarabe.model import bundleregistry
 from jarabe.model import screen
-from jarabe.view import keyhandler
-from jarabe.view import gesturehandler
 from jarabe.view import cursortracker
-from jarabe.journal import journalactivity
-from jarabe.model import notifications
-from jarabe.model import filetransfer
 from jarabe.view import launcher
 from jarabe.model import keyboard
 from jarabe.desktop import homewindow
@@ -78,18 +76,23 @@ from jarabe.model.sound import sound
 from jarabe import intro
 from jarabe.intro.window import IntroWindow
 from jarabe.intro.window import create_profile_with_nickname
-from jarabe import frame
 from jarabe.view.service import UIService
-from jarabe import apisocket
-from jarabe import testrunner
 from jarabe.model import brightness
+from jarabe.util import downloader
+from jarabe.startupscheduler import StartupScheduler
+
+# The frame, the Journal, the services and GStreamer are not needed to
+# show the home window, the callbacks setting them up after it import
+# them.
 
+startuptrace.end('imports')
 
 _metacity_process = None
 _window_manager_started = False
 _starting_desktop = False
 
 
+@startuptrace.traced
 def unfreeze_screen_cb():
     logging.debug('STARTUP: unfreeze_screen_cb')
     screen.unfreeze()
@@ -97,19 +100,25 @@ def unfreeze_screen_cb():
 
 def setup_frame_cb():
     logging.debug('STARTUP: setup_frame_cb')
+    from jarabe import frame
     frame.get_view()
 
 
 def setup_keyhandler_cb():
     logging.debug('STARTUP: setup_keyhandler_cb')
+    from jarabe import frame
+    from jarabe.view import keyhandler
     keyhandler.setup(frame.get_view())
 
 
 def setup_gesturehandler_cb():
     logging.debug('STARTUP: setup_gesturehandler_cb')
+    from jarabe import frame
+    from jarabe.view import gesturehandler
     gesturehandler.setup(frame.get_view())
 
 
+@startuptrace.traced
 def setup_cursortracker_cb():
     logging.debug('STARTUP: setup_cursortracker_cb')
     cursortracker.setup()
@@ -117,17 +126,41 @@ def setup_cursortracker_cb():
 
 def setup_journal_cb():
     logging.debug('STARTUP: setup_journal_cb')
+    from jarabe.journal import journalactivity
     journalactivity.start()
 
 
 def setup_notification_service_cb():
+    from jarabe.model import notifications
     notifications.init()
 
 
 def setup_file_transfer_cb():
+    from jarabe.model import filetransfer
     filetransfer.init()
 
 
+def setup_apisocket_cb():
+    from jarabe import apisocket
+    apisocket.start()
+
+
+def setup_gstreamer_cb():
+    from gi.repository import Gst
+    Gst.init(sys.argv)
+
+
+def activate_datastore_cb():
+    from jarabe.journal import model
+    model.activate_datastore()
+
+
+def startup_periodic_update_cb():
+    from jarabe.model.update import updater
+    updater.startup_periodic_update()
+    return False
+
+
 def setup_window_manager():
     logging.debug('STARTUP: window_manager')
 
@@ -145,18 +178,28 @@ def __window_manager_changed_cb(screen):
 
 
 def _complete_desktop_startup():
-    launcher.setup()
-
-    GLib.idle_add(setup_frame_cb)
-    GLib.idle_add(setup_keyhandler_cb)
-    GLib.idle_add(setup_gesturehandler_cb)
-    GLib.idle_add(setup_journal_cb)
-    GLib.idle_add(setup_notification_service_cb)
-    GLib.idle_add(setup_file_transfer_cb)
-    GLib.timeout_add_seconds(600, updater.startup_periodic_update)
-
-    apisocket.start()
-
+    with startuptrace.phase('launcher'):
+        launcher.setup()
+
+    scheduler = StartupScheduler()
+    scheduler.add('apisocket', setup_apisocket_cb)
+    scheduler.add('frame', setup_frame_cb, priority=1)
+    scheduler.add('keyhandler', setup_keyhandler_cb, depends=['frame'],
+                  priority=1)
+    scheduler.add('gesturehandler', setup_gesturehandler_cb,
+                  depends=['frame'], priority=2)
+    scheduler.add('datastore', activate_datastore_cb, thread=True)
+    scheduler.add('journal', setup_journal_cb, depends=['datastore'],
+                  priority=2)
+    scheduler.add('notifications', setup_notification_service_cb,
+                  priority=3)
+    scheduler.add('file transfer', setup_file_transfer_cb, priority=3)
+    scheduler.add('gstreamer', setup_gstreamer_cb, priority=4)
+    scheduler.start(finished_cb=startuptrace.write_trace)
+
+    GLib.timeout_add_seconds(600, startup_periodic_update_cb)
+
+    from jarabe import testrunner
     testrunner.check_environment()
 
 
@@ -219,14 +262,23 @@ def _begin_desktop_startup():
     global _starting_desktop
     _starting_desktop = True
 
-    UIService()
+    with startuptrace.phase('UIService'):
+        UIService()
 
-    session_manager = get_session_manager()
-    session_manager.start()
+    with startuptrace.phase('session manager'):
+        session_manager = get_session_manager()
+        session_manager.start()
+        session_manager.shutdown_signal.connect(__session_shutdown_cb)
 
     # open homewindow before window_manager to let desktop appear fast
-    home_window = homewindow.get_instance()
-    home_window.show()
+    with startuptrace.phase('home window'):
+        home_window = homewindow.get_instance()
+        home_window.show()
+    startuptrace.mark('home window shown')
+
+
+def __session_shutdown_cb(session_manager):
+    bundleregistry.get_registry().flush_favorites()
 
 
 def __intro_window_done_cb(window):
@@ -243,6 +295,7 @@ def cleanup_temporary_files():
         data_dir = os.path.join(env.get_profile_path(), 'data')
         shutil.rmtree(data_dir, ignore_errors=True)
         os.makedirs(data_dir)
+        downloader.remove_stale_part_files()
     except OSError as e:
         # temporary files cleanup is not critical; it should not prevent
         # sugar from starting if (for example) the disk is full or read-only.
@@ -341,25 +394,26 @@ def _check_group_label():
 
 
 def main():
-    Gst.init(sys.argv)
-
     cleanup_temporary_files()
 
-    _start_window_manager()
+    with startuptrace.phase('window manager'):
+        _start_window_manager()
 
-    setup_timezone()
-    setup_fonts()
-    setup_theme()
-    setup_proxy()
+    with startuptrace.phase('settings'):
+        setup_timezone()
+        setup_fonts()
+        setup_theme()
+        setup_proxy()
 
     # this must be added early, so that it executes and unfreezes the screen
     # even when we initially get blocked on the intro screen
     GLib.idle_add(unfreeze_screen_cb)
 
     GLib.idle_add(setup_cursortracker_cb)
-    sound.restore()
-    keyboard.setup()
-    brightness.get_instance()
+    with startuptrace.phase('devices'):
+        sound.restore()
+        keyboard.setup()
+        brightness.get_instance()
 
     sys.path.append(config.ext_path)
 
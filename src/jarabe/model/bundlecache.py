@@ -0,0 +1,141 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent cache of the bundles found in the activity directories.
+
+Parsing activity.info, its translations and looking up icons for every
+installed activity takes a noticeable part of the startup time. The
+bundles parsed are stored in the profile and reused as long as the
+modification times of the bundle directory and of its info file are
+unchanged, the language is the same and sugar3 was not upgraded.
+"""
+
+import os
+import pickle
+import logging
+import tempfile
+
+from sugar3 import env
+from sugar3.bundle import activitybundle
+
+_CACHE_VERSION = 1
+
+# Paths of the info files, relative to the bundle directory, of
+# activity and content bundles
+_INFO_PATHS = [os.path.join('activity', 'activity.info'),
+               os.path.join('library', 'library.info')]
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _get_bundle_key(bundle_path):
+    key = [_get_mtime(bundle_path)]
+    for info_path in _INFO_PATHS:
+        key.append(_get_mtime(os.path.join(bundle_path, info_path)))
+    return tuple(key)
+
+
+def _get_environment_key():
+    # Bundle names and summaries are translated when they are parsed, and
+    # the pickled bundles must match the sugar3 code loading them
+    return (os.environ.get('LANGUAGE'), os.environ.get('LANG'),
+            _get_mtime(activitybundle.__file__))
+
+
+class BundleCache(object):
+    """Bundles parsed from the activity directories, by path
+
+    Only the main loop uses the cache, it is not thread safe.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._bundles = {}
+        self._changed = False
+
+    def load(self):
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path, 'rb') as cache_file:
+                data = pickle.load(cache_file)
+        except Exception:
+            # Unpickling can fail in many ways if sugar3 changed
+            logging.exception('Could not read the bundle cache')
+            return
+
+        if not isinstance(data, dict) or \
+                data.get('version') != _CACHE_VERSION or \
+                data.get('environment') != _get_environment_key():
+            logging.debug('Discarding outdated bundle cache')
+            return
+
+        self._bundles = data['bundles']
+
+    def save(self):
+        if not self._changed:
+            return
+
+        data = {'version': _CACHE_VERSION,
+                'environment': _get_environment_key(),
+                'bundles': self._bundles}
+
+        dir_path = os.path.dirname(self._path)
+        fd, temp_path = tempfile.mkstemp(dir=dir_path)
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                pickle.dump(data, cache_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, self._path)
+        except (pickle.PicklingError, TypeError, AttributeError,
+                EnvironmentError):
+            logging.exception('Could not write the bundle cache')
+            os.unlink(temp_path)
+            return
+
+        self._changed = False
+
+    def get(self, bundle_path):
+        """Return the bundle parsed from bundle_path, or None if it was
+        not cached or was modified since.
+        """
+        record = self._bundles.get(bundle_path)
+        if record is None or record[0] != _get_bundle_key(bundle_path):
+            return None
+        return record[1]
+
+    def set(self, bundle_path, bundle):
+        self._bundles[bundle_path] = (_get_bundle_key(bundle_path), bundle)
+        self._changed = True
+
+    def retain(self, bundle_paths):
+        """Forget the bundles that are not in bundle_paths."""
+        bundle_paths = set(bundle_paths)
+        for bundle_path in list(self._bundles.keys()):
+            if bundle_path not in bundle_paths:
+                del self._bundles[bundle_path]
+                self._changed = True
+
+
+def get_cache():
+    cache = BundleCache(env.get_profile_path('bundle-cache'))
+    cache.load()
+    return cache
@@ -15,8 +15,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import time
 import logging
+import tempfile
 from threading import Thread, Lock
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from gi.repository import GObject
 from gi.repository import GLib
@@ -31,6 +35,8 @@ from sugar3.bundle.bundle import MalformedBundleException, \
     AlreadyInstalledException, RegistrationException
 from sugar3 import env
 
+from jarabe import startuptrace
+from jarabe.model import bundlecache
 from jarabe.model import desktop
 from jarabe.model import mimeregistry
 
@@ -57,6 +63,25 @@ immediately by the shell.
 _DEFAULT_VIEW = 0
 _instance = None
 
+# Maximum number of threads parsing the bundles missing from the bundle
+# cache while scanning an activity directory
+_PARSE_THREADS = min(8, (os.cpu_count() or 1) * 2)
+
+# Milliseconds without file monitor events to wait for before handling
+# the changes in the activity directories
+_MONITOR_EVENTS_DELAY = 500
+
+# Milliseconds after which the queued events are handled even if more
+# keep coming, like while a large update is copied
+_MONITOR_EVENTS_MAX_DELAY = 5000
+
+# Seconds to wait before writing changed favorites, so moving icons
+# around is written once
+_FAVORITES_WRITE_DELAY = 2
+
+# Maximum number of bundles installed at the same time
+_MAX_INSTALL_THREADS = 3
+
 
 class BundleRegistry(GObject.GObject):
     """Tracks the available activity bundles"""
@@ -68,10 +93,15 @@ class BundleRegistry(GObject.GObject):
                            ([GObject.TYPE_PYOBJECT])),
         'bundle-changed': (GObject.SignalFlags.RUN_FIRST, None,
                            ([GObject.TYPE_PYOBJECT])),
+        # Bundles added and removed by other processes, in one batch
+        'bundles-changed': (GObject.SignalFlags.RUN_FIRST, None,
+                            ([GObject.TYPE_PYOBJECT,
+                              GObject.TYPE_PYOBJECT])),
     }
 
     def __init__(self):
         logging.debug('STARTUP: Loading the bundle registry')
+        startuptrace.begin('bundle registry')
         GObject.GObject.__init__(self)
 
         self._mime_defaults = self._load_mime_defaults()
@@ -84,26 +114,47 @@ class BundleRegistry(GObject.GObject):
         self._lock = Lock()
         self._bundles = []
 
+        # Indexes of _bundles, updated with it by _add_to_indexes() and
+        # _remove_from_indexes()
+        self._bundles_by_id = {}
+        self._bundles_by_version = {}
+        self._bundles_by_path = {}
+        self._activities_by_mime_type = {}
+
         # hold a reference to the monitors so they don't get disposed
         self._gio_monitors = []
+        self._monitor_events = {}
+        self._monitor_events_sid = None
+        self._monitor_events_since = None
+
+        self._bundle_cache = bundlecache.get_cache()
+        self._save_cache_sid = None
 
         dirs = [env.get_user_activities_path(), env.get_user_library_path()]
 
         for data_dir in GLib.get_system_data_dirs():
             dirs.append(os.path.join(data_dir, "sugar", "activities"))
 
+        bundle_dirs = []
         for activity_dir in dirs:
-            self._scan_directory(activity_dir)
+            bundle_dirs.extend(self._scan_directory(activity_dir))
             directory = Gio.File.new_for_path(activity_dir)
             monitor = directory.monitor_directory(
                 flags=Gio.FileMonitorFlags.NONE, cancellable=None)
             monitor.connect('changed', self.__file_monitor_changed_cb)
             self._gio_monitors.append(monitor)
 
+        self._bundle_cache.retain(bundle_dirs)
+        self._bundle_cache.save()
+
         self._favorite_bundles = []
         for i in range(desktop.get_number_of_views()):
             self._favorite_bundles.append({})
 
+        # Views whose favorites changed since they were written
+        self._dirty_favorite_views = set()
+        self._write_favorites_sid = None
+
         settings = Gio.Settings.new('org.sugarlabs')
         self._protected_activities = settings.get_strv('protected-activities')
 
@@ -121,12 +172,15 @@ class BundleRegistry(GObject.GObject):
         self._desktop_model = desktop.get_model()
         self._desktop_model.connect('desktop-view-icons-changed',
                                     self.__desktop_view_icons_changed_cb)
+        startuptrace.end('bundle registry')
 
     def __desktop_view_icons_changed_cb(self, model):
         number_of_views = desktop.get_number_of_views()
         if len(self._favorite_bundles) < number_of_views:
             for i in range(number_of_views - len(self._favorite_bundles)):
                 self._favorite_bundles.append({})
+        # Do not lose changes not written yet
+        self.flush_favorites()
         try:
             self._load_favorites()
         except Exception:
@@ -136,27 +190,84 @@ class BundleRegistry(GObject.GObject):
                                   event_type):
         if event_type == Gio.FileMonitorEvent.CREATED or \
            event_type == Gio.FileMonitorEvent.ATTRIBUTE_CHANGED:
-            self.add_bundle(one_file.get_path(), set_favorite=True)
+            self._queue_monitor_event(one_file.get_path(), deleted=False)
         elif event_type == Gio.FileMonitorEvent.DELETED:
-            self.remove_bundle(one_file.get_path())
-            for root in GLib.get_system_data_dirs():
-                root = os.path.join(root, 'sugar', 'activities')
+            self._queue_monitor_event(one_file.get_path(), deleted=True)
+
+    def _queue_monitor_event(self, bundle_path, deleted):
+        # Events are coalesced per path: the bundle is removed if it was
+        # deleted at some point, and added if it exists in the end
+        was_deleted, exists_ = self._monitor_events.get(bundle_path,
+                                                        (False, False))
+        self._monitor_events[bundle_path] = (was_deleted or deleted,
+                                             not deleted)
+
+        # Wait for the events to stop before handling them, updates
+        # install or remove many bundles at once
+        now = time.monotonic()
+        if self._monitor_events_since is None:
+            self._monitor_events_since = now
+        elif (now - self._monitor_events_since) * 1000 + \
+                _MONITOR_EVENTS_DELAY > _MONITOR_EVENTS_MAX_DELAY:
+            # Do not hold back the first events any longer, the pending
+            # timeout handles these ones too
+            return
 
-                try:
-                    os.listdir(root)
-                except OSError:
-                    logging.debug('Can not find GLib system dir %s', root)
-                    continue
-                activity_dir = os.path.basename(one_file.get_path())
-                try:
-                    bundle = bundle_from_dir(os.path.join(root, activity_dir))
-                except MalformedBundleException:
-                    continue
+        if self._monitor_events_sid is not None:
+            GLib.source_remove(self._monitor_events_sid)
+        self._monitor_events_sid = GLib.timeout_add(
+            _MONITOR_EVENTS_DELAY, self.__monitor_events_cb)
 
-                if bundle is not None:
-                    path = bundle.get_path()
-                    if path is not None:
-                        self.add_bundle(path)
+    def __monitor_events_cb(self):
+        self._monitor_events_sid = None
+        self._monitor_events_since = None
+        events = self._monitor_events
+        self._monitor_events = {}
+
+        system_roots = []
+        for root in GLib.get_system_data_dirs():
+            root = os.path.join(root, 'sugar', 'activities')
+            if os.path.isdir(root):
+                system_roots.append(root)
+            else:
+                logging.debug('Can not find GLib system dir %s', root)
+
+        previous_bundles = list(self)
+        for bundle_path, (deleted, exists) in events.items():
+            try:
+                if deleted:
+                    self.remove_bundle(bundle_path, emit_signals=False)
+                    self._add_system_bundle(
+                        system_roots, os.path.basename(bundle_path))
+                if exists:
+                    self.add_bundle(bundle_path, set_favorite=True,
+                                    emit_signals=False)
+            except Exception:
+                logging.exception('Error while processing changed activity'
+                                  ' bundle %s:', bundle_path)
+
+        bundles = list(self)
+        previous_set = set(previous_bundles)
+        bundle_set = set(bundles)
+        added = [bundle for bundle in bundles if bundle not in previous_set]
+        removed = [bundle for bundle in previous_bundles
+                   if bundle not in bundle_set]
+        if added or removed:
+            self.emit('bundles-changed', added, removed)
+        return False
+
+    def _add_system_bundle(self, system_roots, activity_dir):
+        # A system bundle may have been hidden by the deleted one
+        for root in system_roots:
+            try:
+                bundle = self._load_bundle(os.path.join(root, activity_dir))
+            except MalformedBundleException:
+                continue
+
+            if bundle is not None:
+                path = bundle.get_path()
+                if path is not None:
+                    self.add_bundle(path, emit_signals=False)
 
     def _load_mime_defaults(self):
         defaults = {}
@@ -224,12 +335,13 @@ class BundleRegistry(GObject.GObject):
         for i in range(desktop.get_number_of_views()):
             for key in list(self._favorite_bundles[i].keys()):
                 data = self._favorite_bundles[i][key]
+                if data is not None and 'favorite' in data:
+                    continue
                 if data is None:
                     data = {}
-                if 'favorite' not in data:
-                    data['favorite'] = True
+                data['favorite'] = True
                 self._favorite_bundles[i][key] = data
-            self._write_favorites_file(i)
+                self._queue_favorites_write(i)
 
     def _scan_new_favorites(self):
         for bundle in self:
@@ -239,15 +351,39 @@ class BundleRegistry(GObject.GObject):
             if key not in self._favorite_bundles[_DEFAULT_VIEW]:
                 self._favorite_bundles[_DEFAULT_VIEW][key] = \
                     {'favorite': bundle_id not in self._hidden_activities}
-        self._write_favorites_file(_DEFAULT_VIEW)
+                self._queue_favorites_write(_DEFAULT_VIEW)
 
     def get_bundle(self, bundle_id):
         """Returns an bundle given his service name"""
         with self._lock:
-            for bundle in self._bundles:
-                if bundle.get_bundle_id() == bundle_id:
-                    return bundle
-        return None
+            return self._bundles_by_id.get(bundle_id)
+
+    def _add_to_indexes(self, bundle):
+        # Must be called with the lock held. add_bundle() never registers
+        # two bundles with the same id, so keys are unique.
+        bundle_id = bundle.get_bundle_id()
+        self._bundles_by_id[bundle_id] = bundle
+        self._bundles_by_version[
+            (bundle_id, bundle.get_activity_version())] = bundle
+        self._bundles_by_path[bundle.get_path()] = bundle
+        if isinstance(bundle, ActivityBundle):
+            for mime_type in set(bundle.get_mime_types() or []):
+                self._activities_by_mime_type.setdefault(
+                    mime_type, []).append(bundle)
+
+    def _remove_from_indexes(self, bundle):
+        # Must be called with the lock held
+        bundle_id = bundle.get_bundle_id()
+        del self._bundles_by_id[bundle_id]
+        del self._bundles_by_version[
+            (bundle_id, bundle.get_activity_version())]
+        del self._bundles_by_path[bundle.get_path()]
+        if isinstance(bundle, ActivityBundle):
+            for mime_type in set(bundle.get_mime_types() or []):
+                activities = self._activities_by_mime_type[mime_type]
+                activities.remove(bundle)
+                if not activities:
+                    del self._activities_by_mime_type[mime_type]
 
     def __iter__(self):
         with self._lock:
@@ -258,9 +394,31 @@ class BundleRegistry(GObject.GObject):
         with self._lock:
             return len(self._bundles)
 
+    def _load_bundle(self, bundle_path):
+        """Like bundle_from_dir(), reusing the bundle parsed last time
+        if bundle_path was not modified since.
+        """
+        bundle = self._bundle_cache.get(bundle_path)
+        if bundle is None:
+            bundle = bundle_from_dir(bundle_path)
+            if bundle is not None:
+                self._bundle_cache.set(bundle_path, bundle)
+                self._queue_cache_save()
+        return bundle
+
+    def _queue_cache_save(self):
+        if self._save_cache_sid is None:
+            self._save_cache_sid = GLib.idle_add(self.__save_cache_cb)
+
+    def __save_cache_cb(self):
+        self._save_cache_sid = None
+        self._bundle_cache.save()
+        return False
+
     def _scan_directory(self, path):
+        """Add the bundles found in path, and return their directories"""
         if not os.path.isdir(path):
-            return
+            return []
 
         # Sort by mtime to ensure a stable activity order
         bundles = {}
@@ -275,6 +433,7 @@ class BundleRegistry(GObject.GObject):
 
         bundle_dirs = list(bundles.keys())
         bundle_dirs.sort(key=lambda x: bundles[x])
+        self._parse_bundles(bundle_dirs)
         for folder in bundle_dirs:
             try:
                 self.add_bundle(folder, emit_signals=False)
@@ -282,6 +441,29 @@ class BundleRegistry(GObject.GObject):
                 # pylint: disable=W0702
                 logging.exception('Error while processing installed activity'
                                   ' bundle %s:', folder)
+        return bundle_dirs
+
+    def _parse_bundles(self, bundle_dirs):
+        """Parse the bundles of bundle_dirs missing from the bundle cache
+        in a pool of threads, and add them to the cache.
+
+        Reading activity.info and its translations is mostly waiting for
+        the disk on a first boot, the bundles are then added to the
+        registry in order from the cache.
+        """
+        missing = [bundle_dir for bundle_dir in bundle_dirs
+                   if self._bundle_cache.get(bundle_dir) is None]
+        if len(missing) < 2 or _PARSE_THREADS < 2:
+            return
+
+        with ThreadPoolExecutor(max_workers=_PARSE_THREADS) as executor:
+            results = executor.map(_parse_bundle, missing)
+
+        # The cache is only used from the main thread
+        for bundle_dir, bundle in zip(missing, results):
+            if bundle is not None:
+                self._bundle_cache.set(bundle_dir, bundle)
+                self._queue_cache_save()
 
     def add_bundle(self, bundle_path, set_favorite=False, emit_signals=True,
                    force_downgrade=False):
@@ -293,7 +475,7 @@ class BundleRegistry(GObject.GObject):
         failure.
         """
         try:
-            bundle = bundle_from_dir(bundle_path)
+            bundle = self._load_bundle(bundle_path)
         except MalformedBundleException:
             logging.exception('Error loading bundle %r', bundle_path)
             return None
@@ -329,19 +511,17 @@ class BundleRegistry(GObject.GObject):
 
         with self._lock:
             self._bundles.append(bundle)
+            self._add_to_indexes(bundle)
         if emit_signals:
             self.emit('bundle-added', bundle)
         return bundle
 
     def remove_bundle(self, bundle_path, emit_signals=True):
-        removed = None
-        self._lock.acquire()
-        for bundle in self._bundles:
-            if bundle.get_path() == bundle_path:
-                self._bundles.remove(bundle)
-                removed = bundle
-                break
-        self._lock.release()
+        with self._lock:
+            removed = self._bundles_by_path.get(bundle_path)
+            if removed is not None:
+                self._bundles.remove(removed)
+                self._remove_from_indexes(removed)
 
         if emit_signals and removed is not None:
             self.emit('bundle-removed', removed)
@@ -354,17 +534,17 @@ class BundleRegistry(GObject.GObject):
         default_bundle_id = mime.get_default_activity(mime_type)
         default_bundle = None
 
-        for bundle in self:
-            if not isinstance(bundle, ActivityBundle):
-                continue
-            if mime_type in (bundle.get_mime_types() or []):
-                if bundle.get_bundle_id() == default_bundle_id:
-                    default_bundle = bundle
-                elif self.get_default_for_type(mime_type) == \
-                        bundle.get_bundle_id():
-                    result.insert(0, bundle)
-                else:
-                    result.append(bundle)
+        with self._lock:
+            activities = list(self._activities_by_mime_type.get(mime_type, []))
+
+        for bundle in activities:
+            if bundle.get_bundle_id() == default_bundle_id:
+                default_bundle = bundle
+            elif self.get_default_for_type(mime_type) == \
+                    bundle.get_bundle_id():
+                result.insert(0, bundle)
+            else:
+                result.append(bundle)
 
         if default_bundle is not None:
             result.insert(0, default_bundle)
@@ -376,10 +556,9 @@ class BundleRegistry(GObject.GObject):
 
     def _find_bundle(self, bundle_id, version):
         with self._lock:
-            for bundle in self._bundles:
-                if bundle.get_bundle_id() == bundle_id and \
-                        bundle.get_activity_version() == version:
-                    return bundle
+            bundle = self._bundles_by_version.get((bundle_id, version))
+        if bundle is not None:
+            return bundle
         raise ValueError('No bundle %r with version %r exists.' %
                          (bundle_id, version))
 
@@ -400,7 +579,7 @@ class BundleRegistry(GObject.GObject):
                 self._favorite_bundles[favorite_view][key]['favorite']:
             return False
         self._favorite_bundles[favorite_view][key]['favorite'] = favorite
-        self._write_favorites_file(favorite_view)
+        self._queue_favorites_write(favorite_view)
         return True
 
     def is_bundle_favorite(self, bundle_id, version, favorite_view=0):
@@ -409,6 +588,15 @@ class BundleRegistry(GObject.GObject):
             return False
         return self._favorite_bundles[favorite_view][key]['favorite']
 
+    def get_bundle_favorites(self, bundle_id, version):
+        """Return whether the bundle is favorite, for each of the views"""
+        key = self._get_favorite_key(bundle_id, version)
+        favorites = []
+        for i in range(desktop.get_number_of_views()):
+            data = self._favorite_bundles[i].get(key)
+            favorites.append(data is not None and data['favorite'])
+        return favorites
+
     def is_bundle_hidden(self, bundle_id, version):
         key = self._get_favorite_key(bundle_id, version)
         if key in self._favorite_bundles[_DEFAULT_VIEW]:
@@ -432,7 +620,7 @@ class BundleRegistry(GObject.GObject):
         else:
             return
 
-        self._write_favorites_file(favorite_view)
+        self._queue_favorites_write(favorite_view)
         bundle = self._find_bundle(bundle_id, version)
         self.emit('bundle-changed', bundle)
 
@@ -447,6 +635,27 @@ class BundleRegistry(GObject.GObject):
         return \
                         tuple(self._favorite_bundles[favorite_view][key]['position'])
 
+    def _queue_favorites_write(self, favorite_view):
+        self._dirty_favorite_views.add(favorite_view)
+        if self._write_favorites_sid is None:
+            self._write_favorites_sid = GLib.timeout_add_seconds(
+                _FAVORITES_WRITE_DELAY, self.__write_favorites_cb)
+
+    def __write_favorites_cb(self):
+        self._write_favorites_sid = None
+        self.flush_favorites()
+        return False
+
+    def flush_favorites(self):
+        """Write the favorites changed since they were last written"""
+        if self._write_favorites_sid is not None:
+            GLib.source_remove(self._write_favorites_sid)
+            self._write_favorites_sid = None
+
+        for favorite_view in sorted(self._dirty_favorite_views):
+            self._write_favorites_file(favorite_view)
+        self._dirty_favorite_views.clear()
+
     def _write_favorites_file(self, favorite_view):
         if favorite_view == 0:
             path = env.get_profile_path('favorite_activities')
@@ -455,15 +664,24 @@ class BundleRegistry(GObject.GObject):
                                         (favorite_view))
         favorites_data = {
             'favorites': self._favorite_bundles[favorite_view]}
-        json.dump(favorites_data, open(path, 'w'), indent=1)
+
+        # Replace the file at once, a crash while writing must not
+        # leave it truncated
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w') as favorites_file:
+                json.dump(favorites_data, favorites_file, indent=1)
+            os.rename(temp_path, path)
+        except EnvironmentError:
+            logging.exception('Could not write the favorites to %s', path)
+            os.unlink(temp_path)
 
     def is_installed(self, bundle):
-        for installed_bundle in self:
-            if bundle.get_bundle_id() == installed_bundle.get_bundle_id() and \
-                    NormalizedVersion(bundle.get_activity_version()) == \
-                    NormalizedVersion(installed_bundle.get_activity_version()):
-                return True
-        return False
+        # Only one version of a bundle is registered at a time
+        installed_bundle = self.get_bundle(bundle.get_bundle_id())
+        return installed_bundle is not None and \
+            NormalizedVersion(bundle.get_activity_version()) == \
+            NormalizedVersion(installed_bundle.get_activity_version())
 
     def install(self, bundle, force_downgrade=False):
         """
@@ -517,6 +735,15 @@ class BundleRegistry(GObject.GObject):
                                     self._bundle_installed_cb,
                                     [callback, user_data])
 
+    def get_install_stats(self):
+        """
+        Return the progress of the installations requested with install()
+        and install_async(), as a dictionary with the number of bundles
+        'queued', 'running', 'finished' and 'failed' since no bundle was
+        being installed, and the number of bundles 'finished_per_second'.
+        """
+        return self._install_queue.get_stats()
+
     def _bundle_installed_cb(self, bundle, result, data):
         """
         Completion handler for the bundle Install thread.
@@ -599,7 +826,8 @@ class BundleRegistry(GObject.GObject):
 
             for activity_dir in dir_list:
                 try:
-                    bundle = bundle_from_dir(os.path.join(root, activity_dir))
+                    bundle = self._load_bundle(
+                        os.path.join(root, activity_dir))
                 except MalformedBundleException:
                     continue
 
@@ -608,49 +836,114 @@ class BundleRegistry(GObject.GObject):
         return bundles
 
 
+def _parse_bundle(bundle_dir):
+    # Errors are reported when the registry parses the bundle again
+    try:
+        return bundle_from_dir(bundle_dir)
+    except Exception:
+        return None
+
+
 class _InstallQueue(object):
     """
     A class to represent a queue of bundles to be installed, and to handle
     execution of each task in the queue. Only for internal bundleregistry use.
 
-    The use of a queue means that we serialize all bundle upgrade processing.
-    This is necessary to avoid many difficult corner-cases like: what happens
-    if two users try to asynchronously and simultaenously install different
-    version of the same bundle?
+    Tasks are started in the order they were queued, by up to
+    _MAX_INSTALL_THREADS threads, so bundles with different ids are
+    extracted in parallel. Tasks for the same bundle id are serialized to
+    avoid many difficult corner-cases like: what happens if two users try
+    to asynchronously and simultaenously install different version of the
+    same bundle? A task only starts once the previous one for its bundle
+    id was completed in the main thread, where the bundle is registered.
 
-    We maintain at maximum one thread to do the actual bundle install. When
-    done, the thread enqueues a callback in the main thread (via the GLib
-    main loop).
+    When a task is done, its thread enqueues a callback in the main thread
+    (via the GLib main loop).
     """
 
     def __init__(self, registry):
         self._lock = Lock()
-        self._queue = []
-        self._thread_running = False
+        self._queue = deque()
+        self._busy_keys = set()
+        self._n_threads = 0
         self._registry = registry
 
+        # Statistics since the queue was last idle
+        self._start_time = None
+        self._n_finished = 0
+        self._n_failed = 0
+
     def enqueue(self, bundle, force_downgrade, callback, user_data):
         task = _InstallTask(bundle, force_downgrade, callback, user_data)
-        self._lock.acquire()
-        self._queue.append(task)
-        if not self._thread_running:
-            self._thread_running = True
+        with self._lock:
+            if not self._queue and not self._busy_keys:
+                self._start_time = time.time()
+                self._n_finished = 0
+                self._n_failed = 0
+            self._queue.append(task)
+            self._start_threads()
+
+    def get_stats(self):
+        """Return the number of tasks queued, running, finished and
+        failed since the queue was last idle, and the number of tasks
+        finished per second.
+        """
+        with self._lock:
+            if self._start_time is None:
+                rate = 0.0
+            else:
+                elapsed = time.time() - self._start_time
+                rate = self._n_finished / elapsed if elapsed > 0 else 0.0
+            return {'queued': len(self._queue),
+                    'running': len(self._busy_keys),
+                    'finished': self._n_finished,
+                    'failed': self._n_failed,
+                    'finished_per_second': rate}
+
+    def _start_threads(self):
+        # Must be called with the lock held
+        runnable_keys = set(task.key for task in self._queue
+                            if task.key not in self._busy_keys)
+        n_threads = min(_MAX_INSTALL_THREADS,
+                        self._n_threads + len(runnable_keys))
+        while self._n_threads < n_threads:
+            self._n_threads += 1
             Thread(target=self._thread_func).start()
-        self._lock.release()
+
+    def _pop_task(self):
+        # Must be called with the lock held
+        for task in self._queue:
+            if task.key not in self._busy_keys:
+                self._queue.remove(task)
+                self._busy_keys.add(task.key)
+                return task
+        return None
 
     def _thread_func(self):
         while True:
-            self._lock.acquire()
-            if len(self._queue) == 0:
-                self._thread_running = False
-                self._lock.release()
-                return
-
-            task = self._queue.pop()
-            self._lock.release()
+            with self._lock:
+                task = self._pop_task()
+                if task is None:
+                    self._n_threads -= 1
+                    return
 
             self._do_work(task)
 
+    def _finish_task(self, task, result):
+        GLib.idle_add(self.__task_finished_cb, task, result)
+
+    def __task_finished_cb(self, task, result):
+        try:
+            task.callback(task.bundle, result, task.user_data)
+        finally:
+            with self._lock:
+                self._busy_keys.discard(task.key)
+                self._n_finished += 1
+                if isinstance(result, Exception):
+                    self._n_failed += 1
+                self._start_threads()
+        return False
+
     def _do_work(self, task):
         bundle = task.bundle
         bundle_id = bundle.get_bundle_id()
@@ -662,14 +955,14 @@ class _InstallQueue(object):
             if act.get_activity_version() == bundle.get_activity_version():
                 logging.debug('No upgrade needed, same version already '
                               'installed.')
-                task.queue_callback(False)
+                self._finish_task(task, False)
                 return
 
             # Would this new installation be a downgrade?
             if NormalizedVersion(bundle.get_activity_version()) <= \
                     NormalizedVersion(act.get_activity_version()) \
                     and not task.force_downgrade:
-                task.queue_callback(AlreadyInstalledException())
+                self._finish_task(task, AlreadyInstalledException())
                 return
 
             # Uninstall the previous version, if we can
@@ -685,10 +978,10 @@ class _InstallQueue(object):
                                 'activities')
 
         try:
-            task.queue_callback(bundle.install())
+            self._finish_task(task, bundle.install())
         except Exception as e:
             logging.debug("InstallThread install failed: %r", e)
-            task.queue_callback(e)
+            self._finish_task(task, e)
 
 
 class _InstallTask(object):
@@ -703,8 +996,11 @@ class _InstallTask(object):
         self.force_downgrade = force_downgrade
         self.user_data = user_data
 
-    def queue_callback(self, result):
-        GLib.idle_add(self.callback, self.bundle, result, self.user_data)
+        # Tasks with the same key are run one after the other. Bundles
+        # without an id, like Journal entry bundles, never conflict.
+        self.key = bundle.get_bundle_id()
+        if self.key is None:
+            self.key = self
 
 
 def get_registry():
@@ -0,0 +1,237 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Most recent Journal entries of the activities shown in the favorites
+view, which can be resumed from their icons.
+
+The entries of all the activities watched in a main loop iteration are
+fetched with a single data store query, and then kept up to date from
+the data store signals. Watchers are only notified of the changes of
+their activity.
+"""
+
+import logging
+import weakref
+from functools import partial
+
+from gi.repository import GLib
+
+from sugar3.datastore import datastore
+
+MAX_ENTRIES = 5
+
+_PROPERTIES = ['uid', 'title', 'icon-color', 'activity', 'activity_id',
+               'mime_type', 'mountpoint', 'timestamp']
+
+_model = None
+
+
+def _get_timestamp(entry):
+    try:
+        return int(entry.get('timestamp', 0))
+    except ValueError:
+        return 0
+
+
+def _get_reference(callback):
+    # Watchers are not kept alive, like with sugar3.dispatch signals
+    if hasattr(callback, '__self__'):
+        return weakref.WeakMethod(callback)
+    return weakref.ref(callback)
+
+
+class ResumeEntries(object):
+
+    def __init__(self):
+        self._watchers = {}
+        self._entries = {}
+        self._bundle_by_uid = {}
+        self._bundles_to_fetch = set()
+        self._bundles_fetched = set()
+        self._fetch_sid = None
+
+        datastore.created.connect(self.__datastore_updated_cb)
+        datastore.updated.connect(self.__datastore_updated_cb)
+        datastore.deleted.connect(self.__datastore_deleted_cb)
+
+    def watch(self, bundle_id, callback):
+        """Call callback(bundle_id, entries) when the most recent entries
+        of bundle_id change, newest first.
+
+        The current entries are returned, or None if they are not known
+        yet, callback is called once they are. Only a weak reference to
+        callback is kept.
+        """
+        self._watchers.setdefault(bundle_id, []).append(
+            _get_reference(callback))
+        if bundle_id in self._entries:
+            return self._entries[bundle_id]
+        if bundle_id in self._bundles_fetched:
+            return None
+
+        self._bundles_to_fetch.add(bundle_id)
+        # The activities watched during a query are fetched once it is done
+        if self._fetch_sid is None and not self._bundles_fetched:
+            self._fetch_sid = GLib.idle_add(self.__fetch_cb)
+        return None
+
+    def unwatch(self, bundle_id, callback):
+        references = self._watchers.get(bundle_id, [])
+        reference = _get_reference(callback)
+        if reference in references:
+            references.remove(reference)
+        if not references:
+            self._forget(bundle_id)
+
+    def __fetch_cb(self):
+        self._fetch_sid = None
+        if not self._bundles_to_fetch:
+            return False
+
+        bundle_ids = list(self._bundles_to_fetch)
+        self._bundles_to_fetch.clear()
+        self._bundles_fetched.update(bundle_ids)
+
+        self._find(bundle_ids, dict((bundle_id, []) for bundle_id in
+                                    bundle_ids), fetch=True)
+        return False
+
+    def _fetch_done(self):
+        self._bundles_fetched.clear()
+        if self._bundles_to_fetch and self._fetch_sid is None:
+            self._fetch_sid = GLib.idle_add(self.__fetch_cb)
+
+    def _find(self, bundle_ids, found, end=None, fetch=False):
+        """Find the most recent entries of bundle_ids, adding them to
+        the lists of found. If end is given, only the entries not newer
+        than end are looked for. If fetch is True, the query is part of
+        the fetch of the activities watched.
+        """
+        query = {'activity': bundle_ids}
+        if end is not None:
+            query['timestamp'] = {'start': 0, 'end': end}
+        datastore.find(query, sorting=['+timestamp'],
+                       limit=MAX_ENTRIES * len(bundle_ids),
+                       properties=_PROPERTIES,
+                       reply_handler=partial(self.__find_reply_cb,
+                                             bundle_ids, found,
+                                             end is not None, fetch),
+                       error_handler=partial(self.__find_error_cb, fetch))
+
+    def __find_reply_cb(self, bundle_ids, found, follow_up, fetch, entries,
+                        total_count):
+        added = 0
+        for entry in entries:
+            # If there's a problem with the DS index, we may get entries
+            # not related to the activities queried.
+            bundle_entries = found.get(entry.get('activity'))
+            if bundle_entries is None or len(bundle_entries) == MAX_ENTRIES:
+                continue
+            # Entries as old as the end of the previous query come again
+            if entry['uid'] in [e['uid'] for e in bundle_entries]:
+                continue
+            bundle_entries.append(entry)
+            added += 1
+
+        # The entries of the other activities fill the limit of the query
+        # when they are newer, look for older entries of the activities
+        # that did not get enough, in a single query again.
+        complete = total_count <= len(entries) or \
+            (follow_up and not added)
+        remaining = []
+        for bundle_id in bundle_ids:
+            if bundle_id not in self._watchers:
+                continue
+            bundle_entries = found[bundle_id]
+            if complete or len(bundle_entries) == MAX_ENTRIES:
+                self._set_entries(bundle_id, bundle_entries)
+            else:
+                remaining.append(bundle_id)
+
+        if remaining:
+            self._find(remaining, found, _get_timestamp(entries[-1]), fetch)
+        elif fetch:
+            self._fetch_done()
+
+    def __find_error_cb(self, fetch, error):
+        logging.error('Error retrieving most recent activities: %r', error)
+        if fetch:
+            self._fetch_done()
+
+    def _set_entries(self, bundle_id, entries):
+        for entry in self._entries.get(bundle_id, []):
+            self._bundle_by_uid.pop(entry['uid'], None)
+        for entry in entries:
+            self._bundle_by_uid[entry['uid']] = bundle_id
+        self._entries[bundle_id] = entries
+
+        for reference in list(self._watchers.get(bundle_id, [])):
+            callback = reference()
+            if callback is None:
+                self._watchers[bundle_id].remove(reference)
+            else:
+                callback(bundle_id, entries)
+
+        if not self._watchers.get(bundle_id):
+            self._forget(bundle_id)
+
+    def _forget(self, bundle_id):
+        self._watchers.pop(bundle_id, None)
+        self._bundles_to_fetch.discard(bundle_id)
+        for entry in self._entries.pop(bundle_id, []):
+            self._bundle_by_uid.pop(entry['uid'], None)
+
+    def _remove_entry(self, bundle_id, uid):
+        entries = self._entries[bundle_id]
+        if len(entries) == MAX_ENTRIES:
+            # An older entry may take its place
+            self._find([bundle_id], {bundle_id: []})
+        else:
+            self._set_entries(bundle_id, [entry for entry in entries
+                                          if entry['uid'] != uid])
+
+    def __datastore_updated_cb(self, **kwargs):
+        uid = kwargs['object_id']
+        metadata = kwargs['metadata']
+        bundle_id = metadata.get('activity', '')
+
+        previous_bundle_id = self._bundle_by_uid.get(uid)
+        if previous_bundle_id is not None and previous_bundle_id != bundle_id:
+            self._remove_entry(previous_bundle_id, uid)
+
+        if bundle_id not in self._entries:
+            return
+
+        entry = dict((key, metadata[key]) for key in _PROPERTIES
+                     if key in metadata)
+        entry['uid'] = uid
+        entries = [e for e in self._entries[bundle_id] if e['uid'] != uid]
+        entries.append(entry)
+        entries.sort(key=_get_timestamp, reverse=True)
+        self._set_entries(bundle_id, entries[:MAX_ENTRIES])
+
+    def __datastore_deleted_cb(self, **kwargs):
+        uid = kwargs['object_id']
+        bundle_id = self._bundle_by_uid.get(uid)
+        if bundle_id is not None:
+            self._remove_entry(bundle_id, uid)
+
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = ResumeEntries()
+    return _model
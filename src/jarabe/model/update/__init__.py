@@ -14,6 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import deque
+from functools import partial
+
+from gi.repository import GLib
+
+# Update checks running at once, the shared Soup session opens as many
+# connections to a server
+_MAX_CHECKS = 4
+
 
 class BundleUpdate(object):
     def __init__(self, bundle_id, name, version, link, size,
@@ -25,3 +34,70 @@ class BundleUpdate(object):
         self.size = size
         self.icon_file_name = icon_file_name
         self.optional = optional
+
+
+class CheckQueue(object):
+    """Runs the update checks of a list of items, a few at a time.
+
+    check_cb(item, done_cb) starts checking item, and calls done_cb with
+    the update found, or None, once finished. It returns an object with
+    a cancel() method to stop the check, or None.
+
+    progress_cb(item, progress) is called when a check starts, and
+    completion_cb(updates) once all the checks are finished, or the ones
+    running when cancelled.
+    """
+
+    def __init__(self, items, check_cb, progress_cb, completion_cb,
+                 max_checks=_MAX_CHECKS):
+        self._items = deque(items)
+        self._total = len(self._items)
+        self._check_cb = check_cb
+        self._progress_cb = progress_cb
+        self._completion_cb = completion_cb
+        self._max_checks = max_checks
+        self._running = {}
+        self._checked = 0
+        self._updates = []
+        self._finished = False
+
+    def start(self):
+        self._start_checks()
+
+    def cancel(self):
+        self._items.clear()
+        for check in list(self._running.values()):
+            if check is not None:
+                check.cancel()
+        self._check_finished()
+
+    def _start_checks(self):
+        while self._items and len(self._running) < self._max_checks:
+            item = self._items.popleft()
+            self._progress_cb(item, self._checked / float(self._total))
+
+            key = object()
+            self._running[key] = None
+            check = self._check_cb(item, partial(self.__check_done_cb, key))
+            if key in self._running:
+                self._running[key] = check
+
+        self._check_finished()
+
+    def __check_done_cb(self, key, update):
+        del self._running[key]
+        self._checked += 1
+        if update is not None:
+            self._updates.append(update)
+
+        # do it in idle so the UI has a chance to refresh
+        GLib.idle_add(self.__start_checks_cb)
+
+    def __start_checks_cb(self):
+        self._start_checks()
+        return False
+
+    def _check_finished(self):
+        if not self._finished and not self._items and not self._running:
+            self._finished = True
+            self._completion_cb(self._updates)
@@ -50,7 +50,6 @@ An example::
 import logging
 from xml.etree.ElementTree import XML
 
-from gi.repository import GLib
 from gi.repository import GObject
 
 from sugar3.bundle.bundleversion import NormalizedVersion
@@ -58,6 +57,7 @@ from sugar3.bundle.bundleversion import InvalidVersionError
 
 from jarabe import config
 from jarabe.model.update import BundleUpdate
+from jarabe.model.update import CheckQueue
 from jarabe.util.downloader import Downloader
 
 _FIND_DESCRIPTION = \
@@ -80,6 +80,7 @@ class _UpdateChecker(GObject.GObject):
     def __init__(self):
         GObject.GObject.__init__(self)
         self._bundle = None
+        self._downloader = None
 
     def check(self, bundle):
         # ASLO knows only about stable SP releases
@@ -96,6 +97,9 @@ class _UpdateChecker(GObject.GObject):
         self._downloader.connect('complete', self.__downloader_complete_cb)
         self._downloader.download()
 
+    def cancel(self):
+        self._downloader.cancel()
+
     def __downloader_complete_cb(self, downloader, result):
         if isinstance(result, Exception):
             self.emit('check-complete', result)
@@ -103,6 +107,7 @@ class _UpdateChecker(GObject.GObject):
 
         if result is None:
             _logger.error('No XML update data returned from ASLO')
+            self.emit('check-complete', None)
             return
 
         document = XML(result.get_data())
@@ -150,49 +155,37 @@ class AsloUpdater(object):
     def __init__(self):
         self._completion_cb = None
         self._progress_cb = None
-        self._cancelling = False
-        self._updates = []
-        self._checker = _UpdateChecker()
-        self._checker.connect('check-complete', self._check_complete_cb)
+        self._check_queue = None
 
-    def _check_complete_cb(self, checker, result):
+    def _check_bundle(self, bundle, done_cb):
+        _logger.debug("Checking %s", bundle.get_bundle_id())
+        checker = _UpdateChecker()
+        checker.connect('check-complete', self._check_complete_cb, done_cb)
+        checker.check(bundle)
+        return checker
+
+    def _check_complete_cb(self, checker, result, done_cb):
         if isinstance(result, Exception):
             logging.warning("Failed to check bundle: %r", result)
-        elif isinstance(result, BundleUpdate):
-            self._updates.append(result)
-
-        if self._cancelling:
-            self._completion_cb(None)
-        else:
-            GLib.idle_add(self._check_next_update)
-
-    def _check_next_update(self):
-        total = self._total_bundles_to_check
-        current = total - len(self._bundles_to_check)
-        progress = current / float(total)
-
-        if not self._bundles_to_check:
-            self._completion_cb(self._updates)
-            return
+            result = None
+        done_cb(result)
 
-        bundle = self._bundles_to_check.pop()
-        _logger.debug("Checking %s", bundle.get_bundle_id())
+    def _check_progress_cb(self, bundle, progress):
         self._progress_cb(bundle.get_name(), progress)
-        self._checker.check(bundle)
 
     def fetch_update_info(self, installed_bundles, auto, progress_cb,
                           completion_cb, error_cb):
         self._completion_cb = completion_cb
         self._progress_cb = progress_cb
         self._error_cb = error_cb
-        self._cancelling = False
-        self._updates = []
-        self._bundles_to_check = installed_bundles
-        self._total_bundles_to_check = len(self._bundles_to_check)
-        self._check_next_update()
+        self._check_queue = CheckQueue(installed_bundles, self._check_bundle,
+                                       self._check_progress_cb,
+                                       self._completion_cb)
+        self._check_queue.start()
 
     def cancel(self):
-        self._cancelling = True
+        if self._check_queue is not None:
+            self._check_queue.cancel()
 
     def clean(self):
         pass
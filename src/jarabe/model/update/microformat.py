@@ -42,6 +42,7 @@ from sugar3.bundle.bundleversion import NormalizedVersion, InvalidVersionError
 from jarabe.util import httprange
 from jarabe.model import bundleregistry
 from jarabe.model.update import BundleUpdate
+from jarabe.model.update import CheckQueue
 from jarabe.util.downloader import Downloader
 
 _logger = logging.getLogger('microformat')
@@ -184,7 +185,7 @@ class MicroformatUpdater(object):
     """
     Microformat updater backend. The rough code flow here is:
      1. Query update URL and parse results
-     2. For each activity update:
+     2. For each activity update, a few at a time:
        a) If we already have this activity installed, use GIO to asynchronously
           lookup the size of the download.
        b) If we don't have the activity installed, use MetadataLookup
@@ -193,6 +194,7 @@ class MicroformatUpdater(object):
 
     def __init__(self):
         self._icon_temp_files = []
+        self._check_queue = None
 
     def _query(self):
         self.clean()
@@ -222,10 +224,14 @@ class MicroformatUpdater(object):
             self._error_cb(result)
             return
 
+        if self._cancelling:
+            self._completion_cb([])
+            return
+
         self._parser.close()
         _logger.debug("Found %d activities", len(self._parser.results))
         self._filter_results()
-        self._check_next_update()
+        self._check_updates()
 
     def _filter_results(self):
         # Remove updates for which we already have an equivalent or newer
@@ -247,53 +253,56 @@ class MicroformatUpdater(object):
             bundle_update = BundleUpdate(bundle_id, name, data[0], data[1], 0,
                                          optional=data[2])
             self._bundles_to_check.append(bundle_update)
-        self._total_bundles_to_check = len(self._bundles_to_check)
-        _logger.debug("%d results after filter", self._total_bundles_to_check)
+        _logger.debug("%d results after filter", len(self._bundles_to_check))
 
-    def _check_next_update(self):
-        if self._cancelling or len(self._bundles_to_check) == 0:
-            self._completion_cb(self._updates)
-            return
+    def _check_updates(self):
+        self._check_queue = CheckQueue(self._bundles_to_check,
+                                       self._check_update,
+                                       self._check_progress_cb,
+                                       self._completion_cb)
+        self._check_queue.start()
 
-        total = self._total_bundles_to_check
-        current = total - len(self._bundles_to_check)
-        progress = current / float(total)
+    def _check_progress_cb(self, bundle_update, progress):
+        self._progress_cb(bundle_update.name or bundle_update.bundle_id,
+                          progress)
 
-        self._bundle_update = self._bundles_to_check.pop()
-        _logger.debug("Check %s", self._bundle_update.bundle_id)
+    def _check_update(self, bundle_update, done_cb):
+        _logger.debug("Check %s", bundle_update.bundle_id)
 
         # There is no need for a special name lookup for an automatic update.
         # The name lookup is only for UI purposes, but we are running in the
         # background.
-        if self._bundle_update.name is None and self._auto:
-            self._bundle_update.name = self._bundle_update.bundle_id
+        if bundle_update.name is None and self._auto:
+            bundle_update.name = bundle_update.bundle_id
 
-        if self._bundle_update.name is not None:
+        if bundle_update.name is not None:
             # if we know the name, we just perform an asynchronous size check
             _logger.debug("Performing async size lookup")
-            size_check = Downloader(self._bundle_update.link)
-            size_check.connect('complete', self._size_lookup_cb)
+            size_check = Downloader(bundle_update.link)
+            size_check.connect('complete', self._size_lookup_cb,
+                               bundle_update, done_cb)
             size_check.get_size()
-            self._progress_cb(self._bundle_update.name, progress)
+            return size_check
         else:
             # if we don't know the name, we run a metadata lookup and get
             # the size and name that way
             _logger.debug("Performing metadata lookup")
-            namelookup = MetadataLookup(self._bundle_update.link)
-            namelookup.connect('complete', self._name_lookup_complete)
+            namelookup = MetadataLookup(bundle_update.link)
+            namelookup.connect('complete', self._name_lookup_complete,
+                               bundle_update, done_cb)
             namelookup.run()
-            self._progress_cb(self._bundle_update.bundle_id, progress)
+            return None
 
-    def _size_lookup_cb(self, downloader, result):
+    def _size_lookup_cb(self, downloader, result, bundle_update, done_cb):
         if isinstance(result, Exception):
             _logger.warning("Failed to perform size lookup: %s", result)
+            done_cb(None)
         else:
-            self._bundle_update.size = result
-            self._updates.append(self._bundle_update)
-
-        GLib.idle_add(self._check_next_update)
+            bundle_update.size = result
+            done_cb(bundle_update)
 
-    def _name_lookup_complete(self, lookup, result, size, icon_file_name):
+    def _name_lookup_complete(self, lookup, result, size, icon_file_name,
+                              bundle_update, done_cb):
         _logger.debug("Name lookup result: %r", result)
         if icon_file_name is not None:
             self._icon_temp_files.append(icon_file_name)
@@ -301,22 +310,21 @@ class MicroformatUpdater(object):
 
         if size is None:
             # if the size lookup failed, assume this update is bad
-            self._check_next_update()
+            done_cb(None)
             return
 
         if result is None or isinstance(result, Exception):
             # if we failed to find the name, add the update anyway, using the
             # bundle_id as the best name we have
-            self._bundle_update.name = self._bundle_update.bundle_id
+            bundle_update.name = bundle_update.bundle_id
         else:
-            self._bundle_update.name = result
+            bundle_update.name = result
 
-        self._bundle_update.size = size
+        bundle_update.size = size
         if icon_file_name is not None:
-            self._bundle_update.icon_file_name = icon_file_name
+            bundle_update.icon_file_name = icon_file_name
 
-        self._updates.append(self._bundle_update)
-        self._check_next_update()
+        done_cb(bundle_update)
 
     def fetch_update_info(self, installed_bundles, auto, progress_cb,
                           completion_cb, error_cb):
@@ -324,14 +332,15 @@ class MicroformatUpdater(object):
         self._progress_cb = progress_cb
         self._error_cb = error_cb
         self._cancelling = False
-        self._updates = []
+        self._check_queue = None
         self._bundles_to_check = []
-        self._total_bundles_to_check = 0
         self._auto = auto
         self._query()
 
     def cancel(self):
         self._cancelling = True
+        if self._check_queue is not None:
+            self._check_queue.cancel()
 
     def clean(self):
         for filename in self._icon_temp_files:
@@ -171,7 +171,7 @@ class Updater(GObject.GObject):
         self._downloader = Downloader(self._bundle_update.link)
         self._downloader.connect('progress', self.__downloader_progress_cb)
         self._downloader.connect('complete', self.__downloader_complete_cb)
-        self._downloader.download_to_temp()
+        self._downloader.download_to_temp(parallel=True)
 
     def __downloader_complete_cb(self, downloader, result):
         if self._cancelling:
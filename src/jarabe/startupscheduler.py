@@ -0,0 +1,164 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Scheduler of the tasks setting up the shell once the home window is
+shown.
+
+A task runs once the tasks it depends on are finished. Tasks running in
+the main loop are run from an idle callback, by order of priority, as
+many per main loop iteration as fit in a slice of _SLICE_DURATION
+seconds, so the screen is redrawn between slices. Tasks that do not
+touch the user interface can run in a thread of their own instead.
+
+The duration of every task is logged and added to the startup trace.
+"""
+
+import time
+import heapq
+import logging
+from threading import Thread
+
+from gi.repository import GLib
+
+from jarabe import startuptrace
+
+# Seconds of main loop tasks run before letting the main loop handle
+# other events
+_SLICE_DURATION = 0.02
+
+
+class _Task(object):
+
+    def __init__(self, name, function, depends, priority, thread, order):
+        self.name = name
+        self.function = function
+        self.depends = list(depends)
+        self.priority = priority
+        self.thread = thread
+        self.order = order
+        self.start_time = None
+        self.end_time = None
+
+
+class StartupScheduler(object):
+    """Runs startup tasks by order of dependencies and priority"""
+
+    def __init__(self):
+        self._tasks = {}
+        self._started = set()
+        self._finished = set()
+        self._ready = []
+        self._slice_sid = None
+        self._finished_cb = None
+
+    def add(self, name, function, depends=(), priority=0, thread=False):
+        """Add the task name, which calls function.
+
+        Tasks with a lower priority value run first. If thread is True
+        the task runs in a thread, it must not use the user interface.
+        """
+        if name in self._tasks:
+            raise ValueError('Startup task %r added twice' % name)
+        self._tasks[name] = _Task(name, function, depends, priority, thread,
+                                  len(self._tasks))
+
+    def start(self, finished_cb=None):
+        """Start running the tasks, finished_cb is called in the main loop
+        when all of them are finished.
+        """
+        self._check_dependencies()
+        self._finished_cb = finished_cb
+        self._queue_ready_tasks()
+
+    def get_timings(self):
+        """Return the start time and duration in seconds of the finished
+        tasks, by name.
+        """
+        return dict((name, (self._tasks[name].start_time,
+                            self._tasks[name].end_time -
+                            self._tasks[name].start_time))
+                    for name in self._finished)
+
+    def _check_dependencies(self):
+        resolved = set()
+        pending = list(self._tasks.values())
+        while pending:
+            runnable = [task for task in pending
+                        if all(name in resolved for name in task.depends)]
+            if not runnable:
+                raise ValueError('Startup tasks %r have unknown or circular'
+                                 ' dependencies' %
+                                 sorted(task.name for task in pending))
+            for task in runnable:
+                resolved.add(task.name)
+                pending.remove(task)
+
+    def _queue_ready_tasks(self):
+        for task in self._tasks.values():
+            if task.name in self._started or \
+                    not all(name in self._finished for name in task.depends):
+                continue
+
+            self._started.add(task.name)
+            if task.thread:
+                Thread(target=self._thread_func, args=(task,),
+                       daemon=True).start()
+            else:
+                heapq.heappush(self._ready, (task.priority, task.order, task))
+
+        if self._ready and self._slice_sid is None:
+            self._slice_sid = GLib.idle_add(self.__run_slice_cb)
+
+    def __run_slice_cb(self):
+        deadline = time.monotonic() + _SLICE_DURATION
+        while self._ready and time.monotonic() < deadline:
+            priority_, order_, task = heapq.heappop(self._ready)
+            self._run_task(task)
+            self._task_finished(task)
+
+        if self._ready:
+            return True
+        self._slice_sid = None
+        return False
+
+    def _thread_func(self, task):
+        self._run_task(task)
+        GLib.idle_add(self.__thread_task_finished_cb, task)
+
+    def __thread_task_finished_cb(self, task):
+        self._task_finished(task)
+        return False
+
+    def _run_task(self, task):
+        task.start_time = time.monotonic()
+        try:
+            task.function()
+        except Exception:
+            # Tasks depending on it still run, with less features
+            logging.exception('Startup task %s failed', task.name)
+        task.end_time = time.monotonic()
+        startuptrace.record(task.name, 'task', task.start_time,
+                            task.end_time)
+
+    def _task_finished(self, task):
+        logging.debug('STARTUP: %s took %.3f s', task.name,
+                      task.end_time - task.start_time)
+        self._finished.add(task.name)
+        self._queue_ready_tasks()
+
+        if len(self._finished) == len(self._tasks) and \
+                self._finished_cb is not None:
+            self._finished_cb()
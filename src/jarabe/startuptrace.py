@@ -0,0 +1,179 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Timeline of the shell startup.
+
+When SUGAR_STARTUP_TRACE is set to a file path, the phases of the startup
+and the imports of the jarabe modules are timed, and written to that
+file once the desktop is set up. The file uses the trace event format,
+so it can be opened with chrome://tracing or Perfetto, and two traces
+can be compared with tests/benchmarks/startup_trace_compare.py.
+
+Tracing costs nothing when the variable is not set.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import builtins
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+_trace_path = None
+_start_time = None
+_events = None
+_begun = {}
+_original_import = None
+
+
+def start():
+    """Start tracing if SUGAR_STARTUP_TRACE is set."""
+    global _trace_path, _start_time, _events, _original_import
+
+    _trace_path = os.environ.get('SUGAR_STARTUP_TRACE')
+    if not _trace_path or _events is not None:
+        return
+
+    _start_time = time.monotonic()
+    _events = []
+    _original_import = builtins.__import__
+    builtins.__import__ = _traced_import
+
+
+def is_enabled():
+    return _events is not None
+
+
+def _add_event(name, category, start_time, end_time):
+    _events.append({
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': int((start_time - _start_time) * 1000000),
+        'dur': int((end_time - start_time) * 1000000),
+        'pid': os.getpid(),
+        'tid': threading.get_ident()})
+
+
+def _needs_loading(name, fromlist):
+    if name not in sys.modules:
+        return True
+    for item in fromlist or ():
+        if '%s.%s' % (name, item) not in sys.modules and \
+                not hasattr(sys.modules[name], item):
+            return True
+    return False
+
+
+def _traced_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or not name.startswith('jarabe') or \
+            not _needs_loading(name, fromlist):
+        return _original_import(name, globals, locals, fromlist, level)
+
+    if fromlist and len(fromlist) == 1:
+        module_name = '%s.%s' % (name, fromlist[0])
+    else:
+        module_name = name
+
+    start_time = time.monotonic()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _add_event(module_name, 'import', start_time, time.monotonic())
+
+
+@contextmanager
+def phase(name):
+    """Time the code run in the with block as the phase name."""
+    if _events is None:
+        yield
+        return
+
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        _add_event(name, 'phase', start_time, time.monotonic())
+
+
+def begin(name):
+    """Start timing the phase name, for phases that do not fit in a
+    with block.
+    """
+    if _events is not None:
+        _begun[name] = time.monotonic()
+
+
+def end(name):
+    if _events is not None and name in _begun:
+        _add_event(name, 'phase', _begun.pop(name), time.monotonic())
+
+
+def mark(name):
+    """Record that the startup reached the milestone name."""
+    if _events is not None:
+        now = time.monotonic()
+        _add_event(name, 'mark', now, now)
+
+
+def record(name, category, start_time, end_time):
+    """Record something timed elsewhere, from time.monotonic() values.
+
+    It can be called from any thread.
+    """
+    if _events is not None:
+        _add_event(name, category, start_time, end_time)
+
+
+def traced(function):
+    """Time every call of function, a main loop callback usually, as
+    a phase named after it.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with phase(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def write_trace():
+    """Write the trace file and stop tracing.
+
+    It returns False so it can be added as a main loop callback.
+    """
+    global _events
+
+    if _events is None:
+        return False
+
+    builtins.__import__ = _original_import
+    events = _events
+    _events = None
+
+    data = {'traceEvents': events,
+            'displayTimeUnit': 'ms'}
+    try:
+        with open(_trace_path, 'w') as trace_file:
+            json.dump(data, trace_file, indent=1)
+    except EnvironmentError:
+        logging.exception('Could not write the startup trace')
+    else:
+        logging.debug('STARTUP: trace written to %s', _trace_path)
+    return False
@@ -15,8 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import time
+import hashlib
+import logging
 from urllib.parse import urlparse
 import tempfile
+from collections import deque
+from operator import attrgetter
 
 import gi
 gi.require_version('Soup', '3.0')
@@ -31,16 +36,74 @@ from sugar3 import env
 _session = None
 
 SOUP_STATUS_CANCELLED = 1
+SOUP_STATUS_PARTIAL_CONTENT = 206
+SOUP_STATUS_RANGE_NOT_SATISFIABLE = 416
+
+# Size of the reads from the network
+_READ_SIZE = 65536
+
+# Buffers read and waiting to be written to the file, by segment, before
+# reading is paused
+_MAX_PENDING_BUFFERS = 8
+
+# Times in a row a segment interrupted is requested again from where it
+# stopped without getting any data, and seconds waited before doing it
+_MAX_RETRIES = 3
+_RETRY_DELAY = 2
+
+# Parallel downloads split the content in segments of that many bytes,
+# and download that many segments at once
+_SEGMENT_SIZE = 4 * 1024 * 1024
+_MAX_SEGMENTS = 4
+
+# Partial files not written to for that many seconds are not resumed
+_PART_FILE_MAX_AGE = 7 * 24 * 60 * 60
 
 
 def soup_status_is_successful(status):
     return status >= 200 and status < 300
 
 
+def _get_part_files_dir():
+    # Unlike the data directory of the profile, it is not emptied at boot
+    # so that downloads can be resumed in a later session
+    return os.path.join(env.get_profile_path(), 'downloads')
+
+
+def remove_stale_part_files():
+    """Remove the partial files of the downloads not resumed for a
+    while, with their validators.
+    """
+    part_files_dir = _get_part_files_dir()
+    try:
+        names = os.listdir(part_files_dir)
+    except OSError:
+        return
+
+    now = time.time()
+    for name in names:
+        path = os.path.join(part_files_dir, name)
+        if name.endswith('.validator'):
+            part_path = path[:-len('.validator')]
+        else:
+            part_path = path
+        try:
+            if now - os.path.getmtime(part_path) < _PART_FILE_MAX_AGE:
+                continue
+        except OSError:
+            # The validator of a partial file removed
+            pass
+        try:
+            os.unlink(path)
+        except OSError:
+            logging.exception('Could not remove %s', path)
+
+
 def get_soup_session():
     global _session
     if _session is None:
-        _session = Soup.Session()
+        # Allow the segments of a parallel download to run at once
+        _session = Soup.Session(max_conns_per_host=_MAX_SEGMENTS)
         _session.set_timeout(60)
         _session.set_idle_timeout(60)
         _session.set_user_agent("Sugar/%s" % config.version)
@@ -48,7 +111,42 @@ def get_soup_session():
     return _session
 
 
+class _Segment(object):
+    """Range of the remote content, fetched by a request of its own"""
+
+    def __init__(self, start, end=None):
+        self.start = start
+        # Last byte of the segment, None for the end of the content
+        self.end = end
+        # Next byte to receive, and to write to the file
+        self.received = start
+        self.position = start
+        self.retries = 0
+        self.message = None
+        self.input_stream = None
+        self.io_stream = None
+        self.pending_buffers = deque()
+        self.reading = False
+        self.writing = False
+        self.done_reading = False
+        self.interrupted = False
+        self.finished = False
+
+    def is_complete(self):
+        return self.end is not None and self.position > self.end
+
+
 class Downloader(GObject.GObject):
+    """Downloads a URL, resuming from where it stopped when the
+    connection is interrupted.
+
+    Files downloaded with download_to_temp() are written to a partial
+    file named after the URL, which is kept if the download fails, so
+    that downloading the same URL later resumes from it with a HTTP
+    Range request. Large files can optionally be downloaded in several
+    segments at once.
+    """
+
     __gsignals__ = {
         'progress': (GObject.SignalFlags.RUN_FIRST,
                      None,
@@ -65,39 +163,52 @@ class Downloader(GObject.GObject):
         GObject.GObject.__init__(self)
         self._uri = GLib.Uri.parse(url, GLib.UriFlags.NONE)
         self._session = session or get_soup_session()
-        self._pending_buffers = []
+        self._request_headers = request_headers
+        self._cancellable = Gio.Cancellable()
+        self._method = 'GET'
+        self._segments = []
+        self._next_segment_start = None
+        self._parallel = False
+        self._validator = None
+        self._buffers = None
+        self._part_path = None
+        self._output_path = None
         self._downloaded_size = 0
         self._total_size = 0
-        self._cancelling = False
-        self._status_code = None
-        self._output_file = None
-        self._output_stream = None
-        self._message = None
-        self._request_headers = request_headers
+        self._error = None
+        self._completed = False
 
-    def _setup_message(self, method="GET"):
-        self._message = Soup.Message.new(method=method, uri=self._uri)
-        self._message.connect('got-body-data', self._got_body_data_cb)
-        self._message.connect('got-headers', self._headers_cb, None)
-        if self._request_headers is not None:
-            for header_key in list(self._request_headers.keys()):
-                self._message.get_request_headers().append(
-                    header_key, self._request_headers[header_key])
-
-
-    def download_to_temp(self):
+    def download_to_temp(self, parallel=False):
         """
         Download the contents of the provided URL to temporary file storage.
         Use .get_local_file_path() to find the location of where the file
         is saved. Upon completion, a successful download is indicated by a
         result of None in the complete signal parameters.
+        If parallel is True and the server supports Range requests, large
+        files are downloaded in several segments at once.
         """
         url = self._uri.to_string()
-        temp_file_path = self._get_temp_file_path(url)
-        self._output_file = Gio.File.new_for_path(temp_file_path)
-        self._output_stream = self._output_file.create(
-            Gio.FileCreateFlags.PRIVATE, None)
-        self.download_chunked()
+        self._part_path = self._get_part_file_path(url)
+        if os.path.exists(self._part_path):
+            self._validator = self._load_validator()
+            if self._validator is None:
+                # Without a validator, changes of the content can not be
+                # detected, start again
+                os.truncate(self._part_path, 0)
+            self._downloaded_size = os.path.getsize(self._part_path)
+            logging.debug('Resuming the download of %s from byte %d',
+                          url, self._downloaded_size)
+        else:
+            os.close(os.open(self._part_path, os.O_WRONLY | os.O_CREAT,
+                             0o600))
+
+        self._parallel = parallel
+        if parallel:
+            self._start_segment(_Segment(
+                self._downloaded_size,
+                self._downloaded_size + _SEGMENT_SIZE - 1))
+        else:
+            self._start_segment(_Segment(self._downloaded_size))
 
     def download_chunked(self):
         """
@@ -106,8 +217,7 @@ class Downloader(GObject.GObject):
         signal. Upon completion, a successful download is indicated by a
         reuslt of None in the complete signal parameters.
         """
-        self._setup_message()
-        self._session.send_async(self._message, 0, None, self._message_cb, None)
+        self._start_segment(_Segment(0))
 
     def download(self, start=None, end=None):
         """
@@ -117,91 +227,406 @@ class Downloader(GObject.GObject):
         The start and end parameters can optionally be set to perform a
         partial read of the remote data.
         """
-        self._setup_message()
-        if start is not None:
-            self._message.get_request_headers().set_range(start, end)
-        self._session.send_async(self._message, 0, None, self._message_cb, None)
+        self._buffers = []
+        self._start_segment(_Segment(start or 0, end))
 
     def get_size(self):
         """
         Perform a HTTP HEAD request to find the size of the remote content.
         The size is returned in the result parameter of the 'complete' signal.
         """
-        self._setup_message("HEAD")
-        self._session.send_async(self._message, 0, None, self._message_cb, None)
-
-    def _message_cb(self, session, message, user_data):
-        self._status_code = message.get_status()
-        self._check_if_finished()
+        self._method = 'HEAD'
+        self._start_segment(_Segment(0))
 
     def cancel(self):
-        self._cancelling = True
-        self._session.cancel_message(self._message, SOUP_STATUS_CANCELLED)
+        self._fail(IOError('Download cancelled'))
+
+    def _start_segment(self, segment):
+        self._segments.append(segment)
+        self._request_segment(segment)
+
+    def _start_next_segments(self):
+        active = len([s for s in self._segments if not s.finished])
+        while self._has_segments_left() and active < _MAX_SEGMENTS:
+            start = self._next_segment_start
+            if self._total_size > 0:
+                end = min(start + _SEGMENT_SIZE, self._total_size) - 1
+                self._next_segment_start = end + 1
+            else:
+                # The size of the content is unknown, the rest of it is
+                # downloaded in a single request
+                end = None
+                self._next_segment_start = None
+            self._start_segment(_Segment(start, end))
+            active += 1
+
+    def _has_segments_left(self):
+        if self._next_segment_start is None:
+            return False
+        return self._total_size == 0 or \
+            self._next_segment_start < self._total_size
+
+    def _request_segment(self, segment):
+        segment.message = Soup.Message.new_from_uri(self._method, self._uri)
+        headers = segment.message.get_request_headers()
+        if self._request_headers is not None:
+            for header_key in list(self._request_headers.keys()):
+                headers.append(header_key, self._request_headers[header_key])
 
-    def _headers_cb(self, message, user_data):
-        if soup_status_is_successful(message.get_status()):
-            self._total_size = message.get_response_headers().get_content_length()
+        if segment.position > 0 or segment.end is not None:
+            if segment.end is None:
+                headers.set_range(segment.position, -1)
+            else:
+                headers.set_range(segment.position, segment.end)
+            # Get the whole content instead if it changed meanwhile
+            if self._validator is not None:
+                headers.append('If-Range', self._validator)
+
+        self._session.send_async(segment.message, GLib.PRIORITY_DEFAULT,
+                                 self._cancellable, self.__send_cb, segment)
+
+    def __send_cb(self, session, result, segment):
+        try:
+            input_stream = session.send_finish(result)
+        except GLib.Error as e:
+            self._segment_interrupted(segment, e)
+            return
+
+        if self._error is not None:
+            input_stream.close(None)
+            self._check_finished()
+            return
+
+        message = segment.message
+        status = message.get_status()
+        headers = message.get_response_headers()
+
+        if self._method == 'HEAD':
+            input_stream.close(None)
+            if soup_status_is_successful(status):
+                self._complete(headers.get_content_length())
+            else:
+                self._complete(IOError("HTTP error code %d" % status))
+            return
+
+        if status == SOUP_STATUS_RANGE_NOT_SATISFIABLE and \
+                self._part_path is not None and segment.position > 0 and \
+                len(self._segments) == 1:
+            # The partial file is longer than the content, which changed
+            input_stream.close(None)
+            self._reset(segment)
+            self._request_segment(segment)
+            return
 
-    def _got_body_data_cb(self, message, chunk_size):
-        if self._cancelling or \
-                not soup_status_is_successful(message.get_status()):
+        if status == SOUP_STATUS_RANGE_NOT_SATISFIABLE and \
+                self._total_size == 0 and segment.end is None and \
+                len(self._segments) > 1:
+            # The content of unknown size ended with the previous segment
+            input_stream.close(None)
+            segment.done_reading = True
+            self._check_segment(segment)
             return
 
-        data = Gio.InputStream.read_bytes(chunk_size, None)
+        if not soup_status_is_successful(status):
+            input_stream.close(None)
+            self._fail(IOError("HTTP error code %d" % status))
+            return
+
+        if status == SOUP_STATUS_PARTIAL_CONTENT:
+            valid, start, end, total = headers.get_content_range()
+            if not valid or start != segment.position:
+                input_stream.close(None)
+                self._fail(IOError("Unexpected range %d-%d in the response" %
+                                   (start, end)))
+                return
+            segment.end = end
+            if total > 0:
+                self._total_size = total
+        elif segment.position > 0:
+            # The range was ignored, or the content changed since the
+            # previous requests, this is the whole content
+            if len(self._segments) > 1 or \
+                    (self._buffers is None and self._part_path is None):
+                input_stream.close(None)
+                self._fail(IOError("The content changed while downloading"))
+                return
+            self._reset(segment)
+            self._total_size = headers.get_content_length()
+        else:
+            segment.end = None
+            self._total_size = headers.get_content_length()
+
+        if self._validator is None:
+            etag = headers.get_one('ETag')
+            if etag is not None and not etag.startswith('W/'):
+                self._validator = etag
+            else:
+                self._validator = headers.get_one('Last-Modified')
+            if self._part_path is not None:
+                self._save_validator()
+
+        segment.input_stream = input_stream
+        if self._part_path is not None and segment.io_stream is None:
+            output_file = Gio.File.new_for_path(self._part_path)
+            segment.io_stream = output_file.open_readwrite(None)
+            segment.io_stream.seek(segment.position, GLib.SeekType.SET, None)
+
+        if self._parallel and self._next_segment_start is None and \
+                len(self._segments) == 1 and \
+                status == SOUP_STATUS_PARTIAL_CONTENT:
+            self._next_segment_start = segment.end + 1
+            # Without the size of the content, the rest of it is only
+            # requested after this segment
+            if self._total_size > 0:
+                self._start_next_segments()
+
+        self._read_next_buffer(segment)
+
+    def _reset(self, segment):
+        # Start again from the beginning of the content
+        logging.debug('Downloading %s from the start',
+                      self._uri.to_string())
+        segment.start = segment.received = segment.position = 0
+        segment.end = None
+        self._downloaded_size = 0
+        # Learn the validator of the new content
+        self._validator = None
+        if self._buffers is not None:
+            self._buffers = []
+        if self._part_path is not None:
+            if segment.io_stream is not None:
+                segment.io_stream.close(None)
+                segment.io_stream = None
+            os.truncate(self._part_path, 0)
+
+    def _read_next_buffer(self, segment):
+        if segment.reading or segment.input_stream is None or \
+                len(segment.pending_buffers) >= _MAX_PENDING_BUFFERS:
+            return
+
+        segment.reading = True
+        segment.input_stream.read_bytes_async(
+            _READ_SIZE, GLib.PRIORITY_DEFAULT, self._cancellable,
+            self.__read_cb, segment)
+
+    def __read_cb(self, input_stream, result, segment):
+        segment.reading = False
+        try:
+            data = input_stream.read_bytes_finish(result)
+        except GLib.Error as e:
+            self._segment_interrupted(segment, e)
+            return
+
+        if self._error is not None:
+            self._check_finished()
+            return
+
+        size = data.get_size()
+        if size == 0:
+            input_stream.close(None)
+            segment.input_stream = None
+            if segment.end is not None and segment.received <= segment.end:
+                self._segment_interrupted(
+                    segment, IOError('Connection closed by the server'))
+            else:
+                segment.done_reading = True
+                self._check_segment(segment)
+            return
+
+        segment.received += size
+        segment.retries = 0
         self.emit('got-chunk', data)
-        if self._output_stream:
-            self._pending_buffers.append(data)
-            self._write_next_buffer()
 
-    def __write_async_cb(self, output_stream, result, user_data):
-        count = output_stream.write_bytes_finish(result)
+        if segment.io_stream is not None:
+            segment.pending_buffers.append(data)
+            self._write_next_buffer(segment)
+        else:
+            if self._buffers is not None:
+                self._buffers.append(data.get_data())
+            segment.position += size
+            self._add_progress(size)
+
+        self._read_next_buffer(segment)
+
+    def _write_next_buffer(self, segment):
+        if segment.writing or not segment.pending_buffers:
+            return
+
+        segment.writing = True
+        data = segment.pending_buffers.popleft()
+        output_stream = segment.io_stream.get_output_stream()
+        output_stream.write_bytes_async(data, GLib.PRIORITY_LOW, None,
+                                        self.__write_cb, (segment, data))
+
+    def __write_cb(self, output_stream, result, user_data):
+        segment, data = user_data
+        segment.writing = False
+        try:
+            count = output_stream.write_bytes_finish(result)
+        except GLib.Error as e:
+            self._fail(IOError('Could not write the download: %s' % e))
+            return
+
+        segment.position += count
+        if self._error is not None:
+            self._check_finished()
+            return
+
+        if count < data.get_size():
+            segment.pending_buffers.appendleft(GLib.Bytes.new_from_bytes(
+                data, count, data.get_size() - count))
+        self._add_progress(count)
 
+        self._write_next_buffer(segment)
+        self._read_next_buffer(segment)
+        self._check_segment(segment)
+
+    def _add_progress(self, count):
         self._downloaded_size += count
         if self._total_size > 0:
             progress = self._downloaded_size / float(self._total_size)
             self.emit('progress', progress)
 
-        self._check_if_finished()
+    def _segment_interrupted(self, segment, error):
+        segment.input_stream = None
+        if self._error is not None:
+            self._check_finished()
+            return
 
-    def _complete(self):
-        if self._output_stream:
-            self._output_stream.close(None)
+        if segment.retries >= _MAX_RETRIES:
+            self._fail(IOError('Download interrupted: %s' % error))
+            return
 
-        result = None
-        if soup_status_is_successful(self._status_code):
-            if self._message.get_method() == "HEAD":
-                # this is a get_size request
-                result = self._total_size
-            else:
-                result = self._session.send_and_read(self._message, None)
-        else:
-            result = IOError("HTTP error code %d" % self._status_code)
-        self.emit('complete', result)
+        logging.debug('Download of %s interrupted at byte %d: %s',
+                      self._uri.to_string(), segment.received, error)
+        segment.retries += 1
+        segment.interrupted = True
+        self._check_segment(segment)
 
-    def _check_if_finished(self):
-        # To finish (for both successful completion and cancellation), we
-        # require two conditions to become true:
-        #  1. Soup message callback has been called
-        #  2. Any pending output file write completes
-        # Those conditions can become true in either order.
-        if not self._output_stream:
-            self._complete()
+    def _check_segment(self, segment):
+        # Requests resume from what was written, wait for the pending
+        # writes first
+        if segment.writing or segment.pending_buffers:
             return
 
-        if self._cancelling or not self._pending_buffers:
-            if self._status_code is not None \
-                    and not self._output_stream.has_pending():
-                self._complete()
+        if segment.interrupted:
+            segment.interrupted = False
+            segment.received = segment.position
+            GLib.timeout_add_seconds(_RETRY_DELAY, self.__retry_cb, segment)
+        elif segment.done_reading and not segment.finished:
+            segment.finished = True
+            if segment.io_stream is not None:
+                segment.io_stream.close(None)
+                segment.io_stream = None
+
+            if self._has_segments_left():
+                self._start_next_segments()
+            elif all(s.finished for s in self._segments):
+                self._complete(None)
+
+    def __retry_cb(self, segment):
+        if self._error is None:
+            self._request_segment(segment)
+        return False
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+            self._cancellable.cancel()
+            for segment in self._segments:
+                segment.pending_buffers.clear()
+        self._check_finished()
+
+    def _check_finished(self):
+        # Wait for the writes, the partial file is truncated after them
+        if any(segment.writing for segment in self._segments):
             return
+        self._complete(self._error)
 
-        self._write_next_buffer()
+    def _complete(self, result):
+        if self._completed:
+            return
+        self._completed = True
+
+        for segment in self._segments:
+            if segment.io_stream is not None:
+                segment.io_stream.close(None)
+                segment.io_stream = None
+
+        if result is None and self._part_path is not None:
+            output_path = self._get_temp_file_path(self._uri.to_string())
+            try:
+                os.rename(self._part_path, output_path)
+            except OSError as e:
+                result = e
+            else:
+                self._output_path = output_path
+                self._remove_validator()
+        elif result is None and self._buffers is not None:
+            result = GLib.Bytes.new(b''.join(self._buffers))
+        elif isinstance(result, Exception) and self._part_path is not None:
+            self._truncate_part_file()
+
+        self.emit('complete', result)
+
+    def _truncate_part_file(self):
+        # Keep what was downloaded without holes, downloading the same URL
+        # again resumes from there
+        segments = sorted(self._segments, key=attrgetter('start'))
+        length = segments[0].start
+        for segment in segments:
+            if segment.start > length:
+                break
+            length = max(length, segment.position)
+            if not segment.is_complete():
+                break
+
+        try:
+            os.truncate(self._part_path, length)
+        except OSError:
+            logging.exception('Could not truncate %s', self._part_path)
+
+    def _get_validator_file_path(self):
+        return self._part_path + '.validator'
+
+    def _load_validator(self):
+        try:
+            with open(self._get_validator_file_path()) as validator_file:
+                return validator_file.read().strip() or None
+        except IOError:
+            return None
+
+    def _save_validator(self):
+        # Downloads resumed from the partial file in a later session check
+        # that the content is still the same
+        if self._validator is None:
+            self._remove_validator()
+            return
+        try:
+            with open(self._get_validator_file_path(), 'w') as \
+                    validator_file:
+                validator_file.write(self._validator)
+        except IOError:
+            logging.exception('Could not save the validator of %s',
+                              self._part_path)
+
+    def _remove_validator(self):
+        try:
+            os.unlink(self._get_validator_file_path())
+        except OSError:
+            pass
+
+    def _get_part_file_path(self, uri):
+        scheme_, netloc_, path, params_, query_, fragment_ = \
+            urlparse(uri)
+        base_name = os.path.basename(path)
+        url_hash = hashlib.sha1(uri.encode('utf-8')).hexdigest()[:12]
 
-    def _write_next_buffer(self):
-        if not self._output_stream.has_pending():
-            data = self._pending_buffers.pop(0)
-            self._output_stream.write_bytes_async(data, GLib.PRIORITY_LOW,
-                                                  None, self.__write_async_cb,
-                                                  None)
+        part_files_dir = _get_part_files_dir()
+        if not os.path.exists(part_files_dir):
+            os.makedirs(part_files_dir)
+        return os.path.join(part_files_dir,
+                            '%s-%s.part' % (base_name, url_hash))
 
     def _get_temp_file_path(self, uri):
         # TODO: Should we use the HTTP headers for the file name?
@@ -219,5 +644,4 @@ class Downloader(GObject.GObject):
         return file_path
 
     def get_local_file_path(self):
-        if self._output_file:
-            return self._output_file.get_path()
+        return self._output_path
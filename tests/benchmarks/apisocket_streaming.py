@@ -0,0 +1,247 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the throughput of the apisocket datastore streams.
+
+The API server of the shell is started with a data store answering from
+a temporary directory, and a websocket client running in a thread loads
+a file of the given size (64 MiB by default) through a stream, then
+saves it back. The throughput of both transfers is printed, with the
+longest time the main loop was blocked during each of them. Run it from
+a Sugar session, the apisocket module needs a display.
+
+    python3 apisocket_streaming.py [--size MIB] [--chunk-size BYTES]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+
+from gi.repository import GLib
+
+from jarabe import apisocket
+
+_OPCODE_TEXT = 0x1
+_OPCODE_BINARY = 0x2
+
+_temp_dir = tempfile.mkdtemp()
+
+
+class _DataStore(object):
+    """Answers the calls made by DatastoreAPI, from _temp_dir"""
+
+    def get_filename(self, uid, reply_handler, error_handler):
+        GLib.idle_add(reply_handler, os.path.join(_temp_dir, uid))
+
+    def get_properties(self, uid, byte_arrays, reply_handler,
+                       error_handler):
+        GLib.idle_add(reply_handler, {'uid': uid})
+
+    def update(self, uid, metadata, file_path, transfer_ownership,
+               reply_handler, error_handler):
+        os.rename(file_path, os.path.join(_temp_dir, uid))
+        GLib.idle_add(reply_handler)
+
+
+class _BenchmarkDatastoreAPI(apisocket.DatastoreAPI):
+
+    def __init__(self, client):
+        self._client = client
+        self._activity = None
+        self._data_store = _DataStore()
+        self._sequence = 0
+
+    def _create_file(self):
+        self._sequence += 1
+        file_path = os.path.join(_temp_dir, 'instance-%d' % self._sequence)
+        return file_path, open(file_path, 'wb')
+
+
+class _Client(object):
+    """Minimal websocket client, enough for the apisocket protocol.
+
+    Frames are sent unmasked, gwebsockets accepts them and unmasking
+    them would dominate the time measured.
+    """
+
+    def __init__(self, port):
+        self._socket = socket.create_connection(('127.0.0.1', port))
+        self._file = self._socket.makefile('rb')
+        self._request_id = 0
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._socket.sendall(('GET / HTTP/1.1\r\n'
+                              'Host: 127.0.0.1:%d\r\n'
+                              'Upgrade: websocket\r\n'
+                              'Connection: Upgrade\r\n'
+                              'Sec-WebSocket-Key: %s\r\n'
+                              'Sec-WebSocket-Version: 13\r\n\r\n' %
+                              (port, key)).encode())
+        while self._file.readline() not in (b'\r\n', b''):
+            pass
+
+    def send(self, data, opcode):
+        header = bytes([0x80 | opcode])
+        if len(data) < 126:
+            header += bytes([len(data)])
+        else:
+            # gwebsockets can not parse 64 bits lengths
+            header += bytes([126]) + struct.pack('!H', len(data))
+        self._socket.sendall(header + data)
+
+    def receive(self):
+        opcode, length = struct.unpack('!BB', self._file.read(2))
+        if length == 126:
+            length = struct.unpack('!H', self._file.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._file.read(8))[0]
+        return opcode & 0xf, self._file.read(length)
+
+    def call(self, method, params, wait=True):
+        self._request_id += 1
+        request = {'method': method, 'params': params,
+                   'id': self._request_id}
+        self.send(json.dumps(request).encode(), _OPCODE_TEXT)
+        if not wait:
+            return None
+
+        while True:
+            opcode, data = self.receive()
+            if opcode != _OPCODE_TEXT:
+                continue
+            response = json.loads(data.decode())
+            if response.get('id') == self._request_id:
+                if response['error'] is not None:
+                    raise RuntimeError(response['error'])
+                return response['result']
+
+    def load(self, uid, chunk_size):
+        stream_id = self.call('open_stream', [])[0]
+        self.call('datastore.load', [uid, stream_id])
+
+        size = 0
+        while True:
+            self.send(struct.pack('ii', stream_id, chunk_size),
+                      _OPCODE_BINARY)
+            opcode, data = self.receive()
+            if len(data) == 1:
+                break
+            size += len(data) - 1
+
+        self.call('close_stream', [stream_id])
+        return size
+
+    def save(self, uid, file_path, chunk_size):
+        stream_id = self.call('open_stream', [])[0]
+        self.call('datastore.save', [uid, {}, stream_id])
+
+        prefix = bytes([stream_id])
+        with open(file_path, 'rb') as file_object:
+            while True:
+                data = file_object.read(chunk_size)
+                if not data:
+                    break
+                self.send(prefix + data, _OPCODE_BINARY)
+
+        self.call('close_stream', [stream_id])
+        return os.path.getsize(os.path.join(_temp_dir, uid))
+
+
+class _StallMonitor(object):
+    """Measures the longest interval between main loop iterations"""
+
+    def __init__(self):
+        self.longest = 0
+        self._last = time.monotonic()
+        GLib.timeout_add(1, self.__tick_cb)
+
+    def reset(self):
+        self.longest = 0
+        self._last = time.monotonic()
+
+    def __tick_cb(self):
+        now = time.monotonic()
+        self.longest = max(self.longest, now - self._last)
+        self._last = now
+        return True
+
+
+def _run_client(port, key, args, monitor, results, main_loop):
+    try:
+        client = _Client(port)
+        client.call('authenticate', ['benchmark', key], wait=False)
+
+        monitor.reset()
+        start = time.monotonic()
+        size = client.load('source', args.chunk_size)
+        results.append(('load', size, time.monotonic() - start,
+                        monitor.longest))
+
+        monitor.reset()
+        start = time.monotonic()
+        size = client.save('saved', os.path.join(_temp_dir, 'source'),
+                           args.chunk_size)
+        results.append(('save', size, time.monotonic() - start,
+                        monitor.longest))
+    finally:
+        GLib.idle_add(main_loop.quit)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=64,
+                        help='size of the file streamed, in MiB')
+    parser.add_argument('--chunk-size', type=int, default=32768,
+                        help='bytes per message, below 65535')
+    args = parser.parse_args()
+
+    with open(os.path.join(_temp_dir, 'source'), 'wb') as source:
+        for i in range(args.size):
+            source.write(os.urandom(1024 * 1024))
+
+    server = apisocket.APIServer()
+    server._apis['datastore'] = _BenchmarkDatastoreAPI
+
+    main_loop = GLib.MainLoop()
+    monitor = _StallMonitor()
+    results = []
+    thread = threading.Thread(
+        target=_run_client,
+        args=(server._port, server._key, args, monitor, results, main_loop))
+    thread.start()
+    main_loop.run()
+    thread.join()
+
+    shutil.rmtree(_temp_dir)
+
+    for name, size, elapsed, stall in results:
+        print('%s: %.1f MiB in %.3f s, %.1f MiB/s, main loop blocked for '
+              'up to %.1f ms' % (name, size / 1048576., elapsed,
+                                 size / 1048576. / elapsed, stall * 1000))
+    if len(results) != 2:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cost of bundle registry lookups as activities are added.
+
+For every size given on the command line (50, 500 and 5000 activities
+by default) synthetic activity bundles are installed in a temporary
+activities directory and a registry is built from it. Lookups by bundle
+id, by version and by MIME type are timed, next to a linear scan of the
+registry, which is how they used to be done.
+
+    python3 bundleregistry_lookup.py [number of activities ...]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+_base_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+_profile_dir = tempfile.mkdtemp()
+os.environ['SUGAR_HOME'] = _profile_dir
+os.environ['SUGAR_LIBRARY_PATH'] = tempfile.mkdtemp()
+os.environ['SUGAR_MIME_DEFAULTS'] = \
+    os.path.join(_base_dir, 'data', 'mime.defaults')
+os.environ['SUGAR_ACTIVITIES_HIDDEN'] = \
+    os.path.join(_base_dir, 'data', 'activities.hidden')
+
+from jarabe.model import bundleregistry
+
+_N_LOOKUPS = 10000
+_N_MIME_TYPES = 50
+_MIME_TYPES_PER_ACTIVITY = 3
+
+_ACTIVITY_INFO = """[Activity]
+name = Activity %(n)d
+bundle_id = org.sugarlabs.Benchmark%(n)d
+exec = sugar-activity3 activity.Activity
+icon = activity-benchmark
+activity_version = 1
+mime_types = %(mime_types)s
+license = GPLv3+
+"""
+
+_ICON = '<svg xmlns="http://www.w3.org/2000/svg" width="55" height="55"/>'
+
+
+def _get_mime_type(n):
+    return 'application/x-benchmark-%d' % (n % _N_MIME_TYPES)
+
+
+def _create_activities(root, n_activities):
+    for n in range(n_activities):
+        activity_dir = os.path.join(root, 'Benchmark%d.activity' % n,
+                                    'activity')
+        os.makedirs(activity_dir)
+        mime_types = [_get_mime_type(n + i)
+                      for i in range(_MIME_TYPES_PER_ACTIVITY)]
+        with open(os.path.join(activity_dir, 'activity.info'), 'w') as f:
+            f.write(_ACTIVITY_INFO % {'n': n,
+                                      'mime_types': ';'.join(mime_types)})
+        with open(os.path.join(activity_dir,
+                               'activity-benchmark.svg'), 'w') as f:
+            f.write(_ICON)
+
+
+def _time_per_call(function, n_activities):
+    start = time.monotonic()
+    for i in range(_N_LOOKUPS):
+        function(i % n_activities)
+    return (time.monotonic() - start) / _N_LOOKUPS * 1000000
+
+
+def _linear_get_bundle(registry, bundle_id):
+    for bundle in registry:
+        if bundle.get_bundle_id() == bundle_id:
+            return bundle
+    return None
+
+
+def _linear_get_activities_for_type(registry, mime_type):
+    return [bundle for bundle in registry
+            if mime_type in (bundle.get_mime_types() or [])]
+
+
+def _measure(n_activities):
+    activities_path = tempfile.mkdtemp()
+    os.environ['SUGAR_ACTIVITIES_PATH'] = activities_path
+    try:
+        _create_activities(activities_path, n_activities)
+        registry = bundleregistry.BundleRegistry()
+
+        def bundle_id(n):
+            return 'org.sugarlabs.Benchmark%d' % n
+
+        results = [
+            ('get_bundle', _time_per_call(
+                lambda n: registry.get_bundle(bundle_id(n)), n_activities),
+             _time_per_call(
+                lambda n: _linear_get_bundle(registry, bundle_id(n)),
+                n_activities)),
+            ('get_activities_for_type', _time_per_call(
+                lambda n: registry.get_activities_for_type(
+                    _get_mime_type(n)), n_activities),
+             _time_per_call(
+                lambda n: _linear_get_activities_for_type(
+                    registry, _get_mime_type(n)), n_activities)),
+            ('is_installed', _time_per_call(
+                lambda n: registry.is_installed(
+                    registry.get_bundle(bundle_id(n))), n_activities),
+             None),
+        ]
+    finally:
+        shutil.rmtree(activities_path)
+
+    for name, indexed, linear in results:
+        line = '%d activities, %s: %.1f us' % (n_activities, name, indexed)
+        if linear is not None:
+            line += ', linear scan: %.1f us' % linear
+        print(line)
+
+
+def main():
+    for n_activities in [int(arg) for arg in sys.argv[1:]] or \
+            [50, 500, 5000]:
+        _measure(n_activities)
+    shutil.rmtree(os.environ['SUGAR_LIBRARY_PATH'])
+    shutil.rmtree(_profile_dir)
+
+
+if __name__ == '__main__':
+    main()
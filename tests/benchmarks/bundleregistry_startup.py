@@ -0,0 +1,108 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how long the bundle registry takes to load at startup.
+
+Synthetic activity bundles (200 by default) are installed in a temporary
+activities directory, then the registry is built three times: without a
+bundle cache in the profile, as on the first boot, parsing the bundles
+in a single thread and then in parallel, and with the cache written by
+the previous build.
+
+    python3 bundleregistry_startup.py [number of activities]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+_base_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+_profile_dir = tempfile.mkdtemp()
+os.environ['SUGAR_HOME'] = _profile_dir
+os.environ['SUGAR_ACTIVITIES_PATH'] = tempfile.mkdtemp()
+os.environ['SUGAR_LIBRARY_PATH'] = tempfile.mkdtemp()
+os.environ['SUGAR_MIME_DEFAULTS'] = \
+    os.path.join(_base_dir, 'data', 'mime.defaults')
+os.environ['SUGAR_ACTIVITIES_HIDDEN'] = \
+    os.path.join(_base_dir, 'data', 'activities.hidden')
+
+from sugar3 import env
+
+from jarabe.model import bundleregistry
+
+_ACTIVITY_INFO = """[Activity]
+name = Activity %(n)d
+bundle_id = org.sugarlabs.Benchmark%(n)d
+exec = sugar-activity3 activity.Activity
+icon = activity-benchmark
+activity_version = 1
+mime_types = text/plain
+license = GPLv3+
+"""
+
+_ICON = '<svg xmlns="http://www.w3.org/2000/svg" width="55" height="55"/>'
+
+
+def _create_activities(root, n_activities):
+    for n in range(n_activities):
+        activity_dir = os.path.join(root, 'Benchmark%d.activity' % n,
+                                    'activity')
+        os.makedirs(activity_dir)
+        with open(os.path.join(activity_dir, 'activity.info'), 'w') as f:
+            f.write(_ACTIVITY_INFO % {'n': n})
+        with open(os.path.join(activity_dir,
+                               'activity-benchmark.svg'), 'w') as f:
+            f.write(_ICON)
+
+
+def _build_registry():
+    start = time.monotonic()
+    registry = bundleregistry.BundleRegistry()
+    elapsed = time.monotonic() - start
+    return len(registry), elapsed
+
+
+def main():
+    n_activities = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _create_activities(os.environ['SUGAR_ACTIVITIES_PATH'], n_activities)
+
+    cache_path = env.get_profile_path('bundle-cache')
+    parse_threads = bundleregistry._PARSE_THREADS
+
+    bundleregistry._PARSE_THREADS = 1
+    n_bundles, sequential = _build_registry()
+    print('%d bundles, no cache, 1 thread: %.3f s' % (n_bundles, sequential))
+
+    os.unlink(cache_path)
+    bundleregistry._PARSE_THREADS = parse_threads
+    n_bundles, uncached = _build_registry()
+    print('%d bundles, no cache, %d threads: %.3f s' %
+          (n_bundles, parse_threads, uncached))
+
+    n_bundles, cached = _build_registry()
+    print('%d bundles, cached: %.3f s, %.1f times faster' %
+          (n_bundles, cached, uncached / cached))
+
+    for name in ['SUGAR_ACTIVITIES_PATH', 'SUGAR_LIBRARY_PATH']:
+        shutil.rmtree(os.environ[name])
+    shutil.rmtree(_profile_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the throughput of the downloader, and how it recovers from
+interrupted connections.
+
+A local HTTP server supporting Range requests serves random content (32
+MiB by default), optionally limited to a bandwidth per connection like a
+remote server would be. The content is downloaded to a temporary file in
+a single stream, in parallel segments, and in a single stream with the
+connection cut several times.
+
+    python3 downloader_throughput.py [--size MIB] [--rate KIB_PER_S]
+        [--drops N]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import http.server
+import socketserver
+
+os.environ['SUGAR_HOME'] = tempfile.mkdtemp()
+
+from gi.repository import GLib
+
+from sugar3 import env
+
+from jarabe.util import downloader
+
+_WRITE_SIZE = 16384
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        content = server.content
+        start = 0
+        end = len(content) - 1
+
+        range_header = self.headers.get('Range')
+        if range_header is not None:
+            first, last = range_header[len('bytes='):].split('-')
+            start = int(first)
+            if last:
+                end = min(int(last), end)
+            self.send_response(206)
+            self.send_header('Content-Range',
+                             'bytes %d-%d/%d' % (start, end, len(content)))
+        else:
+            self.send_response(200)
+
+        body = memoryview(content)[start:end + 1]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        with server.lock:
+            drop = server.drops > 0
+            if drop:
+                server.drops -= 1
+        if drop:
+            body = body[:len(body) // 4]
+
+        for offset in range(0, len(body), _WRITE_SIZE):
+            self.wfile.write(body[offset:offset + _WRITE_SIZE])
+            if server.rate:
+                time.sleep(_WRITE_SIZE / server.rate)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _download(port, name, parallel=False):
+    result = []
+    url = 'http://127.0.0.1:%d/%s' % (port, name)
+    file_downloader = downloader.Downloader(url)
+    file_downloader.connect('complete',
+                            lambda downloader, value: result.append(value))
+
+    start = time.monotonic()
+    file_downloader.download_to_temp(parallel=parallel)
+    context = GLib.MainContext.default()
+    while not result:
+        context.iteration(True)
+    elapsed = time.monotonic() - start
+
+    if result[0] is not None:
+        raise result[0]
+    os.unlink(file_downloader.get_local_file_path())
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=32,
+                        help='size of the content, in MiB')
+    parser.add_argument('--rate', type=int, default=0,
+                        help='bandwidth per connection in KiB/s, 0 for '
+                        'no limit')
+    parser.add_argument('--drops', type=int, default=3,
+                        help='connections cut in the last download')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(env.get_profile_path(), 'data'), exist_ok=True)
+    downloader._RETRY_DELAY = 0
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.content = os.urandom(args.size * 1024 * 1024)
+    server.rate = args.rate * 1024
+    server.drops = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    port = server.server_address[1]
+
+    for name, parallel, drops in [('single stream', False, 0),
+                                  ('parallel segments', True, 0),
+                                  ('%d interruptions' % args.drops, False,
+                                   args.drops)]:
+        server.drops = drops
+        elapsed = _download(port, name.replace(' ', '-'), parallel)
+        print('%s: %.3f s, %.1f MiB/s' % (name, elapsed, args.size / elapsed))
+
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(os.environ['SUGAR_HOME'])
+
+
+if __name__ == '__main__':
+    main()
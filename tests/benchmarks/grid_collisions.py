@@ -0,0 +1,107 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cost of placing icons in the grid of the favorites view.
+
+For every number of icons given on the command line (50, 200 and 1000
+by default) a grid the size of a 1200x900 screen is filled with icons at
+random positions, like the freeform and random layouts do. The time to
+add an icon, to move one and to run a refresh of the collision solver
+is printed, with the time to find the collisions of an icon next to a
+linear scan of all the icons, which is how they used to be found.
+
+    python3 grid_collisions.py [number of icons ...]
+"""
+
+import sys
+import time
+import random
+
+from gi.repository import Gdk
+
+from jarabe.desktop.grid import Grid
+
+_GRID_WIDTH = 300
+_GRID_HEIGHT = 225
+_ICON_SIZE = 14
+_N_MOVES = 1000
+_N_REFRESHES = 50
+
+
+def _linear_detect_collisions(grid, child):
+    child_rect = grid.get_child_rect(child)
+    collisions = []
+    for c in grid._child_rects:
+        intersects_, intersection = Gdk.rectangle_intersect(
+            child_rect, grid.get_child_rect(c))
+        if c != child and intersection.width > 0:
+            collisions.append(c)
+    return collisions
+
+
+def _random_position():
+    return (random.randint(0, _GRID_WIDTH - _ICON_SIZE),
+            random.randint(0, _GRID_HEIGHT - _ICON_SIZE))
+
+
+def _measure(n_icons):
+    random.seed(n_icons)
+    grid = Grid(_GRID_WIDTH, _GRID_HEIGHT)
+    icons = list(range(n_icons))
+
+    start = time.monotonic()
+    for icon in icons:
+        x, y = _random_position()
+        grid.add(icon, _ICON_SIZE, _ICON_SIZE, x, y)
+    add_time = (time.monotonic() - start) / n_icons
+
+    start = time.monotonic()
+    for i in range(_N_MOVES):
+        x, y = _random_position()
+        grid.move(random.choice(icons), x, y)
+    move_time = (time.monotonic() - start) / _N_MOVES
+
+    start = time.monotonic()
+    for i in range(_N_MOVES):
+        grid._detect_collisions(random.choice(icons))
+    detect_time = (time.monotonic() - start) / _N_MOVES
+
+    start = time.monotonic()
+    for i in range(_N_MOVES):
+        _linear_detect_collisions(grid, random.choice(icons))
+    linear_time = (time.monotonic() - start) / _N_MOVES
+
+    refreshes = 0
+    start = time.monotonic()
+    while grid._collisions and refreshes < _N_REFRESHES:
+        grid._Grid__solve_collisions_cb()
+        refreshes += 1
+    solve_time = (time.monotonic() - start) / max(refreshes, 1)
+
+    print('%d icons: add %.1f us, move %.1f us, collisions of an icon '
+          '%.1f us, linear scan: %.1f us, solver refresh %.2f ms' %
+          (n_icons, add_time * 1000000, move_time * 1000000,
+           detect_time * 1000000, linear_time * 1000000,
+           solve_time * 1000))
+
+
+def main():
+    for n_icons in [int(arg) for arg in sys.argv[1:]] or [50, 200, 1000]:
+        _measure(n_icons)
+
+
+if __name__ == '__main__':
+    main()
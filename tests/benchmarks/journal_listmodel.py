@@ -0,0 +1,104 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how many rows per second the Journal list model renders.
+
+The list is drawn the way the tree view does it while scrolling: every
+frame asks for all the columns of the visible rows, then the view moves
+down by a few rows. Entries are synthetic and already cached by the
+result set, so only the cost of computing rows is measured.
+
+The model is measured with a row cache holding a single row, which is
+what the model used to memoize, and with its default row cache.
+
+    python3 journal_listmodel.py [number of frames]
+"""
+
+import sys
+import json
+import time
+
+from jarabe.journal import model
+from jarabe.journal.listmodel import ListModel
+
+_N_ENTRIES = 1000
+_VISIBLE_ROWS = 20
+_ROWS_PER_FRAME = 3
+
+
+class _ResultSet(model.BaseResultSet):
+    def find(self, query):
+        offset = query['offset']
+        end = min(offset + query['limit'], _N_ENTRIES)
+        entries = [_create_entry(i) for i in range(offset, end)]
+        return entries, _N_ENTRIES
+
+
+def _create_entry(i):
+    buddies = {'buddy%d' % n: ['Buddy %d' % n, '#FF0000,#00FF00']
+               for n in range(i % 4)}
+    return {'uid': 'entry%d' % i,
+            'title': 'Entry %d' % i,
+            'keep': str(i % 2),
+            'activity': 'org.laptop.WebActivity',
+            'mime_type': 'text/plain',
+            'icon-color': '#00FF00,#0000FF',
+            'timestamp': str(time.time() - i * 60),
+            'creation_time': str(time.time() - i * 120),
+            'filesize': str(i * 1024),
+            'buddies': json.dumps(buddies),
+            'mountpoint': '/'}
+
+
+def _measure(row_cache_size, n_frames):
+    ListModel._ROW_CACHE_SIZE = row_cache_size
+    list_model = ListModel({})
+
+    # Cache every page so the datastore is never hit
+    for position in range(0, _N_ENTRIES, ListModel._PAGE_SIZE):
+        list_model._result_set.seek(position)
+        list_model._result_set.read()
+
+    # The selection is drawn from a cell data function, not from a column
+    n_columns = ListModel.COLUMN_SELECT
+    n_rows = 0
+    start = time.monotonic()
+    for frame in range(n_frames):
+        first_row = frame * _ROWS_PER_FRAME % (_N_ENTRIES - _VISIBLE_ROWS)
+        for index in range(first_row, first_row + _VISIBLE_ROWS):
+            iterator = list_model.get_iter((index,))
+            for column in range(n_columns):
+                list_model.do_get_value(iterator, column)
+            n_rows += 1
+    return n_rows / (time.monotonic() - start)
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    model.find = lambda query, page_size: _ResultSet(query, page_size)
+    model.MAX_PAGES_TO_CACHE = _N_ENTRIES // ListModel._PAGE_SIZE
+    default_size = ListModel._ROW_CACHE_SIZE
+
+    last_row = _measure(1, n_frames)
+    print('last row memo: %.0f rows/s' % last_row)
+    cached = _measure(default_size, n_frames)
+    print('row cache of %d rows: %.0f rows/s, %.1f times faster' %
+          (default_size, cached, cached / last_row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how many files per second the Journal scans on a mount point.
+
+A synthetic tree is created for every size given on the command line
+(10000 and 100000 files by default) and scanned twice: once without and
+once with a mount index. The time until the first page of results is
+ready is measured as well.
+
+    python3 journal_scan.py [number of files ...]
+
+With --scaling, trees of 62500 up to 500000 files are scanned without
+an index, and the cost per file is compared across sizes; it should stay
+about the same if the scan is linear.
+
+    python3 journal_scan.py --scaling
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+_profile_dir = tempfile.mkdtemp()
+os.environ['SUGAR_HOME'] = _profile_dir
+
+from gi.repository import GLib
+
+from jarabe.journal import model
+from jarabe.journal import mountindex
+
+_FILES_PER_DIRECTORY = 100
+_PAGE_SIZE = 10
+_SCALING_SIZES = [62500, 125000, 250000, 500000]
+
+
+def _create_tree(root, n_files):
+    for i in range(n_files):
+        dir_path = os.path.join(root, 'dir%d' % (i // _FILES_PER_DIRECTORY))
+        if i % _FILES_PER_DIRECTORY == 0:
+            os.mkdir(dir_path)
+        with open(os.path.join(dir_path, 'file%d.txt' % i), 'w') as f:
+            f.write('x')
+
+    # Recently modified directories are not recorded in the index
+    timestamp = time.time() - 60
+    for dir_path, dir_names_, file_names_ in os.walk(root):
+        os.utime(dir_path, (timestamp, timestamp))
+
+
+def _scan(mount_point, page_size):
+    result_set = model.InplaceResultSet({}, page_size, mount_point)
+    loop = GLib.MainLoop()
+    result_set.ready.connect(lambda **kwargs: loop.quit())
+
+    start = time.monotonic()
+    result_set.setup()
+    loop.run()
+    elapsed = time.monotonic() - start
+
+    n_files = len(result_set.find_ids({}))
+    result_set.stop()
+    return n_files, elapsed
+
+
+def _measure_scaling():
+    costs = []
+    for size in _SCALING_SIZES:
+        mount_point = tempfile.mkdtemp()
+        try:
+            _create_tree(mount_point, size)
+            mountindex._indexes.clear()
+            n_files, elapsed = _scan(mount_point, size + 1)
+        finally:
+            shutil.rmtree(mount_point)
+
+        cost = elapsed / n_files * 1000000
+        costs.append(cost)
+        print('%d files: %.2f s, %.1f us/file' % (n_files, elapsed, cost))
+
+    print('cost per file at %d files is %.2f times the one at %d files' %
+          (_SCALING_SIZES[-1], costs[-1] / costs[0], _SCALING_SIZES[0]))
+
+
+def _measure_sizes(sizes):
+    for size in sizes:
+        mount_point = tempfile.mkdtemp()
+        try:
+            _create_tree(mount_point, size)
+
+            # With a page larger than the tree, ready is only sent
+            # once the whole tree was scanned
+            n_files, elapsed = _scan(mount_point, size + 1)
+            print('%d files, no index: %.2f s, %.0f files/s' %
+                  (n_files, elapsed, n_files / elapsed))
+
+            # Force the index to be read back from the profile
+            mountindex._indexes.clear()
+            n_files, elapsed = _scan(mount_point, size + 1)
+            print('%d files, indexed: %.2f s, %.0f files/s' %
+                  (n_files, elapsed, n_files / elapsed))
+
+            mountindex._indexes.clear()
+            n_files_, elapsed = _scan(mount_point, _PAGE_SIZE)
+            print('%d files, indexed: first page after %.3f s' %
+                  (size, elapsed))
+        finally:
+            shutil.rmtree(mount_point)
+
+
+def main():
+    if sys.argv[1:] == ['--scaling']:
+        _measure_scaling()
+    else:
+        _measure_sizes([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
+    shutil.rmtree(_profile_dir)
+
+
+if __name__ == '__main__':
+    main()
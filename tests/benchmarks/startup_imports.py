@@ -0,0 +1,117 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure what the shell imports before it can show the home window.
+
+jarabe.main imports some modules when it is loaded, before the home
+window is created, and others from the callbacks run after it is shown.
+Both sets are read from main.py, then imported in fresh interpreters:
+the modules imported at load time only, and all of them as if every
+module was imported at load time. The median of several runs is shown.
+Run it from a Sugar session, some modules need a display.
+
+Startup traces written by the shell with SUGAR_STARTUP_TRACE can be
+given as well, the time until the home window was shown is printed for
+each of them.
+
+    python3 startup_imports.py [--runs N] [TRACE ...]
+"""
+
+import os
+import ast
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+_MAIN_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)))), 'src', 'jarabe', 'main.py')
+
+_PREAMBLE = """
+import gi
+gi.require_version('Gtk', '3.0')
+gi.require_version('Gst', '1.0')
+gi.require_version('Wnck', '3.0')
+gi.require_version('SugarExt', '1.0')
+gi.require_version('GdkX11', '3.0')
+"""
+
+
+def _get_import_statements():
+    """Return the import statements of main.py run at load time, and the
+    ones run from functions.
+    """
+    with open(_MAIN_PATH) as main_file:
+        source = main_file.read()
+    tree = ast.parse(source)
+
+    module_level = []
+    deferred = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        statement = ast.get_source_segment(source, node)
+        if node in tree.body:
+            module_level.append(statement)
+        elif statement not in deferred:
+            deferred.append(statement)
+    return module_level, deferred
+
+
+def _time_imports(statements, runs):
+    code = _PREAMBLE + '\n'.join(statements)
+    timings = []
+    for i in range(runs):
+        start = time.monotonic()
+        subprocess.check_call([sys.executable, '-c', code])
+        timings.append(time.monotonic() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def _print_home_window_time(trace_path):
+    with open(trace_path) as trace_file:
+        events = json.load(trace_file)['traceEvents']
+    for event in events:
+        if event['name'] == 'home window shown':
+            print('%s: home window shown after %.3f s' %
+                  (trace_path, event['ts'] / 1000000.))
+            return
+    print('%s: the home window was not shown' % trace_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('traces', nargs='*')
+    args = parser.parse_args()
+
+    module_level, deferred = _get_import_statements()
+    lazy = _time_imports(module_level, args.runs)
+    eager = _time_imports(module_level + deferred, args.runs)
+    print('%d imports before the home window: %.3f s' %
+          (len(module_level), lazy))
+    print('with the %d deferred imports as well: %.3f s' %
+          (len(deferred), eager))
+
+    for trace_path in args.traces:
+        _print_home_window_time(trace_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare two startup traces written by the shell.
+
+Start the shell with SUGAR_STARTUP_TRACE set to a file path to write a
+trace. The phases, imports and milestones of both traces are listed with
+their durations, or their time since startup for milestones, and the ones
+that got slower by more than the given threshold are reported as
+regressions. The exit status is 1 when there are regressions.
+
+    python3 startup_trace_compare.py [--threshold PERCENT]
+        [--min-ms MILLISECONDS] [--all] BEFORE AFTER
+"""
+
+import sys
+import json
+import argparse
+
+
+def _load_trace(path):
+    """Return the durations in milliseconds by (category, name)."""
+    with open(path) as trace_file:
+        events = json.load(trace_file)['traceEvents']
+
+    durations = {}
+    for event in events:
+        key = (event['cat'], event['name'])
+        if event['cat'] == 'mark':
+            value = event['ts'] / 1000.
+        else:
+            value = event['dur'] / 1000.
+        # Phases run several times, like main loop callbacks, add up
+        durations[key] = durations.get(key, 0) + value
+    return durations
+
+
+def _compare(before, after, threshold, min_ms, show_all):
+    regressions = []
+    rows = []
+    for key in sorted(set(before) | set(after)):
+        old = before.get(key)
+        new = after.get(key)
+        if old is None or new is None:
+            rows.append((key, old, new, None))
+            continue
+
+        delta = new - old
+        regressed = delta > min_ms and \
+            (old == 0 or delta / old * 100 > threshold)
+        if regressed:
+            regressions.append(key)
+        if regressed or show_all or key[0] != 'import':
+            rows.append((key, old, new, regressed))
+
+    for (category, name), old, new, regressed in rows:
+        old_text = '-' if old is None else '%.1f' % old
+        new_text = '-' if new is None else '%.1f' % new
+        flag = ' REGRESSION' if regressed else ''
+        print('%-7s %-50s %9s ms %9s ms%s' %
+              (category, name[:50], old_text, new_text, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare two shell startup traces')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='percentage of slowdown reported')
+    parser.add_argument('--min-ms', type=float, default=5,
+                        help='smallest slowdown reported, in milliseconds')
+    parser.add_argument('--all', action='store_true',
+                        help='list every import, not only the slower ones')
+    args = parser.parse_args()
+
+    regressions = _compare(_load_trace(args.before),
+                           _load_trace(args.after),
+                           args.threshold, args.min_ms, args.all)
+    if regressions:
+        print('%d regressions' % len(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
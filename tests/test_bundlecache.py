@@ -0,0 +1,96 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from jarabe.model.bundlecache import BundleCache
+
+
+class _Bundle(object):
+    def __init__(self, bundle_id):
+        self.bundle_id = bundle_id
+
+
+class TestBundleCache(unittest.TestCase):
+    def setUp(self):
+        self._activities_dir = tempfile.mkdtemp()
+        self._cache_dir = tempfile.mkdtemp()
+        self._cache_path = os.path.join(self._cache_dir, 'bundle-cache')
+        self._bundle_path = self._create_bundle('Sample.activity')
+
+    def tearDown(self):
+        shutil.rmtree(self._activities_dir)
+        shutil.rmtree(self._cache_dir)
+
+    def _create_bundle(self, name):
+        bundle_path = os.path.join(self._activities_dir, name)
+        os.makedirs(os.path.join(bundle_path, 'activity'))
+        self._write_info(bundle_path, 100)
+        return bundle_path
+
+    def _write_info(self, bundle_path, mtime):
+        info_path = os.path.join(bundle_path, 'activity', 'activity.info')
+        with open(info_path, 'w') as info_file:
+            info_file.write('[Activity]\n')
+        os.utime(info_path, (mtime, mtime))
+
+    def _new_cache(self):
+        cache = BundleCache(self._cache_path)
+        cache.load()
+        return cache
+
+    def test_save_and_load(self):
+        cache = self._new_cache()
+        cache.set(self._bundle_path, _Bundle('org.sugarlabs.Sample'))
+        cache.save()
+
+        cache = self._new_cache()
+        bundle = cache.get(self._bundle_path)
+        self.assertIsNotNone(bundle)
+        self.assertEqual('org.sugarlabs.Sample', bundle.bundle_id)
+
+    def test_info_modified(self):
+        cache = self._new_cache()
+        cache.set(self._bundle_path, _Bundle('org.sugarlabs.Sample'))
+        self._write_info(self._bundle_path, 200)
+        self.assertIsNone(cache.get(self._bundle_path))
+
+    def test_language_changed(self):
+        language = os.environ.get('LANGUAGE')
+        cache = self._new_cache()
+        cache.set(self._bundle_path, _Bundle('org.sugarlabs.Sample'))
+        cache.save()
+
+        os.environ['LANGUAGE'] = 'xx'
+        try:
+            cache = self._new_cache()
+        finally:
+            if language is None:
+                del os.environ['LANGUAGE']
+            else:
+                os.environ['LANGUAGE'] = language
+        self.assertIsNone(cache.get(self._bundle_path))
+
+    def test_retain(self):
+        other_path = self._create_bundle('Other.activity')
+        cache = self._new_cache()
+        cache.set(self._bundle_path, _Bundle('org.sugarlabs.Sample'))
+        cache.set(other_path, _Bundle('org.sugarlabs.Other'))
+        cache.retain([self._bundle_path])
+        self.assertIsNotNone(cache.get(self._bundle_path))
+        self.assertIsNone(cache.get(other_path))
@@ -58,3 +58,12 @@ class TestBundleRegistry(unittest.TestCase):
         registry.install(bundle)
         installed_bundle = registry.get_bundle("org.sugarlabs.MyActivity")
         self.assertIsNotNone(installed_bundle)
+
+    def test_install_stats(self):
+        registry = bundleregistry.get_registry()
+        bundle = bundle_from_archive(os.path.join(data_dir, 'activity-1.xo'))
+        registry.install(bundle)
+        stats = registry.get_install_stats()
+        self.assertEqual(0, stats['queued'])
+        self.assertEqual(0, stats['running'])
+        self.assertGreaterEqual(stats['finished'], 1)
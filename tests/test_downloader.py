@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import time
 import unittest
 import threading
 import http.server
@@ -22,6 +23,7 @@ import socketserver
 from gi.repository import GLib
 
 from sugar3 import env
+from jarabe.util import downloader as downloader_module
 from jarabe.util.downloader import Downloader
 
 profile_data_dir = os.path.join(env.get_profile_path(), 'data')
@@ -88,3 +90,213 @@ class TestDownloader(unittest.TestCase):
             context.iteration(True)
 
         self.assertEqual(6, self._result)
+
+
+class _RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the content of the server, with Range requests, and cuts
+    the first server.drops responses after server.drop_after bytes. The
+    size of the content is not given in partial responses if
+    server.unknown_size is set.
+    """
+
+    def do_GET(self):
+        server = self.server
+        content = server.content
+        start = 0
+        end = len(content) - 1
+
+        range_header = self.headers.get('Range')
+        with server.lock:
+            server.ranges.append(range_header)
+            drop = server.drops > 0
+            if drop:
+                server.drops -= 1
+
+        if_range = self.headers.get('If-Range')
+        if if_range is not None and if_range != server.etag:
+            range_header = None
+
+        if range_header is not None:
+            first, last = range_header[len('bytes='):].split('-')
+            start = int(first)
+            if last:
+                end = min(int(last), end)
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%d' % len(content))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            if server.unknown_size:
+                total = '*'
+            else:
+                total = str(len(content))
+            self.send_header('Content-Range',
+                             'bytes %d-%d/%s' % (start, end, total))
+        else:
+            self.send_response(200)
+
+        body = content[start:end + 1]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', server.etag)
+        self.end_headers()
+
+        if drop:
+            self.wfile.write(body[:server.drop_after])
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResumableDownloader(unittest.TestCase):
+    def setUp(self):
+        self._server = socketserver.ThreadingTCPServer(
+            ("", 0), _RangeRequestHandler)
+        self._server.daemon_threads = True
+        self._server.content = os.urandom(1024 * 1024)
+        self._server.ranges = []
+        self._server.drops = 0
+        self._server.drop_after = 0
+        self._server.etag = '"test"'
+        self._server.unknown_size = False
+        self._server.lock = threading.Lock()
+        self._port = self._server.server_address[1]
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+
+        self._retry_delay = downloader_module._RETRY_DELAY
+        self._segment_size = downloader_module._SEGMENT_SIZE
+        downloader_module._RETRY_DELAY = 0
+
+    def tearDown(self):
+        downloader_module._RETRY_DELAY = self._retry_delay
+        downloader_module._SEGMENT_SIZE = self._segment_size
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+
+    def download_complete_cb(self, downloader, result):
+        self._complete = True
+        self._result = result
+
+    def _download_to_temp(self, name, parallel=False):
+        downloader = Downloader("http://0.0.0.0:%d/%s" % (self._port, name))
+        self._complete = False
+        downloader.connect('complete', self.download_complete_cb)
+        downloader.download_to_temp(parallel=parallel)
+
+        while not self._complete:
+            context.iteration(True)
+        return downloader
+
+    def _create_part_file(self, name, size, validator='"test"'):
+        url = "http://0.0.0.0:%d/%s" % (self._port, name)
+        part_path = Downloader(url)._get_part_file_path(url)
+        with open(part_path, "wb") as f:
+            f.write(self._server.content[:size])
+        if validator is not None:
+            with open(part_path + '.validator', "w") as f:
+                f.write(validator)
+        return part_path
+
+    def _check_downloaded_file(self, downloader):
+        self.assertIsNone(self._result)
+        path = downloader.get_local_file_path()
+        with open(path, "rb") as f:
+            self.assertEqual(self._server.content, f.read())
+        os.unlink(path)
+
+    def test_resume_after_interruption(self):
+        self._server.drops = 2
+        self._server.drop_after = 100000
+        downloader = self._download_to_temp('interrupted')
+
+        self._check_downloaded_file(downloader)
+        self.assertEqual([None, 'bytes=100000-', 'bytes=200000-1048575'],
+                         self._server.ranges)
+
+    def test_resume_from_partial_file(self):
+        part_path = self._create_part_file('partial', 300000)
+
+        downloader = self._download_to_temp('partial')
+
+        self._check_downloaded_file(downloader)
+        self.assertEqual(['bytes=300000-'], self._server.ranges)
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(os.path.exists(part_path + '.validator'))
+
+    def test_partial_file_without_validator(self):
+        self._create_part_file('no-validator', 300000, validator=None)
+
+        downloader = self._download_to_temp('no-validator')
+
+        self._check_downloaded_file(downloader)
+        self.assertEqual([None], self._server.ranges)
+
+    def test_partial_file_of_changed_content(self):
+        self._create_part_file('changed', 300000, validator='"old"')
+
+        downloader = self._download_to_temp('changed')
+
+        self._check_downloaded_file(downloader)
+        self.assertEqual(['bytes=300000-'], self._server.ranges)
+
+    def test_parallel_download(self):
+        downloader_module._SEGMENT_SIZE = 100000
+        self._server.drops = 1
+        self._server.drop_after = 1000
+        downloader = self._download_to_temp('parallel', parallel=True)
+
+        self._check_downloaded_file(downloader)
+        ranges = set(self._server.ranges)
+        self.assertIn('bytes=0-99999', ranges)
+        self.assertIn('bytes=1000-99999', ranges)
+        self.assertIn('bytes=1000000-1048575', ranges)
+
+    def test_parallel_download_of_unknown_size(self):
+        downloader_module._SEGMENT_SIZE = 100000
+        self._server.unknown_size = True
+        downloader = self._download_to_temp('unknown-size', parallel=True)
+
+        self._check_downloaded_file(downloader)
+        self.assertEqual(['bytes=0-99999', 'bytes=100000-'],
+                         self._server.ranges)
+
+    def test_failed_download_keeps_partial_file(self):
+        part_path = self._create_part_file('failed', 300000)
+
+        self._server.drops = downloader_module._MAX_RETRIES + 1
+        downloader = self._download_to_temp('failed')
+
+        self.assertIsInstance(self._result, IOError)
+        self.assertIsNone(downloader.get_local_file_path())
+        self.assertEqual(300000, os.path.getsize(part_path))
+
+        downloader = self._download_to_temp('failed')
+        self._check_downloaded_file(downloader)
+        self.assertEqual('bytes=300000-', self._server.ranges[-1])
+
+    def test_remove_stale_part_files(self):
+        stale_path = self._create_part_file('stale', 1000)
+        recent_path = self._create_part_file('recent', 1000)
+        orphan_path = self._create_part_file('orphan', 1000)
+        os.unlink(orphan_path)
+
+        old_time = time.time() - downloader_module._PART_FILE_MAX_AGE - 1
+        os.utime(stale_path, (old_time, old_time))
+        downloader_module.remove_stale_part_files()
+
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertFalse(os.path.exists(stale_path + '.validator'))
+        self.assertFalse(os.path.exists(orphan_path + '.validator'))
+        self.assertTrue(os.path.exists(recent_path))
+        self.assertTrue(os.path.exists(recent_path + '.validator'))
+
+        os.unlink(recent_path)
+        os.unlink(recent_path + '.validator')
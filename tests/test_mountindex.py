@@ -0,0 +1,81 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from jarabe.journal.mountindex import MountIndex
+
+
+class TestMountIndex(unittest.TestCase):
+    def setUp(self):
+        self._mount_point = tempfile.mkdtemp()
+        self._index_dir = tempfile.mkdtemp()
+        self._index_path = os.path.join(self._index_dir, 'index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self._mount_point)
+        shutil.rmtree(self._index_dir)
+
+    def _new_index(self, uuid='1234-ABCD'):
+        index = MountIndex(self._mount_point, uuid, self._index_path)
+        index.load()
+        return index
+
+    def test_save_and_load(self):
+        index = self._new_index()
+        entries = {'photo.png': ['f', 10.0, 2048, None], 'music': ['d']}
+        index.set_directory(self._mount_point, (10.0, 2, None), entries)
+        index.save()
+
+        index = self._new_index()
+        self.assertEqual(entries,
+                         index.lookup(self._mount_point, (10.0, 2, None)))
+
+    def test_key_mismatch(self):
+        index = self._new_index()
+        index.set_directory(self._mount_point, (10.0, 2, None), {})
+        self.assertIsNone(index.lookup(self._mount_point, (11.0, 2, None)))
+        self.assertIsNone(index.lookup(self._mount_point, (10.0, 3, None)))
+
+    def test_key_mismatch_forgets_terms(self):
+        index = self._new_index()
+        photo_path = os.path.join(self._mount_point, 'photo.png')
+        index.set_directory(self._mount_point, (10.0, 2, None),
+                            {'photo.png': ['f', 10.0, 2048, None]})
+        index.terms.add(photo_path, ['photo'])
+
+        self.assertIsNone(index.lookup(self._mount_point, (11.0, 2, None)))
+        self.assertNotIn(photo_path, index.terms)
+        self.assertIsNone(index.lookup(self._mount_point, (10.0, 2, None)))
+
+    def test_other_volume(self):
+        index = self._new_index()
+        index.set_directory(self._mount_point, (10.0, 2, None), {})
+        index.save()
+
+        index = self._new_index(uuid='5678-EF01')
+        self.assertIsNone(index.lookup(self._mount_point, (10.0, 2, None)))
+
+    def test_retain(self):
+        index = self._new_index()
+        subdir = os.path.join(self._mount_point, 'subdir')
+        index.set_directory(self._mount_point, (10.0, 2, None), {})
+        index.set_directory(subdir, (10.0, 3, None), {})
+        index.retain([self._mount_point])
+        self.assertIsNotNone(index.lookup(self._mount_point, (10.0, 2, None)))
+        self.assertIsNone(index.lookup(subdir, (10.0, 3, None)))
@@ -0,0 +1,194 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gc
+import unittest
+
+from gi.repository import GLib
+
+from sugar3 import dispatch
+
+from jarabe.model import resumeentries
+
+context = GLib.MainContext.default()
+
+
+class _DataStore(object):
+    """Answers find() from a list of entries, like the data store"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.queries = []
+        self.created = dispatch.Signal()
+        self.updated = dispatch.Signal()
+        self.deleted = dispatch.Signal()
+
+    def find(self, query, sorting, limit, properties, reply_handler,
+             error_handler):
+        self.queries.append(query)
+        bundle_ids = query['activity']
+        if not isinstance(bundle_ids, list):
+            bundle_ids = [bundle_ids]
+        end = query.get('timestamp', {}).get('end')
+        matches = [entry for entry in self.entries
+                   if entry['activity'] in bundle_ids and
+                   (end is None or entry['timestamp'] <= end)]
+        matches.sort(key=lambda entry: entry['timestamp'], reverse=True)
+        GLib.idle_add(reply_handler, [dict(entry)
+                                      for entry in matches[:limit]],
+                      len(matches))
+
+
+def _entry(uid, bundle_id, timestamp):
+    return {'uid': uid, 'activity': bundle_id, 'timestamp': timestamp}
+
+
+class TestResumeEntries(unittest.TestCase):
+    def setUp(self):
+        self._datastore = _DataStore([])
+        self._real_datastore = resumeentries.datastore
+        resumeentries.datastore = self._datastore
+        self._model = resumeentries.ResumeEntries()
+        self._changes = []
+
+    def tearDown(self):
+        resumeentries.datastore = self._real_datastore
+
+    def _changed_cb(self, bundle_id, entries):
+        self._changes.append((bundle_id, [entry['uid'] for entry in entries]))
+
+    def _iterate(self):
+        while context.pending():
+            context.iteration(False)
+
+    def test_batched_query(self):
+        self._datastore.entries = \
+            [_entry('a%d' % i, 'org.A', i) for i in range(3)] + \
+            [_entry('b%d' % i, 'org.B', i) for i in range(2)] + \
+            [_entry('c0', 'org.C', 0)]
+
+        for bundle_id in ['org.A', 'org.B', 'org.C']:
+            self.assertIsNone(self._model.watch(bundle_id, self._changed_cb))
+        self._iterate()
+
+        self.assertEqual(1, len(self._datastore.queries))
+        self.assertEqual([('org.A', ['a2', 'a1', 'a0']),
+                          ('org.B', ['b1', 'b0']),
+                          ('org.C', ['c0'])], sorted(self._changes))
+
+    def test_truncated_query(self):
+        # org.A fills the limit of the batched query
+        self._datastore.entries = \
+            [_entry('a%d' % i, 'org.A', 100 + i) for i in range(20)] + \
+            [_entry('b%d' % i, 'org.B', i) for i in range(3)] + \
+            [_entry('c0', 'org.C', 119)]
+
+        for bundle_id in ['org.A', 'org.B', 'org.C', 'org.D']:
+            self._model.watch(bundle_id, self._changed_cb)
+        self._iterate()
+
+        # The activities cut off are looked for in a single query
+        self.assertEqual(2, len(self._datastore.queries))
+        self.assertEqual(['org.B', 'org.C', 'org.D'],
+                         sorted(self._datastore.queries[1]['activity']))
+        self.assertEqual([('org.A', ['a19', 'a18', 'a17', 'a16', 'a15']),
+                          ('org.B', ['b2', 'b1', 'b0']),
+                          ('org.C', ['c0']),
+                          ('org.D', [])], sorted(self._changes))
+
+    def test_updates(self):
+        self._datastore.entries = [_entry('a0', 'org.A', 0),
+                                   _entry('b0', 'org.B', 0)]
+        self._model.watch('org.A', self._changed_cb)
+        self._model.watch('org.B', self._changed_cb)
+        self._iterate()
+        self._changes = []
+
+        self._datastore.created.send(None, object_id='a1',
+                                     metadata=_entry('a1', 'org.A', 1))
+        self._datastore.updated.send(None, object_id='b0',
+                                     metadata=_entry('b0', 'org.A', 2))
+        self._datastore.deleted.send(None, object_id='a0')
+
+        self.assertEqual([('org.A', ['a1', 'a0']),
+                          ('org.B', []),
+                          ('org.A', ['b0', 'a1', 'a0']),
+                          ('org.A', ['b0', 'a1'])], self._changes)
+        self.assertEqual(1, len(self._datastore.queries))
+
+    def test_unwatch(self):
+        self._datastore.entries = [_entry('a0', 'org.A', 0)]
+        self._model.watch('org.A', self._changed_cb)
+        self._iterate()
+        entries = self._model.watch('org.A', self._changed_cb)
+        self.assertEqual(['a0'], [entry['uid'] for entry in entries])
+
+        self._model.unwatch('org.A', self._changed_cb)
+        self._model.unwatch('org.A', self._changed_cb)
+        self._datastore.created.send(None, object_id='a1',
+                                     metadata=_entry('a1', 'org.A', 1))
+        self._iterate()
+
+        self.assertEqual([('org.A', ['a0'])], self._changes)
+
+    def test_weak_watchers(self):
+        changes = []
+
+        class _Watcher(object):
+            def changed_cb(self, bundle_id, entries):
+                changes.append(bundle_id)
+
+        self._datastore.entries = [_entry('a0', 'org.A', 0)]
+        watcher = _Watcher()
+        self._model.watch('org.A', watcher.changed_cb)
+        self._iterate()
+        self.assertEqual(['org.A'], changes)
+
+        del watcher
+        gc.collect()
+        self._datastore.created.send(None, object_id='a1',
+                                     metadata=_entry('a1', 'org.A', 1))
+
+        self.assertEqual(['org.A'], changes)
+        self.assertNotIn('org.A', self._model._entries)
+
+    def test_watch_during_query(self):
+        self._datastore.entries = [_entry('a0', 'org.A', 0),
+                                   _entry('b0', 'org.B', 0),
+                                   _entry('c0', 'org.C', 0)]
+        self._model.watch('org.A', self._changed_cb)
+        # Start the query
+        context.iteration(False)
+        self.assertEqual(1, len(self._datastore.queries))
+
+        self._model.watch('org.A', self._changed_cb)
+        self._model.watch('org.B', self._changed_cb)
+        self._model.watch('org.C', self._changed_cb)
+        self._iterate()
+
+        self.assertEqual(2, len(self._datastore.queries))
+        self.assertEqual(['org.B', 'org.C'],
+                         sorted(self._datastore.queries[1]['activity']))
+        self.assertEqual([('org.A', ['a0']),
+                          ('org.A', ['a0']),
+                          ('org.B', ['b0']),
+                          ('org.C', ['c0'])], sorted(self._changes))
+
+    def test_nothing_to_fetch(self):
+        self._model.watch('org.A', self._changed_cb)
+        self._model.unwatch('org.A', self._changed_cb)
+        self._iterate()
+
+        self.assertEqual([], self._datastore.queries)
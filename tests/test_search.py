@@ -0,0 +1,55 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from jarabe.journal.search import TextQuery, TermIndex, get_entry_terms
+
+
+_CAT = get_entry_terms('Photos/Cats.jpg', {'title': 'My Cats',
+                                           'tags': 'pets garden'})
+_DOG = get_entry_terms('Photos/dog.png', {'title': 'Rex',
+                                          'description': 'My dog'})
+
+
+class TestSearch(unittest.TestCase):
+    def test_entry_terms(self):
+        self.assertEqual({'photos', 'cats.jpg', 'my', 'cats', 'pets',
+                          'garden'}, _CAT)
+
+    def test_match_terms(self):
+        self.assertTrue(TextQuery('cat').match_terms(_CAT))
+        self.assertTrue(TextQuery('CAT Garden').match_terms(_CAT))
+        self.assertFalse(TextQuery('cat dog').match_terms(_CAT))
+
+    def test_phrase(self):
+        query = TextQuery('"my cats"')
+        self.assertTrue(query.is_phrase())
+        self.assertTrue(query.match_terms(_CAT))
+        self.assertTrue(query.match_texts(['Photos/Cats.jpg', 'My Cats']))
+        self.assertFalse(query.match_texts(['Photos/Cats.jpg', 'Cats my']))
+
+    def test_term_index(self):
+        term_index = TermIndex()
+        term_index.add('cat', _CAT)
+        term_index.add('dog', _DOG)
+
+        self.assertEqual({'cat', 'dog'}, TextQuery('my').search(term_index))
+        self.assertEqual({'cat'}, TextQuery('my pets').search(term_index))
+        self.assertEqual(set(), TextQuery('fish').search(term_index))
+
+        term_index.remove('cat')
+        self.assertNotIn('cat', term_index)
+        self.assertEqual({'dog'}, TextQuery('my').search(term_index))
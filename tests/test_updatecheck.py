@@ -0,0 +1,189 @@
+# Copyright (C) 2026, Sugar Labs
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import unittest
+import threading
+import http.server
+import socketserver
+from urllib.parse import urlparse, parse_qs
+
+from gi.repository import GLib
+
+from jarabe.model import update
+from jarabe.model.update import BundleUpdate
+from jarabe.model.update import aslo
+from jarabe.model.update.microformat import MicroformatUpdater
+
+context = GLib.MainContext.default()
+
+_RDF = """<?xml version="1.0" encoding="UTF-8"?>
+<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+        xmlns:em="http://www.mozilla.org/2004/em-rdf#">
+%s</RDF:RDF>
+"""
+
+_DESCRIPTION = """<RDF:Description>
+    <em:version>%s</em:version>
+    <em:updateLink>http://localhost/%s.xo</em:updateLink>
+    <em:updateSize>7</em:updateSize>
+</RDF:Description>
+"""
+
+
+class _UpdateRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers like the ASLO update service to GET requests, and with
+    the size of the bundle to HEAD requests, after server.delay seconds.
+    """
+
+    def _wait(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.running += 1
+            server.max_running = max(server.max_running, server.running)
+        time.sleep(server.delay)
+        with server.lock:
+            server.running -= 1
+
+    def do_GET(self):
+        self._wait()
+        bundle_id = parse_qs(urlparse(self.path).query)['id'][0]
+        version = self.server.versions.get(bundle_id)
+        if version is None:
+            body = _RDF % ''
+        else:
+            body = _RDF % (_DESCRIPTION % (version, bundle_id))
+
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._wait()
+        self.send_response(200)
+        self.send_header('Content-Length', '1000')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Bundle(object):
+
+    def __init__(self, bundle_id):
+        self._bundle_id = bundle_id
+
+    def get_bundle_id(self):
+        return self._bundle_id
+
+    def get_name(self):
+        return self._bundle_id
+
+    def get_activity_version(self):
+        return '1'
+
+
+class TestUpdateCheck(unittest.TestCase):
+    def setUp(self):
+        self._server = socketserver.ThreadingTCPServer(
+            ("", 0), _UpdateRequestHandler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        self._server.delay = 0.05
+        self._server.versions = {}
+        self._server.requests = 0
+        self._server.running = 0
+        self._server.max_running = 0
+        self._port = self._server.server_address[1]
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+
+        self._update_path = aslo._UPDATE_PATH
+        aslo._UPDATE_PATH = 'http://0.0.0.0:%d/update' % self._port
+        self._updates = None
+        self._progress = []
+
+    def tearDown(self):
+        aslo._UPDATE_PATH = self._update_path
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+
+    def _progress_cb(self, name, progress):
+        self._progress.append(name)
+
+    def _completion_cb(self, updates):
+        self._updates = updates
+
+    def _error_cb(self, error):
+        self.fail(error)
+
+    def _wait_for_completion(self):
+        while self._updates is None:
+            context.iteration(True)
+
+    def test_aslo_checks(self):
+        bundles = [_Bundle('org.sugarlabs.Test%d' % i) for i in range(20)]
+        for bundle in bundles[::2]:
+            self._server.versions[bundle.get_bundle_id()] = '2'
+
+        updater = aslo.AsloUpdater()
+        updater.fetch_update_info(bundles, False, self._progress_cb,
+                                  self._completion_cb, self._error_cb)
+        self._wait_for_completion()
+
+        self.assertEqual(sorted(self._server.versions),
+                         sorted(u.bundle_id for u in self._updates))
+        self.assertEqual(20, len(self._progress))
+        self.assertEqual(20, self._server.requests)
+        self.assertGreater(self._server.max_running, 1)
+        self.assertLessEqual(self._server.max_running, update._MAX_CHECKS)
+
+    def test_aslo_cancel(self):
+        bundles = [_Bundle('org.sugarlabs.Test%d' % i) for i in range(20)]
+        self._server.delay = 0.2
+
+        updater = aslo.AsloUpdater()
+        updater.fetch_update_info(bundles, False, self._progress_cb,
+                                  self._completion_cb, self._error_cb)
+        updater.cancel()
+        self._wait_for_completion()
+
+        self.assertEqual([], self._updates)
+        self.assertLessEqual(len(self._progress), update._MAX_CHECKS)
+
+    def test_microformat_size_checks(self):
+        bundle_updates = [
+            BundleUpdate('org.sugarlabs.Test%d' % i, 'Test', '2',
+                         'http://0.0.0.0:%d/test-%d.xo' % (self._port, i), 0)
+            for i in range(10)]
+
+        updater = MicroformatUpdater()
+        updater._auto = True
+        updater._progress_cb = self._progress_cb
+        updater._completion_cb = self._completion_cb
+        updater._bundles_to_check = bundle_updates
+        updater._check_updates()
+        self._wait_for_completion()
+
+        self.assertEqual(10, len(self._updates))
+        self.assertEqual([1000] * 10, [u.size for u in self._updates])
+        self.assertGreater(self._server.max_running, 1)
+        self.assertLessEqual(self._server.max_running, update._MAX_CHECKS)